@@ -0,0 +1,85 @@
+"""
+Render throughput benchmark for site/build.py.
+
+Renders a synthetic history through render_day() and reports items/second.
+No database is needed.
+
+Usage:
+    python bench/bench_render.py
+    python bench/bench_render.py --items 100000 --repeat 5 --json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from synthetic import synthetic_items, group_by_day  # noqa: E402
+
+
+def load_builder():
+    # build.py refuses to import without a database URL; rendering never touches it
+    os.environ.setdefault("DATABASE_URL", "postgresql://localhost/bench")
+    spec = importlib.util.spec_from_file_location("site_build", BENCH_DIR.parent / "site" / "build.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_render(build, days, repeat):
+    item_count = sum(len(day["events"]) for day in days)
+    timings = []
+    output_bytes = 0
+
+    for _ in range(repeat):
+        # Every pass starts with cold caches
+        for cached in ("format_day_label",):
+            if hasattr(getattr(build, cached, None), "cache_clear"):
+                getattr(build, cached).cache_clear()
+        started = time.perf_counter()
+        output_bytes = 0
+        for day in days:
+            output_bytes += len(build.render_day(day))
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    return {
+        "name": "render_day",
+        "items": item_count,
+        "days": len(days),
+        "repeat": repeat,
+        "best_s": round(best, 4),
+        "mean_s": round(sum(timings) / len(timings), 4),
+        "items_per_s": round(item_count / best),
+        "output_bytes": output_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark site rendering throughput")
+    parser.add_argument("--items", type=int, default=100_000, help="Synthetic items to render (default: 100000)")
+    parser.add_argument("--per-day", type=int, default=40, help="Average items per day (default: 40)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions (default: 3)")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    build = load_builder()
+    days = list(group_by_day(synthetic_items(args.items, items_per_day=args.per_day)))
+    result = bench_render(build, days, args.repeat)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"Rendered {result['items']} items over {result['days']} days")
+        print(f"  best {result['best_s']:.3f}s, mean {result['mean_s']:.3f}s")
+        print(f"  {result['items_per_s']:,} items/s, {result['output_bytes'] / 1e6:.1f} MB of HTML")
+
+
+if __name__ == "__main__":
+    main()
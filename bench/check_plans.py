@@ -0,0 +1,209 @@
+"""
+Query-plan check for the hot queries.
+
+Seeds the scratch `bench` schema with a synthetic history (see run.py), runs the real
+builder and ingest functions through a recording connection, then EXPLAIN ANALYZEs every
+statement they issued and flags sequential scans on the consumed_* tables. Statements
+are explained inside a rolled-back transaction, so inserts leave no trace.
+
+Keep the default scale or larger: on a few thousand rows a sequential scan really is the
+cheapest plan, and the planner will rightly pick it.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/consumed_bench python bench/check_plans.py
+    python bench/check_plans.py --items 100000 --verbose
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from contextlib import asynccontextmanager
+from datetime import timedelta
+
+import asyncpg
+
+from run import SCHEMA, reset_schema, seed, load_builder, synthetic_items
+
+HOT_TABLES = {"consumed_events", "consumed_media", "consumed_media_variants", "consumed_songs"}
+
+
+class RecordingConnection:
+    def __init__(self, conn):
+        self._conn = conn
+        self.statements = []
+
+    def _record(self, query, args):
+        self.statements.append((query, args))
+
+    async def fetch(self, query, *args, **kwargs):
+        self._record(query, args)
+        return await self._conn.fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        self._record(query, args)
+        return await self._conn.fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        self._record(query, args)
+        return await self._conn.fetchval(query, *args, **kwargs)
+
+    async def execute(self, query, *args, **kwargs):
+        self._record(query, args)
+        return await self._conn.execute(query, *args, **kwargs)
+
+    def transaction(self, **kwargs):
+        return self._conn.transaction(**kwargs)
+
+
+class RecordingPool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+def seq_scans(plan):
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in HOT_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+@asynccontextmanager
+async def rolled_back(conn):
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        yield
+    finally:
+        await transaction.rollback()
+
+
+async def explain(conn, query, args):
+    async with rolled_back(conn):
+        result = await conn.fetchval(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", *args)
+    return json.loads(result)[0] if isinstance(result, str) else result[0]
+
+
+async def recorded(conn, call):
+    # The call itself is rolled back too, so each query sees the same seeded data
+    recorder = RecordingConnection(conn)
+    async with rolled_back(conn):
+        await call(recorder)
+    return recorder.statements
+
+
+async def hot_queries(conn, build, db):
+    fingerprints = await build.fetch_day_fingerprints(conn)
+    days = sorted(fingerprints, reverse=True)
+    latest = await conn.fetchrow(
+        "SELECT apple_music_id, played_at, title, artist FROM consumed_songs ORDER BY played_at DESC LIMIT 1"
+    )
+    now = latest["played_at"] + timedelta(minutes=5)
+
+    def pooled(call):
+        async def run(recorder):
+            db._pool = RecordingPool(recorder)
+            try:
+                await call()
+            finally:
+                db._pool = None
+        return run
+
+    sync_batch = [
+        {
+            "played_at": now - timedelta(minutes=4 * position),
+            "day": now.date().isoformat(),
+            "title": f"plan track {position}",
+            "artist": "plan artist",
+            "apple_music_id": latest["apple_music_id"] if position == 0 else f"plan-{position}",
+        }
+        for position in range(30)
+    ]
+
+    return {
+        "fetch_items (recent days)": lambda r: build.fetch_items(r, days[:build.recent_days]),
+        "fetch_items (one day)": lambda r: build.fetch_items(r, days[:1]),
+        "create_song dedup (apple_music_id)": pooled(lambda: db.create_song(
+            played_at=latest["played_at"], day=now.date().isoformat(), title=latest["title"],
+            artist=latest["artist"], apple_music_id=latest["apple_music_id"]
+        )),
+        "create_song dedup (untagged)": pooled(lambda: db.create_song(
+            played_at=now, day=now.date().isoformat(), title="untagged", artist="plan artist"
+        )),
+        "create_songs_bulk (30-track sync)": pooled(lambda: db.create_songs_bulk(sync_batch)),
+        "find_media_by_hash": pooled(lambda: db.find_media_by_hash("0" * 64)),
+    }
+
+
+async def run(args):
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ingest"))
+    from app import db
+
+    seed_conn = await asyncpg.connect(args.database_url)
+    try:
+        await reset_schema(seed_conn)
+        print(f"Seeding {args.items} synthetic items...")
+        await seed(seed_conn, list(synthetic_items(args.items, items_per_day=args.per_day)))
+    finally:
+        await seed_conn.close()
+
+    # The builder's own connection, so json codecs match what build.py sees
+    build = load_builder()
+    build.database_url = args.database_url
+    conn = await build.connect()
+    await conn.execute(f"SET search_path TO {SCHEMA}, public")
+    failures = 0
+
+    try:
+        for name, call in (await hot_queries(conn, build, db)).items():
+            for query, query_args in await recorded(conn, call):
+                plan = await explain(conn, query, query_args)
+                scans = seq_scans(plan["Plan"])
+                status = "✗" if scans else "✓"
+                detail = f"  seq scan on {', '.join(sorted(set(scans)))}" if scans else ""
+                print(f"{status} {name:<38} {plan['Execution Time']:8.2f}ms{detail}")
+                if args.verbose:
+                    print(json.dumps(plan["Plan"], indent=2))
+                failures += bool(scans)
+
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+    finally:
+        await conn.close()
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag sequential scans in the hot query plans")
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("BENCH_DATABASE_URL"),
+        help="Scratch database (default: BENCH_DATABASE_URL); a 'bench' schema is dropped and recreated"
+    )
+    parser.add_argument("--items", type=int, default=50_000, help="Synthetic history size (default: 50000)")
+    parser.add_argument("--per-day", type=int, default=40, help="Average items per day (default: 40)")
+    parser.add_argument("--keep", action="store_true", help="Leave the bench schema in place afterwards")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan as JSON")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("set BENCH_DATABASE_URL or pass --database-url")
+
+    failures = asyncio.run(run(args))
+    if failures:
+        print(f"\n✗ {failures} statement(s) fall back to sequential scans")
+        sys.exit(1)
+    print("\n✓ All hot queries use indexes")
+
+
+if __name__ == "__main__":
+    main()
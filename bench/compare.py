@@ -0,0 +1,63 @@
+"""
+Compare two bench/run.py result files.
+
+Usage:
+    python bench/compare.py results/base.json results/head.json
+    python bench/compare.py base.json head.json --threshold 0.10
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+
+def load(path):
+    report = json.loads(Path(path).read_text(encoding="utf-8"))
+    return report, {entry["name"]: entry for entry in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base", help="Baseline results JSON")
+    parser.add_argument("head", help="Candidate results JSON")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="Relative slowdown of best time that counts as a regression (default: 0.15)"
+    )
+    args = parser.parse_args()
+
+    base_report, base = load(args.base)
+    head_report, head = load(args.head)
+
+    print(f"base {base_report.get('commit')} ({base_report.get('timestamp')})")
+    print(f"head {head_report.get('commit')} ({head_report.get('timestamp')})")
+    if base_report.get("scale") != head_report.get("scale"):
+        print("⚠ Runs used different scales; timings are not directly comparable")
+    print()
+
+    regressions = []
+    for name in list(base) + [name for name in head if name not in base]:
+        if name not in base or name not in head:
+            print(f"  {name:<28} {'only in ' + ('head' if name in head else 'base'):>30}")
+            continue
+
+        before, after = base[name]["best_s"], head[name]["best_s"]
+        change = (after - before) / before if before else 0.0
+        marker = ""
+        if change > args.threshold:
+            marker = " ✗"
+            regressions.append(name)
+        elif change < -args.threshold:
+            marker = " ✓"
+        print(f"  {name:<28} {before:9.4f}s -> {after:9.4f}s  {change:+7.1%}{marker}")
+
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+"""
+End-to-end benchmark suite for the builder and ingest hot paths.
+
+Seeds a scratch `bench` schema in a local Postgres with a synthetic history, then times
+the builder queries and renderer, create_song() dedup, WebP conversion, the ingest image
+pipeline and an Apple Music sync. R2 is replaced by the local-filesystem storage backend
+and the Apple Music API by the stand-ins in standins.py (a fake client, and a local mock
+server for the real client's HTTP paging and retries), so nothing leaves the machine.
+
+The schema is dropped and recreated on every run; point BENCH_DATABASE_URL at a throwaway
+database, never at production.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/consumed_bench python bench/run.py
+    python bench/run.py --database-url ... --items 200000 --output results/$(git rev-parse --short HEAD).json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+import asyncpg
+
+BENCH_DIR = Path(__file__).parent
+REPO_DIR = BENCH_DIR.parent
+SCHEMA = "bench"
+
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(REPO_DIR / "ingest"))
+sys.path.insert(0, str(REPO_DIR / "scripts"))
+
+from synthetic import synthetic_items  # noqa: E402
+from standins import FakeAppleMusicClient, MockAppleMusicServer  # noqa: E402
+from bench_render import load_builder  # noqa: E402
+from run_migration import load_migrations, migrate  # noqa: E402
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Results:
+    def __init__(self):
+        self.entries = []
+
+    def add(self, name, timings, **extra):
+        best = min(timings)
+        entry = {
+            "name": name,
+            "repeat": len(timings),
+            "best_s": round(best, 5),
+            "mean_s": round(sum(timings) / len(timings), 5),
+        }
+        ops = extra.pop("ops", None)
+        if ops:
+            entry["ops"] = ops
+            entry["ops_per_s"] = round(ops / best, 1) if best else None
+        entry.update(extra)
+        self.entries.append(entry)
+
+        rate = f", {entry['ops_per_s']:,} ops/s" if ops else ""
+        print(f"  {name:<28} best {best:8.4f}s  mean {entry['mean_s']:8.4f}s{rate}")
+
+
+async def timed(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await func()
+        timings.append(time.perf_counter() - started)
+    return timings, result
+
+
+def timed_sync(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return timings, result
+
+
+# --- schema and seed data ---------------------------------------------------------------
+
+async def reset_schema(conn):
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    await conn.execute(f"SET search_path TO {SCHEMA}, public")
+
+    await conn.execute((BENCH_DIR / "schema.sql").read_text(encoding="utf-8"))
+    await migrate(conn, load_migrations(), quiet=True)
+
+
+def seed_rows(items):
+    events, media, variants, songs = [], [], [], []
+
+    for item in items:
+        occurred_at = datetime.fromisoformat(item["occurred_at"])
+        day = date.fromisoformat(item["day"])
+
+        if item["type"] == "music":
+            payload = item["payload"]
+            songs.append((
+                uuid.UUID(item["id"]), occurred_at, day, item["title"], payload["artist"],
+                payload["album"], item["url"].rsplit("/", 1)[-1], None, payload["duration_ms"],
+                None, item["url"], None, json.dumps({}),
+            ))
+            continue
+
+        event_id = uuid.UUID(item["id"])
+        events.append((
+            event_id, occurred_at, day, item["type"], item["title"], item["url"] or None,
+            json.dumps(item["payload"]),
+        ))
+        for entry in item["media"]:
+            media_id = uuid.UUID(entry["id"])
+            media.append((media_id, event_id, entry["path"], entry["width"], entry["height"], 0, "image/webp", "ready"))
+            for variant in entry["variants"]:
+                variants.append((media_id, variant["width"], variant["height"], variant["path"], 0))
+
+    return events, media, variants, songs
+
+
+async def seed(conn, items):
+    events, media, variants, songs = seed_rows(items)
+
+    async with conn.transaction():
+        await conn.copy_records_to_table(
+            "consumed_events", schema_name=SCHEMA, records=events,
+            columns=["id", "occurred_at", "day", "type", "title", "url", "payload"]
+        )
+        await conn.copy_records_to_table(
+            "consumed_media", schema_name=SCHEMA, records=media,
+            columns=["id", "event_id", "path", "width", "height", "bytes", "content_type", "status"]
+        )
+        await conn.copy_records_to_table(
+            "consumed_media_variants", schema_name=SCHEMA, records=variants,
+            columns=["media_id", "width", "height", "path", "bytes"]
+        )
+        await conn.copy_records_to_table(
+            "consumed_songs", schema_name=SCHEMA, records=songs,
+            columns=["id", "played_at", "day", "title", "artist", "album", "apple_music_id",
+                     "isrc", "duration_ms", "release_date", "apple_music_url", "artwork_url", "payload"]
+        )
+    await conn.execute("ANALYZE")
+
+    return {"events": len(events), "media": len(media), "variants": len(variants), "songs": len(songs)}
+
+
+# --- builder ------------------------------------------------------------------------------
+
+async def bench_builder(results, build, database_url, repeat):
+    build.database_url = database_url
+    conn = await build.connect()
+    await conn.execute(f"SET search_path TO {SCHEMA}, public")
+
+    try:
+        timings, _ = await timed(lambda: build.fetch_watermark(conn), repeat)
+        results.add("fetch_watermark", timings)
+
+        timings, fingerprints = await timed(lambda: build.fetch_day_fingerprints(conn), repeat)
+        results.add("fetch_day_fingerprints", timings, ops=len(fingerprints))
+
+        # fetch_events/fetch_songs were merged into the single fetch_items query
+        timings, items = await timed(lambda: build.fetch_items(conn), repeat)
+        results.add("fetch_items", timings, ops=len(items))
+
+        recent = sorted(fingerprints, reverse=True)[:build.recent_days]
+        timings, _ = await timed(lambda: build.fetch_items(conn, recent), repeat)
+        results.add("fetch_items_recent", timings, ops=len(recent))
+
+        async def stream():
+            count = 0
+            async for day_group in build.iter_day_groups(conn):
+                count += len(day_group["events"])
+            return count
+
+        timings, streamed = await timed(stream, repeat)
+        results.add("iter_day_groups", timings, ops=streamed)
+
+    finally:
+        await conn.close()
+
+    timings, days = timed_sync(lambda: build.group_events_by_day(items), repeat)
+    results.add("group_events_by_day", timings, ops=len(items))
+
+    timings, html = timed_sync(lambda: build.render_html(days), repeat)
+    results.add("render_html", timings, ops=len(items), output_bytes=len(html))
+
+
+# --- ingest -------------------------------------------------------------------------------
+
+async def use_bench_pool(database_url):
+    from app import db
+
+    await db.close_pool()
+    db._pool = await asyncpg.create_pool(
+        database_url, min_size=1, max_size=10,
+        server_settings={"search_path": f"{SCHEMA}, public"}
+    )
+    return db
+
+
+async def bench_create_song(results, db, count):
+    played_base = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+    def song(index):
+        return {
+            "played_at": played_base + timedelta(minutes=4 * index),
+            "day": (played_base + timedelta(minutes=4 * index)).date().isoformat(),
+            "title": f"bench track {index}",
+            "artist": "bench artist",
+            "apple_music_id": f"bench-{index}",
+            "payload": {},
+        }
+
+    async def insert_all():
+        inserted = 0
+        for index in range(count):
+            _, was_inserted = await db.create_song(**song(index))
+            inserted += was_inserted
+        return inserted
+
+    # First pass inserts everything, second pass hits the dedup lookup for every row
+    timings, inserted = await timed(insert_all, 1)
+    results.add("create_song_insert", timings, ops=count, inserted=inserted)
+
+    timings, inserted = await timed(insert_all, 1)
+    results.add("create_song_dedup", timings, ops=count, inserted=inserted)
+
+    # Fresh ids so the bulk path starts from an empty window too
+    batch = [{**song(index), "apple_music_id": f"bench-bulk-{index}"} for index in range(count)]
+
+    async def insert_bulk():
+        return sum(was_inserted for _, was_inserted in await db.create_songs_bulk(batch))
+
+    timings, inserted = await timed(insert_bulk, 1)
+    results.add("create_songs_bulk_insert", timings, ops=count, inserted=inserted)
+
+    timings, inserted = await timed(insert_bulk, 1)
+    results.add("create_songs_bulk_dedup", timings, ops=count, inserted=inserted)
+
+
+def sample_images(paths, work_dir):
+    from PIL import Image
+
+    if paths:
+        return [Path(path) for path in paths]
+
+    # Noisy gradients compress roughly like photos; flat fills would flatter the encoder
+    samples = []
+    for name, size in (("photo.jpg", (4032, 3024)), ("screenshot.png", (1170, 2532))):
+        gradient = Image.linear_gradient("L").resize(size)
+        noise = Image.effect_noise(size, 48)
+        image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+        path = Path(work_dir) / name
+        image.save(path, quality=90) if name.endswith(".jpg") else image.save(path)
+        samples.append(path)
+    return samples
+
+
+def bench_webp(results, images, repeat):
+    from app.image_processing import convert_to_webp, convert_to_webp_variants
+
+    sources = [path.read_bytes() for path in images]
+    source_bytes = sum(len(data) for data in sources)
+
+    timings, _ = timed_sync(lambda: [convert_to_webp(data) for data in sources], repeat)
+    results.add("convert_to_webp", timings, ops=len(sources), source_bytes=source_bytes)
+
+    timings, _ = timed_sync(lambda: [convert_to_webp_variants(data) for data in sources], repeat)
+    results.add("convert_to_webp_variants", timings, ops=len(sources), source_bytes=source_bytes)
+
+
+async def bench_process_image(results, images, work_dir, repeat):
+    from app import worker, offload, storage
+
+    storage_root = Path(work_dir) / "r2"
+    storage.set_backend(storage.LocalBackend(str(storage_root)))
+
+    async def run():
+        return await asyncio.gather(*(
+            worker.process_image(str(path), f"images/bench/{uuid.uuid4()}.webp") for path in images
+        ))
+
+    try:
+        timings, _ = await timed(run, repeat)
+    finally:
+        offload.shutdown_pools()
+        storage.set_backend(None)
+
+    uploaded = sum(1 for path in storage_root.rglob("*.webp"))
+    results.add(
+        "process_image", timings, ops=len(images),
+        workers=offload.IMAGE_WORKERS, uploaded_objects=uploaded // repeat
+    )
+
+
+async def bench_sync(results, polls):
+    import sync_apple_music
+
+    client = FakeAppleMusicClient()
+    # sync_songs() closes the pool when it finishes; reopen it through the bench pool each poll
+    real_close = sync_apple_music.close_pool
+
+    async def keep_open():
+        pass
+
+    added = 0
+    with mock.patch.object(sync_apple_music, "AppleMusicClient", lambda: client), \
+            mock.patch.object(sync_apple_music, "close_pool", keep_open), \
+            mock.patch("builtins.print"):
+        timings = []
+        for _ in range(polls):
+            started = time.perf_counter()
+            added += await sync_apple_music.sync_songs()
+            timings.append(time.perf_counter() - started)
+    await real_close()
+
+    results.add("sync_songs", timings, ops=polls, songs_added=added)
+
+
+def bench_apple_music_fetch(results, polls):
+    # The real client against the local mock server: paging back to the previous snapshot,
+    # one rate-limited response, and how many connections the session opened
+    from app import apple_music
+    import sync_apple_music
+
+    tokens = {"APPLE_DEVELOPER_TOKEN": "bench", "APPLE_MUSIC_USER_TOKEN": "bench"}
+    with MockAppleMusicServer() as server, \
+            mock.patch.dict(os.environ, tokens), \
+            mock.patch.object(apple_music, "APPLE_MUSIC_API_URL", server.url), \
+            mock.patch("builtins.print"):
+        client = apple_music.AppleMusicClient()
+        server.play(60)
+        previous = [sync_apple_music.song_key(song) for song in client.get_recently_played()]
+        server.requests.clear()
+
+        timings = []
+        fetched = 0
+        for poll in range(polls):
+            # Every fifth poll follows a gap long enough to need more than one page
+            server.play(45 if poll % 5 == 4 else 8)
+            if poll == polls // 2:
+                server.fail(429, retry_after=0)
+            started = time.perf_counter()
+            songs = client.get_recently_played(until=sync_apple_music.reached_snapshot(previous))
+            timings.append(time.perf_counter() - started)
+            fetched += len(songs)
+            previous = [sync_apple_music.song_key(song) for song in songs]
+        client.close()
+
+    results.add(
+        "apple_music_fetch", timings, ops=polls,
+        requests=len(server.requests), connections=len(server.connections), songs_fetched=fetched
+    )
+
+
+async def run(args):
+    results = Results()
+    meta = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "scale": {"items": args.items, "per_day": args.per_day, "songs": args.songs, "polls": args.polls},
+    }
+
+    build = load_builder()
+
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        meta["postgres"] = await conn.fetchval("SHOW server_version")
+        await reset_schema(conn)
+
+        print(f"Seeding {args.items} synthetic items...")
+        items = list(synthetic_items(args.items, items_per_day=args.per_day))
+        started = time.perf_counter()
+        meta["seeded"] = await seed(conn, items)
+        results.add("seed_copy", [time.perf_counter() - started], ops=len(items))
+    finally:
+        await conn.close()
+
+    print("Builder:")
+    await bench_builder(results, build, args.database_url, args.repeat)
+
+    print("Ingest:")
+    db = await use_bench_pool(args.database_url)
+    await bench_create_song(results, db, args.songs)
+
+    with tempfile.TemporaryDirectory(prefix="consumed-bench-") as work_dir:
+        images = sample_images(args.images, work_dir)
+        bench_webp(results, images, args.repeat)
+        await bench_process_image(results, images, work_dir, args.repeat)
+
+    bench_apple_music_fetch(results, args.polls)
+
+    # Last: leaves the ingest pool closed
+    await bench_sync(results, args.polls)
+
+    if not args.keep:
+        conn = await asyncpg.connect(args.database_url)
+        try:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        finally:
+            await conn.close()
+
+    return {**meta, "results": results.entries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark builder and ingest paths against a local Postgres")
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("BENCH_DATABASE_URL"),
+        help="Scratch database (default: BENCH_DATABASE_URL); a 'bench' schema is dropped and recreated"
+    )
+    parser.add_argument("--items", type=int, default=50_000, help="Synthetic history size (default: 50000)")
+    parser.add_argument("--per-day", type=int, default=40, help="Average items per day (default: 40)")
+    parser.add_argument("--songs", type=int, default=1000, help="create_song() calls per pass (default: 1000)")
+    parser.add_argument("--polls", type=int, default=20, help="Simulated Apple Music syncs (default: 20)")
+    parser.add_argument("--images", nargs="*", help="Sample images to convert (default: generated photos)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions (default: 3)")
+    parser.add_argument("--keep", action="store_true", help="Leave the bench schema in place afterwards")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("set BENCH_DATABASE_URL or pass --database-url")
+
+    report = asyncio.run(run(args))
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"✓ Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+-- Base tables the ingest service and site builder expect. Production created these by hand
+-- before migrations/ existed; the benchmarks need them in a scratch schema first.
+
+CREATE TABLE IF NOT EXISTS consumed_events (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    occurred_at TIMESTAMPTZ NOT NULL,
+    day DATE NOT NULL,
+    type TEXT NOT NULL,
+    title TEXT,
+    url TEXT,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS consumed_media (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    event_id UUID NOT NULL REFERENCES consumed_events(id),
+    path TEXT NOT NULL,
+    width INT,
+    height INT,
+    bytes INT,
+    content_type TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS consumed_songs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    played_at TIMESTAMPTZ NOT NULL,
+    day DATE NOT NULL,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    album TEXT,
+    apple_music_id TEXT,
+    isrc TEXT,
+    duration_ms INT,
+    release_date DATE,
+    apple_music_url TEXT,
+    artwork_url TEXT,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
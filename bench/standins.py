@@ -0,0 +1,197 @@
+"""
+Offline stand-ins for the Apple Music API. R2 needs none: the benchmarks use the
+local-filesystem backend from ingest/app/storage.py.
+
+FakeAppleMusicClient serves synthetic recently-played tracks with the same shape
+AppleMusicClient.get_recently_played() returns, without any HTTP.
+
+MockAppleMusicServer is a local HTTP server speaking the recently-played endpoint, with
+`next` pagination, injected rate limits and errors, and slow responses, so the real
+AppleMusicClient can be exercised offline:
+
+    with MockAppleMusicServer() as server:
+        server.play(45)
+        server.fail(429, retry_after=1)
+        os.environ["APPLE_MUSIC_API_URL"] = server.url  # before importing app.apple_music
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+CATALOGUE_SIZE = 400
+
+
+def _track(index):
+    return {
+        "title": f"track {index}",
+        "artist": f"artist {index % 37}",
+        "album": f"album {index % 90}",
+        "apple_music_id": str(1_000_000 + index),
+        "isrc": f"USBENCH{index:05d}",
+        "duration_ms": 150_000 + (index * 7919) % 150_000,
+        "release_date": "2020-01-01",
+        "apple_music_url": f"https://music.apple.com/us/song/{1_000_000 + index}",
+        "artwork_url": None,
+        "played_at": None,
+        "payload": {"id": str(1_000_000 + index)},
+    }
+
+
+def _resource(index):
+    # The API's JSON for one track, as AppleMusicClient._parse_song() reads it
+    track = _track(index)
+    return {
+        "id": track["apple_music_id"],
+        "type": "songs",
+        "attributes": {
+            "name": track["title"],
+            "artistName": track["artist"],
+            "albumName": track["album"],
+            "isrc": track["isrc"],
+            "durationInMillis": track["duration_ms"],
+            "releaseDate": track["release_date"],
+            "url": track["apple_music_url"],
+            "artwork": {"url": f"https://example.invalid/{index}/{{w}}x{{h}}.jpg", "width": 600, "height": 600},
+        },
+    }
+
+
+class FakeAppleMusicClient:
+    """Rotates through a fixed catalogue so consecutive polls overlap like the real API."""
+
+    catalogue_size = CATALOGUE_SIZE
+
+    def __init__(self, seed=7, plays_per_poll=8):
+        self.rng = random.Random(seed)
+        self.plays_per_poll = plays_per_poll
+        self.history = []
+
+    def _track(self, index):
+        return _track(index)
+
+    def get_recently_played(self, limit=30, max_pages=1, until=None):
+        for _ in range(self.plays_per_poll):
+            self.history.insert(0, self.rng.randrange(self.catalogue_size))
+
+        songs = []
+        for position, index in enumerate(self.history[:limit]):
+            song = self._track(index)
+            song["position"] = position
+            songs.append(song)
+        return songs
+
+    def close(self):
+        pass
+
+
+class MockAppleMusicServer:
+    """Serves /v1/me/recent/played/tracks on 127.0.0.1 from an in-memory play history."""
+
+    path = "/v1/me/recent/played/tracks"
+
+    def __init__(self, seed=7, page_limit=30, history_limit=150):
+        self.rng = random.Random(seed)
+        self.page_limit = page_limit
+        # The real history is short too; plays beyond it are gone for good
+        self.history_limit = history_limit
+        self.history = []
+        # Responses to send before serving normally: (status, headers, delay)
+        self.failures = []
+        self.delay = 0.0
+        self.requests = []
+        self.connections = set()
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.thread = None
+
+    def play(self, count):
+        with self.lock:
+            for _ in range(count):
+                self.history.insert(0, self.rng.randrange(CATALOGUE_SIZE))
+            del self.history[self.history_limit:]
+
+    def fail(self, status, times=1, retry_after=None, delay=0.0):
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        with self.lock:
+            self.failures.extend([(status, headers, delay)] * times)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client timed out first
+                    pass
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                with server.lock:
+                    server.requests.append(self.path)
+                    server.connections.add(self.client_address)
+                    failure = server.failures.pop(0) if server.failures else None
+                    history = list(server.history)
+
+                if failure:
+                    status, headers, delay = failure
+                    time.sleep(delay)
+                    self._send(status, {"errors": [{"status": str(status)}]}, headers)
+                    return
+
+                time.sleep(server.delay)
+                if url.path != server.path:
+                    self._send(404, {"errors": [{"status": "404"}]})
+                    return
+                if "Music-User-Token" not in self.headers:
+                    self._send(403, {"errors": [{"status": "403"}]})
+                    return
+
+                limit = min(int(query.get("limit", [server.page_limit])[0]), server.page_limit)
+                offset = int(query.get("offset", ["0"])[0])
+                body = {"data": [_resource(index) for index in history[offset:offset + limit]]}
+                if offset + limit < len(history):
+                    body["next"] = f"{server.path}?offset={offset + limit}"
+                self._send(200, body)
+
+        return Handler
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,126 @@
+"""
+Synthetic history generator shared by the benchmarks.
+
+Produces items shaped exactly like site/build.py's item_from_row() output, so they
+can be fed straight into the renderer, or inserted into a scratch database.
+"""
+
+import random
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+
+EVENT_MIX = [
+    ("music", 0.70),
+    ("link", 0.10),
+    ("video", 0.05),
+    ("photo", 0.05),
+    ("meal", 0.03),
+    ("place", 0.04),
+    ("note", 0.03),
+]
+
+WORDS = (
+    "blue night city river paper glass summer echo velvet signal garden motor "
+    "silver static honey window ghost orbit coffee neon harbor cinema quiet"
+).split()
+
+
+def _phrase(rng, low=2, high=5):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _pick_type(rng):
+    roll = rng.random()
+    total = 0.0
+    for event_type, weight in EVENT_MIX:
+        total += weight
+        if roll < total:
+            return event_type
+    return EVENT_MIX[-1][0]
+
+
+def _media(rng, day, widths=(320, 640, 1280)):
+    media_id = uuid.UUID(int=rng.getrandbits(128))
+    width, height = rng.choice([(4032, 3024), (3024, 4032), (1920, 1080)])
+    base = f"/images/{day:%Y/%m/%d}/{media_id}"
+    variants = []
+    for variant_width in widths:
+        if variant_width < width:
+            variants.append({
+                "path": f"{base}-{variant_width}w.webp",
+                "width": variant_width,
+                "height": round(height * variant_width / width),
+            })
+    return {
+        "id": str(media_id),
+        "path": f"{base}.webp",
+        "width": width,
+        "height": height,
+        "variants": variants,
+    }
+
+
+def synthetic_items(count, items_per_day=40, seed=42, end_day=None):
+    """Yield `count` items, newest day first, `items_per_day` on average per day."""
+    rng = random.Random(seed)
+    day = end_day or date(2026, 1, 1)
+    produced = 0
+
+    while produced < count:
+        todays = min(count - produced, max(1, int(rng.gauss(items_per_day, items_per_day / 4))))
+        moments = sorted(
+            (datetime.combine(day, time(0), tzinfo=timezone.utc) + timedelta(seconds=rng.randint(0, 86399))
+             for _ in range(todays)),
+            reverse=True,
+        )
+
+        for occurred_at in moments:
+            event_type = _pick_type(rng)
+            item = {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "occurred_at": occurred_at.isoformat(),
+                "day": day.isoformat(),
+                "type": event_type,
+                "title": _phrase(rng),
+                "url": "",
+                "payload": {},
+                "media": [],
+            }
+
+            if event_type == "music":
+                item["url"] = f"https://music.apple.com/us/song/{rng.randint(10**8, 10**9)}"
+                item["payload"] = {
+                    "artist": _phrase(rng, 1, 3),
+                    "album": _phrase(rng, 1, 4),
+                    "artwork_url": "",
+                    "duration_ms": rng.randint(120_000, 360_000),
+                }
+            elif event_type in ("link", "video"):
+                item["url"] = f"https://example.com/{_phrase(rng, 1, 3).replace(' ', '-')}"
+            elif event_type == "place":
+                item["title"] = f"Apple Maps {_phrase(rng, 1, 3)}"
+                item["url"] = "https://maps.apple.com/?q=place"
+                item["payload"] = {"address": f"{rng.randint(1, 999)} {_phrase(rng, 1, 2)} st"}
+            elif event_type == "note":
+                item["payload"] = {"text": _phrase(rng, 4, 12)}
+            elif event_type in ("photo", "meal"):
+                item["media"] = [_media(rng, day)]
+
+            yield item
+            produced += 1
+
+        day -= timedelta(days=1)
+
+
+def group_by_day(items):
+    """Group an ordered item stream into render_day() inputs without sorting."""
+    current_day = None
+    current = []
+    for item in items:
+        if item["day"] != current_day and current:
+            yield {"day": current_day, "events": current}
+            current = []
+        current_day = item["day"]
+        current.append(item)
+    if current:
+        yield {"day": current_day, "events": current}
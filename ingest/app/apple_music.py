@@ -1,10 +1,50 @@
 import os
+import time
+import random
 import requests
-from typing import List, Dict, Optional
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from typing import Callable, List, Dict, Optional
 from datetime import datetime, timedelta
 import pytz
 
 
+APPLE_MUSIC_API_URL = os.getenv("APPLE_MUSIC_API_URL", "https://api.music.apple.com")
+# The API serves recently played tracks at most this many per page
+APPLE_MUSIC_PAGE_LIMIT = 30
+# Pages followed through `next` before giving up on reaching the previous snapshot
+APPLE_MUSIC_MAX_PAGES = int(os.getenv("APPLE_MUSIC_MAX_PAGES", "5"))
+APPLE_MUSIC_CONNECT_TIMEOUT = float(os.getenv("APPLE_MUSIC_CONNECT_TIMEOUT", "5"))
+APPLE_MUSIC_READ_TIMEOUT = float(os.getenv("APPLE_MUSIC_READ_TIMEOUT", "15"))
+# Hard limit on one get_recently_played() call, retries and waits included
+APPLE_MUSIC_DEADLINE = float(os.getenv("APPLE_MUSIC_DEADLINE", "60"))
+APPLE_MUSIC_MAX_ATTEMPTS = int(os.getenv("APPLE_MUSIC_MAX_ATTEMPTS", "4"))
+APPLE_MUSIC_RETRY_BASE_DELAY = float(os.getenv("APPLE_MUSIC_RETRY_BASE_DELAY", "1"))
+APPLE_MUSIC_RETRY_MAX_DELAY = float(os.getenv("APPLE_MUSIC_RETRY_MAX_DELAY", "30"))
+
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    # Retry-After is either seconds or an HTTP date
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(pytz.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(attempt: int) -> float:
+    # Same full-jitter backoff as storage.py
+    return random.uniform(0, min(APPLE_MUSIC_RETRY_MAX_DELAY, APPLE_MUSIC_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
 class AppleMusicClient:
     def __init__(self):
         self.developer_token = os.getenv("APPLE_DEVELOPER_TOKEN")
@@ -15,26 +55,88 @@ class AppleMusicClient:
         if not self.user_token:
             raise ValueError("APPLE_MUSIC_USER_TOKEN environment variable is required")
 
-        self.base_url = "https://api.music.apple.com/v1"
+        self.api_url = APPLE_MUSIC_API_URL.rstrip("/")
+        self.base_url = f"{self.api_url}/v1"
         self.headers = {
             "Authorization": f"Bearer {self.developer_token}",
             "Music-User-Token": self.user_token,
         }
 
-    def get_recently_played(self, limit: int = 30) -> List[Dict]:
+        # One session per client: the daemon's polls and each poll's pages share a
+        # kept-alive connection instead of a TLS handshake per request
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+    def close(self):
+        self.session.close()
+
+    def _get(self, url: str, params: Optional[Dict], deadline: float) -> Dict:
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise requests.exceptions.Timeout(f"Apple Music request gave up after {APPLE_MUSIC_DEADLINE:.0f}s")
+
+            delay = None
+            try:
+                response = self.session.get(
+                    url,
+                    params=params,
+                    timeout=(min(APPLE_MUSIC_CONNECT_TIMEOUT, remaining), min(APPLE_MUSIC_READ_TIMEOUT, remaining))
+                )
+                if response.status_code not in _RETRYABLE_STATUS:
+                    response.raise_for_status()
+                    return response.json()
+                error = requests.exceptions.HTTPError(f"{response.status_code} from {url}", response=response)
+                delay = retry_after(response)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+
+            if attempt >= APPLE_MUSIC_MAX_ATTEMPTS:
+                raise error
+
+            # A rate limit's Retry-After wins over the backoff schedule
+            if delay is None:
+                delay = retry_delay(attempt)
+            if time.monotonic() + delay >= deadline:
+                raise error
+
+            print(f"⚠ Apple Music request failed (attempt {attempt}): {error}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def get_recently_played(
+        self,
+        limit: int = APPLE_MUSIC_PAGE_LIMIT,
+        max_pages: int = APPLE_MUSIC_MAX_PAGES,
+        until: Optional[Callable[[List[Dict]], bool]] = None
+    ) -> List[Dict]:
+        # Newest first. Follows `next` for up to max_pages pages, stopping early once
+        # until(songs so far) is true, e.g. when the previous snapshot has been reached.
         url = f"{self.base_url}/me/recent/played/tracks"
-        params = {"limit": limit}
+        params = {"limit": min(limit, APPLE_MUSIC_PAGE_LIMIT)}
+        deadline = time.monotonic() + APPLE_MUSIC_DEADLINE
 
+        songs = []
+        position = 0
         try:
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            songs = []
-            for position, item in enumerate(data.get("data", [])):
-                song = self._parse_song(item, position)
-                if song:
-                    songs.append(song)
+            for _ in range(max_pages):
+                data = self._get(url, params, deadline)
+
+                for item in data.get("data", []):
+                    song = self._parse_song(item, position)
+                    position += 1
+                    if song:
+                        songs.append(song)
+
+                next_path = data.get("next")
+                if not next_path or (until is not None and until(songs)):
+                    break
+                # `next` is a path with its own offset; the page size has to be repeated
+                url = f"{self.api_url}{next_path}"
+                params = {"limit": params["limit"]} if "limit=" not in next_path else None
 
             return songs
 
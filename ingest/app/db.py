@@ -58,6 +58,36 @@ async def create_event(
     return event_id
 
 
+async def create_events_bulk(events: List[Dict[str, Any]]) -> List[uuid.UUID]:
+    records = []
+    for event in events:
+        event_id = event.get("event_id") or uuid.uuid4()
+        records.append((
+            event_id,
+            event["occurred_at"],
+            date.fromisoformat(event["day"]),
+            event["event_type"],
+            event["title"],
+            event.get("url"),
+            json.dumps(event.get("payload") or {})
+        ))
+
+    if not records:
+        return []
+
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.copy_records_to_table(
+                "consumed_events",
+                records=records,
+                columns=["id", "occurred_at", "day", "type", "title", "url", "payload"]
+            )
+
+    return [record[0] for record in records]
+
+
 async def create_media(
     event_id: uuid.UUID,
     path: str,
@@ -65,7 +95,9 @@ async def create_media(
     height: Optional[int] = None,
     bytes: Optional[int] = None,
     content_type: Optional[str] = None,
-    media_id: Optional[uuid.UUID] = None
+    media_id: Optional[uuid.UUID] = None,
+    status: str = "ready",
+    source_hash: Optional[str] = None
 ) -> uuid.UUID:
     if media_id is None:
         media_id = uuid.uuid4()
@@ -75,8 +107,8 @@ async def create_media(
     async with pool.acquire() as conn:
         await conn.execute(
             """
-            INSERT INTO consumed_media (id, event_id, path, width, height, bytes, content_type)
-            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            INSERT INTO consumed_media (id, event_id, path, width, height, bytes, content_type, status, source_hash)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
             """,
             media_id,
             event_id,
@@ -84,12 +116,165 @@ async def create_media(
             width,
             height,
             bytes,
-            content_type
+            content_type,
+            status,
+            source_hash
         )
 
     return media_id
 
 
+async def find_media_by_hash(source_hash: str) -> Optional[Dict[str, Any]]:
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT id, path, width, height, bytes
+            FROM consumed_media
+            WHERE source_hash = $1 AND status = 'ready'
+            LIMIT 1
+            """,
+            source_hash
+        )
+
+        if not row:
+            return None
+
+        variants = await conn.fetch(
+            """
+            SELECT path, width, height, bytes
+            FROM consumed_media_variants
+            WHERE media_id = $1
+            ORDER BY width DESC
+            """,
+            row["id"]
+        )
+
+    return {
+        "id": row["id"],
+        "path": row["path"],
+        "width": row["width"],
+        "height": row["height"],
+        "bytes": row["bytes"],
+        "variants": [(v["path"], v["width"], v["height"], v["bytes"]) for v in variants],
+    }
+
+
+async def create_media_variants(
+    media_id: uuid.UUID,
+    variants: List[Tuple[str, int, int, int]]
+) -> None:
+    if not variants:
+        return
+
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        await conn.executemany(
+            """
+            INSERT INTO consumed_media_variants (media_id, path, width, height, bytes)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (media_id, width) DO UPDATE
+            SET path = EXCLUDED.path, height = EXCLUDED.height, bytes = EXCLUDED.bytes
+            """,
+            [(media_id, path, width, height, size) for path, width, height, size in variants]
+        )
+
+
+async def mark_media_ready(
+    media_id: uuid.UUID,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    bytes: Optional[int] = None
+) -> None:
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            UPDATE consumed_media
+            SET status = 'ready', width = $2, height = $3, bytes = $4
+            WHERE id = $1
+            """,
+            media_id,
+            width,
+            height,
+            bytes
+        )
+
+
+async def mark_media_failed(media_id: uuid.UUID) -> None:
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        await conn.execute(
+            "UPDATE consumed_media SET status = 'failed' WHERE id = $1",
+            media_id
+        )
+
+
+SONG_DEDUP_WINDOW = timedelta(minutes=10)
+SONG_DEDUP_MIN_WINDOW = timedelta(minutes=1)
+
+
+def song_dedup_window(duration_ms: Optional[int]) -> timedelta:
+    # Plays of a track closer than half its length are one play: a replay can't start before
+    # the previous play ended. Must match the unique index in migrations/013.
+    if not duration_ms:
+        return SONG_DEDUP_WINDOW
+    return min(SONG_DEDUP_WINDOW, max(SONG_DEDUP_MIN_WINDOW, timedelta(milliseconds=duration_ms / 2)))
+
+
+async def _find_stored_song(
+    conn: asyncpg.Connection,
+    played_at: datetime,
+    title: str,
+    artist: str,
+    apple_music_id: Optional[str],
+    duration_ms: Optional[int] = None
+) -> Optional[uuid.UUID]:
+    if apple_music_id:
+        window = song_dedup_window(duration_ms)
+        return await conn.fetchval(
+            """
+            SELECT id FROM consumed_songs
+            WHERE apple_music_id = $1
+              AND played_at BETWEEN $2 AND $3
+            LIMIT 1
+            """,
+            apple_music_id,
+            played_at - window,
+            played_at + window
+        )
+
+    return await conn.fetchval(
+        """
+        SELECT id FROM consumed_songs
+        WHERE played_at = $1 AND title = $2 AND artist = $3 AND apple_music_id IS NULL
+        """,
+        played_at,
+        title,
+        artist
+    )
+
+
+async def _find_conflicting_song(
+    conn: asyncpg.Connection,
+    played_at: datetime,
+    title: str,
+    artist: str,
+    apple_music_id: Optional[str],
+    duration_ms: Optional[int] = None
+) -> uuid.UUID:
+    # The stored play that made ON CONFLICT DO NOTHING turn this one away. The unique indexes
+    # only conflict inside the dedup window, so a miss means they and the window disagree.
+    existing = await _find_stored_song(conn, played_at, title, artist, apple_music_id, duration_ms)
+    if existing is None:
+        raise RuntimeError(f"Play of {title} - {artist} at {played_at} was rejected as a duplicate, but no stored play matches it")
+    return existing
+
+
 async def create_song(
     played_at: datetime,
     day: str,
@@ -115,33 +300,11 @@ async def create_song(
         release_date_obj = date.fromisoformat(release_date)
 
     async with pool.acquire() as conn:
-        if apple_music_id:
-            existing = await conn.fetchrow(
-                """
-                SELECT id FROM consumed_songs
-                WHERE apple_music_id = $1
-                  AND played_at BETWEEN $2 AND $3
-                LIMIT 1
-                """,
-                apple_music_id,
-                played_at - timedelta(minutes=10),
-                played_at + timedelta(minutes=10)
-            )
-        else:
-            existing = await conn.fetchrow(
-                """
-                SELECT id FROM consumed_songs
-                WHERE played_at = $1 AND title = $2 AND artist = $3
-                """,
-                played_at,
-                title,
-                artist
-            )
-
+        existing = await _find_stored_song(conn, played_at, title, artist, apple_music_id, duration_ms)
         if existing:
-            return existing["id"], False
+            return existing, False
 
-        await conn.execute(
+        inserted = await conn.fetchval(
             """
             INSERT INTO consumed_songs (
                 id, played_at, day, title, artist, album,
@@ -149,6 +312,8 @@ async def create_song(
                 apple_music_url, artwork_url, payload
             )
             VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13::jsonb)
+            ON CONFLICT DO NOTHING
+            RETURNING id
             """,
             song_id,
             played_at,
@@ -165,9 +330,161 @@ async def create_song(
             json.dumps(payload)
         )
 
+        if inserted is None:
+            # A concurrent sync stored the same play first; the unique indexes kept theirs
+            existing = await _find_conflicting_song(conn, played_at, title, artist, apple_music_id, duration_ms)
+            return existing, False
+
         return song_id, True
 
 
+def _is_same_play(song: Dict[str, Any], other: Dict[str, Any]) -> bool:
+    if song.get("apple_music_id"):
+        return (
+            song["apple_music_id"] == other.get("apple_music_id")
+            and abs(song["played_at"] - other["played_at"]) <= song_dedup_window(song.get("duration_ms"))
+        )
+    return (
+        not other.get("apple_music_id")
+        and (song["played_at"], song["title"], song["artist"]) == (other["played_at"], other["title"], other["artist"])
+    )
+
+
+async def _find_stored_songs(conn: asyncpg.Connection, songs: List[Dict[str, Any]]) -> Dict[int, uuid.UUID]:
+    rows = await conn.fetch(
+        """
+        SELECT c.idx, existing.id
+        FROM unnest($1::int[], $2::text[], $3::timestamptz[], $4::text[], $5::text[], $6::interval[])
+            AS c(idx, apple_music_id, played_at, title, artist, dedup_window)
+        CROSS JOIN LATERAL (
+            SELECT s.id FROM consumed_songs s
+            WHERE (
+                c.apple_music_id IS NOT NULL
+                AND s.apple_music_id = c.apple_music_id
+                AND s.played_at BETWEEN c.played_at - c.dedup_window AND c.played_at + c.dedup_window
+            ) OR (
+                c.apple_music_id IS NULL AND s.apple_music_id IS NULL
+                AND s.played_at = c.played_at AND s.title = c.title AND s.artist = c.artist
+            )
+            LIMIT 1
+        ) existing
+        """,
+        list(range(len(songs))),
+        [song.get("apple_music_id") or None for song in songs],
+        [song["played_at"] for song in songs],
+        [song["title"] for song in songs],
+        [song["artist"] for song in songs],
+        [song_dedup_window(song.get("duration_ms")) for song in songs]
+    )
+    return {row["idx"]: row["id"] for row in rows}
+
+
+async def _store_songs(conn: asyncpg.Connection, songs: List[Dict[str, Any]]) -> List[Tuple[uuid.UUID, bool]]:
+    stored = await _find_stored_songs(conn, songs)
+
+    results: List[Tuple[uuid.UUID, bool]] = []
+    accepted: List[Tuple[int, uuid.UUID, Dict[str, Any]]] = []
+
+    for idx, song in enumerate(songs):
+        if idx in stored:
+            results.append((stored[idx], False))
+            continue
+
+        # The same play listed twice in one batch is still one play
+        earlier = next((song_id for _, song_id, other in accepted if _is_same_play(song, other)), None)
+        if earlier is not None:
+            results.append((earlier, False))
+            continue
+
+        song_id = uuid.uuid4()
+        accepted.append((idx, song_id, song))
+        results.append((song_id, True))
+
+    if not accepted:
+        return results
+
+    new_songs = [song for _, _, song in accepted]
+    inserted_ids = await conn.fetch(
+        """
+        INSERT INTO consumed_songs (
+            id, played_at, day, title, artist, album,
+            apple_music_id, isrc, duration_ms, release_date,
+            apple_music_url, artwork_url, payload
+        )
+        SELECT id, played_at, day, title, artist, album,
+               apple_music_id, isrc, duration_ms, release_date,
+               apple_music_url, artwork_url, payload::jsonb
+        FROM unnest(
+            $1::uuid[], $2::timestamptz[], $3::date[], $4::text[], $5::text[], $6::text[],
+            $7::text[], $8::text[], $9::int[], $10::date[], $11::text[], $12::text[], $13::text[]
+        ) AS t(
+            id, played_at, day, title, artist, album,
+            apple_music_id, isrc, duration_ms, release_date,
+            apple_music_url, artwork_url, payload
+        )
+        ON CONFLICT DO NOTHING
+        RETURNING id
+        """,
+        [song_id for _, song_id, _ in accepted],
+        [song["played_at"] for song in new_songs],
+        [date.fromisoformat(song["day"]) for song in new_songs],
+        [song["title"] for song in new_songs],
+        [song["artist"] for song in new_songs],
+        [song.get("album") for song in new_songs],
+        [song.get("apple_music_id") for song in new_songs],
+        [song.get("isrc") for song in new_songs],
+        [song.get("duration_ms") for song in new_songs],
+        [date.fromisoformat(song["release_date"]) if song.get("release_date") else None for song in new_songs],
+        [song.get("apple_music_url") for song in new_songs],
+        [song.get("artwork_url") for song in new_songs],
+        [json.dumps(song.get("payload") or {}) for song in new_songs]
+    )
+
+    # Anything the unique indexes turned away was stored by a concurrent sync
+    inserted = {row["id"] for row in inserted_ids}
+    lost = [(idx, song) for idx, song_id, song in accepted if song_id not in inserted]
+    if lost:
+        winners = await _find_stored_songs(conn, [song for _, song in lost])
+        for position, (idx, song) in enumerate(lost):
+            winner = winners.get(position)
+            if winner is None:
+                raise RuntimeError(
+                    f"Play of {song['title']} - {song['artist']} at {song['played_at']} was rejected "
+                    "as a duplicate, but no stored play matches it"
+                )
+            results[idx] = (winner, False)
+
+    return results
+
+
+# Same dedup rules as create_song(), applied to a whole batch: one query finds the plays that
+# are already stored, then the survivors go in with one INSERT ... SELECT, all inside one
+# transaction. Returns (song_id, was_inserted) for each input song, in order.
+#
+# sync_log, if given, takes create_sync_log()'s arguments except songs_added and is written in
+# the same transaction, so stored plays and the snapshot they were diffed from can't diverge.
+async def create_songs_bulk(
+    songs: List[Dict[str, Any]],
+    sync_log: Optional[Dict[str, Any]] = None
+) -> List[Tuple[uuid.UUID, bool]]:
+    if not songs and sync_log is None:
+        return []
+
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            results = await _store_songs(conn, songs) if songs else []
+            if sync_log is not None:
+                await _insert_sync_log(
+                    conn,
+                    songs_added=sum(1 for _, was_inserted in results if was_inserted),
+                    **sync_log
+                )
+
+    return results
+
+
 async def close_pool():
     global _pool
     if _pool:
@@ -175,13 +492,14 @@ async def close_pool():
         _pool = None
 
 
-async def get_last_api_song_ids() -> Optional[List[str]]:
+async def get_last_sync_snapshot() -> Optional[Tuple[List[str], datetime]]:
+    # The recently-played list as of the last successful sync, newest first, and when it was taken
     pool = await get_db_connection()
 
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             """
-            SELECT api_song_ids
+            SELECT api_song_ids, synced_at
             FROM apple_music_sync_log
             WHERE status = 'success' AND api_song_ids IS NOT NULL
             ORDER BY synced_at DESC
@@ -192,10 +510,16 @@ async def get_last_api_song_ids() -> Optional[List[str]]:
         if not row or not row["api_song_ids"]:
             return None
 
-        return row["api_song_ids"]
+        # No jsonb codec on this pool, so the list arrives as JSON text
+        song_ids = row["api_song_ids"]
+        if isinstance(song_ids, str):
+            song_ids = json.loads(song_ids)
 
+        return song_ids, row["synced_at"]
 
-async def create_sync_log(
+
+async def _insert_sync_log(
+    conn: asyncpg.Connection,
     songs_fetched: int,
     songs_added: int,
     latest_song_id: Optional[str] = None,
@@ -204,24 +528,132 @@ async def create_sync_log(
     error_message: Optional[str] = None
 ) -> uuid.UUID:
     sync_id = uuid.uuid4()
+    await conn.execute(
+        """
+        INSERT INTO apple_music_sync_log (
+            id, songs_fetched, songs_added, latest_song_id, api_song_ids, status, error_message
+        )
+        VALUES ($1, $2, $3, $4, $5::jsonb, $6, $7)
+        """,
+        sync_id,
+        songs_fetched,
+        songs_added,
+        latest_song_id,
+        json.dumps(api_song_ids) if api_song_ids else None,
+        status,
+        error_message
+    )
+    return sync_id
+
+
+async def create_sync_log(
+    songs_fetched: int,
+    songs_added: int,
+    latest_song_id: Optional[str] = None,
+    api_song_ids: Optional[List[str]] = None,
+    status: str = "success",
+    error_message: Optional[str] = None
+) -> uuid.UUID:
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        return await _insert_sync_log(
+            conn, songs_fetched, songs_added, latest_song_id, api_song_ids, status, error_message
+        )
+
+
+async def reserve_idempotent_key(
+    key: str,
+    fingerprint: str,
+    max_age_seconds: int,
+    stale_seconds: int
+) -> Tuple[str, Optional[Tuple[int, Any]]]:
+    # Returns ("reserved", None) when the caller now owns the key, ("done", (status, body))
+    # when a response is stored, ("pending", None) while another request holds it, or
+    # ("mismatch", None) when the key belongs to a request with another fingerprint.
+    # Expired responses and reservations not refreshed for stale_seconds are taken over.
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        reserved = await conn.fetchval(
+            """
+            INSERT INTO idempotency_keys AS k (key, status_code, response, fingerprint)
+            VALUES ($1, NULL, NULL, $4)
+            ON CONFLICT (key) DO UPDATE
+            SET status_code = NULL, response = NULL, fingerprint = EXCLUDED.fingerprint, created_at = NOW()
+            WHERE k.created_at < NOW() - ($2::int * INTERVAL '1 second')
+               OR (
+                   k.status_code IS NULL AND k.created_at < NOW() - ($3::int * INTERVAL '1 second')
+                   AND (k.fingerprint IS NULL OR k.fingerprint = EXCLUDED.fingerprint)
+               )
+            RETURNING TRUE
+            """,
+            key,
+            max_age_seconds,
+            stale_seconds,
+            fingerprint
+        )
+        if reserved:
+            return "reserved", None
+
+        row = await conn.fetchrow(
+            "SELECT status_code, response, fingerprint FROM idempotency_keys WHERE key = $1",
+            key
+        )
+
+    if row is None:
+        # Released between the two statements; treat it as still busy and let the client retry
+        return "pending", None
+    if row["fingerprint"] is not None and row["fingerprint"] != fingerprint:
+        return "mismatch", None
+    if row["status_code"] is None:
+        return "pending", None
+
+    return "done", (row["status_code"], json.loads(row["response"]))
+
+
+async def refresh_idempotent_key(key: str) -> None:
+    # Keeps a reservation whose request is still running from being taken for abandoned
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        await conn.execute(
+            "UPDATE idempotency_keys SET created_at = NOW() WHERE key = $1 AND status_code IS NULL",
+            key
+        )
+
+
+async def complete_idempotent_key(key: str, status_code: int, response: Any) -> None:
     pool = await get_db_connection()
 
     async with pool.acquire() as conn:
         await conn.execute(
             """
-            INSERT INTO apple_music_sync_log (
-                id, songs_fetched, songs_added, latest_song_id, api_song_ids, status, error_message
-            )
-            VALUES ($1, $2, $3, $4, $5::jsonb, $6, $7)
+            UPDATE idempotency_keys
+            SET status_code = $2, response = $3::jsonb, created_at = NOW()
+            WHERE key = $1
             """,
-            sync_id,
-            songs_fetched,
-            songs_added,
-            latest_song_id,
-            json.dumps(api_song_ids) if api_song_ids else None,
-            status,
-            error_message
+            key,
+            status_code,
+            json.dumps(response)
         )
 
-    return sync_id
 
+async def release_idempotent_key(key: str) -> None:
+    # Drops an unfinished reservation so the request can be retried
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        await conn.execute("DELETE FROM idempotency_keys WHERE key = $1 AND status_code IS NULL", key)
+
+
+async def prune_idempotency_keys(max_age_seconds: int) -> int:
+    pool = await get_db_connection()
+
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            "DELETE FROM idempotency_keys WHERE created_at < NOW() - ($1::int * INTERVAL '1 second')",
+            max_age_seconds
+        )
+
+    return int(result.split()[-1])
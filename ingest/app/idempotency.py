@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple, Callable, Awaitable
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from .db import reserve_idempotent_key, refresh_idempotent_key, complete_idempotent_key, release_idempotent_key
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1024"))
+# A reservation not refreshed for this long is assumed to belong to a crashed worker; running
+# requests refresh theirs every third of it
+IDEMPOTENCY_STALE_SECONDS = int(os.getenv("IDEMPOTENCY_STALE_SECONDS", "300"))
+IDEMPOTENCY_COMPLETE_ATTEMPTS = 3
+MAX_KEY_LENGTH = 255
+
+_cache: "OrderedDict[str, Tuple[float, str, int, Any]]" = OrderedDict()
+_locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+
+def _cache_get(cache_key: str) -> Optional[Tuple[str, int, Any]]:
+    entry = _cache.get(cache_key)
+    if entry is None:
+        return None
+
+    stored_at, fingerprint, status_code, body = entry
+    if time.monotonic() - stored_at > IDEMPOTENCY_TTL_SECONDS:
+        del _cache[cache_key]
+        return None
+
+    _cache.move_to_end(cache_key)
+    return fingerprint, status_code, body
+
+
+def _cache_put(cache_key: str, fingerprint: str, status_code: int, body: Any) -> None:
+    _cache[cache_key] = (time.monotonic(), fingerprint, status_code, body)
+    _cache.move_to_end(cache_key)
+    while len(_cache) > IDEMPOTENCY_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+async def _acquire(cache_key: str) -> asyncio.Lock:
+    lock, waiters = _locks.get(cache_key, (asyncio.Lock(), 0))
+    _locks[cache_key] = (lock, waiters + 1)
+    await lock.acquire()
+    return lock
+
+
+def _release(cache_key: str, lock: asyncio.Lock) -> None:
+    lock.release()
+    _, waiters = _locks[cache_key]
+    if waiters <= 1:
+        del _locks[cache_key]
+    else:
+        _locks[cache_key] = (lock, waiters - 1)
+
+
+def _replay(status_code: int, body: Any) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content=body, headers={"Idempotent-Replayed": "true"})
+
+
+def _mismatch() -> JSONResponse:
+    return JSONResponse(
+        status_code=422,
+        content={"detail": "Idempotency-Key was already used for a different request"}
+    )
+
+
+def request_fingerprint(request: Request, body: bytes) -> str:
+    # What a key is tied to: a retry must repeat the method, path, query and body
+    head = f"{request.method}\n{request.url.path}\n{request.url.query}\n".encode("utf-8")
+    return hashlib.sha256(head + body).hexdigest()
+
+
+async def run_idempotent(
+    key: Optional[str],
+    scope: str,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Any]]
+) -> Any:
+    if not key:
+        return await handler()
+
+    if len(key) > MAX_KEY_LENGTH:
+        return JSONResponse(status_code=400, content={"detail": "Idempotency-Key is too long"})
+
+    cache_key = f"{scope}:{key}"
+
+    # Retries reaching this worker wait for the first one; the reservation below covers
+    # retries that land on another worker
+    lock = await _acquire(cache_key)
+    try:
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            cached_fingerprint, status_code, body = cached
+            if cached_fingerprint != fingerprint:
+                return _mismatch()
+            return _replay(status_code, body)
+
+        state, stored = await reserve_idempotent_key(
+            cache_key, fingerprint, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_STALE_SECONDS
+        )
+        if state == "mismatch":
+            return _mismatch()
+        if state == "done":
+            _cache_put(cache_key, fingerprint, *stored)
+            return _replay(*stored)
+        if state == "pending":
+            return JSONResponse(
+                status_code=409,
+                content={"detail": "A request with this Idempotency-Key is still in progress"},
+                headers={"Retry-After": "1"}
+            )
+
+        heartbeat = asyncio.create_task(_keep_reserved(cache_key))
+        try:
+            try:
+                result = await handler()
+            except BaseException:
+                await _release_reservation(cache_key)
+                raise
+
+            if isinstance(result, JSONResponse):
+                status_code, body = result.status_code, json.loads(result.body)
+            else:
+                status_code, body = 200, result
+
+            # Only successes are replayed; failed attempts stay retryable
+            if not 200 <= status_code < 300:
+                await _release_reservation(cache_key)
+                return result
+
+            _cache_put(cache_key, fingerprint, status_code, body)
+            await _complete_reservation(cache_key, status_code, body)
+            return result
+
+        finally:
+            heartbeat.cancel()
+
+    finally:
+        _release(cache_key, lock)
+
+
+async def _keep_reserved(cache_key: str) -> None:
+    # However long the handler runs, the reservation must not look abandoned to other workers
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_STALE_SECONDS / 3)
+        try:
+            await refresh_idempotent_key(cache_key)
+        except Exception as e:
+            print(f"⚠ Could not refresh idempotency key {cache_key}: {e}")
+
+
+async def _complete_reservation(cache_key: str, status_code: int, body: Any) -> None:
+    # The work is done; failing the request now would only invite a duplicate retry. The
+    # reservation is still refreshed while this retries. If every attempt fails, this worker
+    # keeps replaying from its cache, and the others answer 409 until the reservation goes stale.
+    for attempt in range(1, IDEMPOTENCY_COMPLETE_ATTEMPTS + 1):
+        try:
+            await complete_idempotent_key(cache_key, status_code, body)
+            return
+        except Exception as e:
+            if attempt == IDEMPOTENCY_COMPLETE_ATTEMPTS:
+                print(f"⚠ Could not store idempotent response for {cache_key}: {e}")
+                return
+            await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+
+async def _release_reservation(cache_key: str) -> None:
+    try:
+        await release_idempotent_key(cache_key)
+    except Exception as e:
+        print(f"⚠ Could not release idempotency key {cache_key}: {e}")
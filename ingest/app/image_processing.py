@@ -1,25 +1,110 @@
 from PIL import Image
 import io
-from typing import Tuple
+import os
+from typing import Tuple, List, Optional, Sequence
 
+# Widths for the responsive ladder; the full-resolution original is always kept as well
+VARIANT_WIDTHS = [
+    int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,1280").split(",") if width.strip()
+]
 
-def convert_to_webp(image_bytes: bytes, quality: int = 90) -> Tuple[bytes, int, int]:
-    image = Image.open(io.BytesIO(image_bytes))
 
+def _to_rgb(image: Image.Image) -> Image.Image:
     if image.mode in ("RGBA", "LA", "P"):
         rgb_image = Image.new("RGB", image.size, (255, 255, 255))
         if image.mode == "P":
             image = image.convert("RGBA")
         rgb_image.paste(image, mask=image.split()[-1] if image.mode in ("RGBA", "LA") else None)
-        image = rgb_image
+        return rgb_image
     elif image.mode != "RGB":
-        image = image.convert("RGB")
+        return image.convert("RGB")
+    return image
 
-    width, height = image.size
 
+def _encode_webp(image: Image.Image, quality: int) -> bytes:
     webp_buffer = io.BytesIO()
     image.save(webp_buffer, format="WEBP", quality=quality, method=6)
-    webp_bytes = webp_buffer.getvalue()
+    return webp_buffer.getvalue()
+
+
+def convert_to_webp(image_bytes: bytes, quality: int = 90) -> Tuple[bytes, int, int]:
+    image = _to_rgb(Image.open(io.BytesIO(image_bytes)))
+
+    width, height = image.size
+
+    webp_bytes = _encode_webp(image, quality)
 
     return webp_bytes, width, height
 
+
+def _ladder(image: Image.Image, widths: Sequence[int]):
+    # Each variant is resized from the previous one with a reducing gap so Pillow
+    # does most of the work in its fast integer reduce() path
+    source = image
+    for target_width in sorted(set(widths), reverse=True):
+        if target_width >= source.width:
+            continue
+
+        target_height = max(1, round(source.height * target_width / source.width))
+        source = source.resize((target_width, target_height), Image.LANCZOS, reducing_gap=3.0)
+        yield source
+
+
+# Decodes once; the first tuple is full resolution, then descending widths
+def convert_to_webp_variants(
+    image_bytes: bytes,
+    widths: Optional[Sequence[int]] = None,
+    quality: int = 90
+) -> List[Tuple[bytes, int, int]]:
+    if widths is None:
+        widths = VARIANT_WIDTHS
+
+    image = _to_rgb(Image.open(io.BytesIO(image_bytes)))
+    width, height = image.size
+
+    results = [(_encode_webp(image, quality), width, height)]
+    for variant in _ladder(image, widths):
+        results.append((_encode_webp(variant, quality), variant.width, variant.height))
+
+    return results
+
+
+# File-to-file version for the ingest pipeline: the upload is decoded lazily from disk and
+# every encoding is written straight to output_dir, so no encoded buffers stay in memory.
+# Returns (path, width, height, bytes) tuples in the same order as convert_to_webp_variants.
+# With encode_original=False the first tuple describes source_path itself, for sources that
+# are already the stored WebP and would only lose quality from another encode.
+def convert_file_to_webp_variants(
+    source_path: str,
+    output_dir: str,
+    widths: Optional[Sequence[int]] = None,
+    quality: int = 90,
+    encode_original: bool = True
+) -> List[Tuple[str, int, int, int]]:
+    if widths is None:
+        widths = VARIANT_WIDTHS
+
+    results = []
+
+    def save(image: Image.Image, name: str) -> None:
+        path = os.path.join(output_dir, name)
+        image.save(path, format="WEBP", quality=quality, method=6)
+        results.append((path, image.width, image.height, os.path.getsize(path)))
+
+    with Image.open(source_path) as opened:
+        image = _to_rgb(opened)
+        if encode_original:
+            save(image, "original.webp")
+        else:
+            results.append((source_path, image.width, image.height, os.path.getsize(source_path)))
+        for variant in _ladder(image, widths):
+            save(variant, f"{variant.width}w.webp")
+
+    return results
+
+
+def variant_key(key: str, width: int) -> str:
+    base, dot, extension = key.rpartition(".")
+    if not dot:
+        return f"{key}-{width}w"
+    return f"{base}-{width}w.{extension}"
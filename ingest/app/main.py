@@ -1,11 +1,43 @@
-from fastapi import FastAPI, HTTPException, Header, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Header, Depends, Request, Query
 from fastapi.responses import JSONResponse
-from typing import Optional
+from typing import Optional, Dict, Any, List, Tuple
 import os
 import json
-from .db import get_db_connection, create_event, create_media
-from .r2 import upload_to_r2
-from .image_processing import convert_to_webp
+import shutil
+import hashlib
+import asyncio
+import tempfile
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
+from .db import (
+    get_db_connection,
+    create_event,
+    create_events_bulk,
+    create_media,
+    create_media_variants,
+    find_media_by_hash,
+    prune_idempotency_keys,
+)
+from .offload import (
+    PoolSaturated,
+    get_image_pool,
+    get_metrics,
+    image_pool_saturated,
+    shutdown_pools,
+    timed,
+)
+from .idempotency import run_idempotent, request_fingerprint, IDEMPOTENCY_TTL_SECONDS
+from .worker import (
+    process_image,
+    spool_data_file,
+    commit_job,
+    discard_job,
+    job_spooled,
+    enqueue,
+    spool_depth,
+    start_worker,
+    stop_worker,
+)
 import uuid
 from datetime import datetime
 import pytz
@@ -14,17 +46,34 @@ app = FastAPI(title="Consumed API", version="1.0.0")
 
 LA_TZ = pytz.timezone("America/Los_Angeles")
 
+BATCH_MAX_EVENTS = int(os.getenv("INGEST_BATCH_MAX_EVENTS", "500"))
+
+# Spool uploads and convert them in the background worker instead of inside the request
+BACKGROUND_IMAGES = os.getenv("IMAGE_PROCESSING_BACKGROUND", "false").lower() == "true"
+MEDIA_WORKER_ENABLED = os.getenv("MEDIA_WORKER_ENABLED", "true").lower() == "true"
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+# Room in Content-Length for the multipart boundaries, part headers and metadata field
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+UPLOAD_FIELD_MAX_BYTES = 64 * 1024
+
 
 @app.on_event("startup")
 async def startup_event():
     from .db import get_db_connection
     await get_db_connection()
+    await prune_idempotency_keys(IDEMPOTENCY_TTL_SECONDS)
+    get_image_pool()
+    if MEDIA_WORKER_ENABLED:
+        start_worker()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     from .db import close_pool
+    await stop_worker()
     await close_pool()
+    shutdown_pools()
 
 
 def verify_api_key(x_api_key: Optional[str] = Header(None)) -> str:
@@ -49,11 +98,29 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics(api_key: str = Depends(verify_api_key)):
+    result = get_metrics()
+    result["spool"] = {"depth": spool_depth()}
+    return result
+
+
 @app.post("/v1/events")
 async def create_event_endpoint(
+    request: Request,
     event_data: dict,
+    idempotency_key: Optional[str] = Header(None),
     api_key: str = Depends(verify_api_key)
 ):
+    return await run_idempotent(
+        idempotency_key,
+        "events",
+        request_fingerprint(request, await request.body()),
+        lambda: _create_event(event_data)
+    )
+
+
+async def _create_event(event_data: dict):
     try:
         occurred_at_str = event_data.get("occurred_at")
         if not occurred_at_str:
@@ -84,14 +151,290 @@ async def create_event_endpoint(
         raise HTTPException(status_code=500, detail=f"Error creating event: {str(e)}")
 
 
+def parse_batch_item(event_data: Any) -> Dict[str, Any]:
+    if not isinstance(event_data, dict):
+        raise ValueError("event must be a JSON object")
+
+    occurred_at_str = event_data.get("occurred_at")
+    if not occurred_at_str:
+        raise ValueError("occurred_at is required")
+
+    try:
+        occurred_at = datetime.fromisoformat(str(occurred_at_str).replace("Z", "+00:00"))
+    except ValueError as e:
+        raise ValueError(f"Invalid date format: {str(e)}")
+
+    event_type = event_data.get("type")
+    title = event_data.get("title")
+    if not event_type or not title:
+        raise ValueError("type and title are required")
+    if not isinstance(event_type, str) or not isinstance(title, str):
+        raise ValueError("type and title must be strings")
+
+    url = event_data.get("url")
+    if url is not None and not isinstance(url, str):
+        raise ValueError("url must be a string")
+
+    payload = event_data.get("payload", {})
+    if payload is not None and not isinstance(payload, dict):
+        raise ValueError("payload must be a JSON object")
+
+    # Postgres text and jsonb reject NUL; one such item would fail the whole COPY
+    if any("\x00" in value for value in (event_type, title, url or "")) or "\\u0000" in json.dumps(payload or {}):
+        raise ValueError("fields must not contain NUL characters")
+
+    return {
+        "occurred_at": occurred_at,
+        "day": derive_day(occurred_at),
+        "event_type": event_type,
+        "title": title,
+        "url": url,
+        "payload": payload or {},
+    }
+
+
+def parse_batch_body(body: bytes, content_type: str) -> List[Any]:
+    if "ndjson" in content_type or "jsonl" in content_type:
+        try:
+            text = body.decode("utf-8")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid NDJSON body: not UTF-8")
+
+        items = []
+        for line_number, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON on line {line_number}")
+        return items
+
+    try:
+        data = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+    if isinstance(data, dict) and isinstance(data.get("events"), list):
+        return data["events"]
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of events")
+    return data
+
+
+@app.post("/v1/events/batch")
+async def create_events_batch(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    api_key: str = Depends(verify_api_key)
+):
+    return await run_idempotent(
+        idempotency_key,
+        "events/batch",
+        request_fingerprint(request, await request.body()),
+        lambda: _create_events_batch(request)
+    )
+
+
+async def _create_events_batch(request: Request):
+    body = await request.body()
+    items = parse_batch_body(body, request.headers.get("content-type", ""))
+
+    if len(items) > BATCH_MAX_EVENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(items)} events (max {BATCH_MAX_EVENTS})"
+        )
+
+    results: List[Dict[str, Any]] = []
+    valid_events = []
+
+    for index, item in enumerate(items):
+        try:
+            event = parse_batch_item(item)
+        except ValueError as e:
+            results.append({"index": index, "error": str(e)})
+            continue
+
+        event["event_id"] = uuid.uuid4()
+        valid_events.append(event)
+        results.append({"index": index, "id": str(event["event_id"]), "day": event["day"]})
+
+    try:
+        await create_events_bulk(valid_events)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating events: {str(e)}")
+
+    return {
+        "inserted": len(valid_events),
+        "failed": len(items) - len(valid_events),
+        "results": results,
+    }
+
+
+def _multipart_boundary(request: Request) -> bytes:
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+    return boundary
+
+
+async def receive_upload(request: Request, dest_path: str) -> Tuple[Dict[str, str], int, str]:
+    # Parses the multipart body as it arrives. The "file" part is hashed and written straight
+    # to dest_path, with no earlier copy in Starlette's spool, and the stream is abandoned as
+    # soon as it passes MAX_UPLOAD_BYTES. Other parts are small form fields kept in memory.
+    boundary = _multipart_boundary(request)
+
+    fields: Dict[str, bytearray] = {}
+    file_data = bytearray()
+    part: Dict[str, Any] = {}
+
+    def on_part_begin():
+        part.update(name=None, headers={}, field=b"", value=b"")
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part.update(field=b"", value=b"")
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["name"] = disposition.get(b"name", b"").decode("utf-8", "replace")
+        if part["name"] == "file":
+            fields.setdefault("file", bytearray())
+        elif part["name"]:
+            fields[part["name"]] = bytearray()
+
+    def on_part_data(data, start, end):
+        if part["name"] == "file":
+            file_data.extend(data[start:end])
+        elif part["name"]:
+            field = fields[part["name"]]
+            field.extend(data[start:end])
+            if len(field) > UPLOAD_FIELD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Form field {part['name']} is too large")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+
+    written = 0
+    digest = hashlib.sha256()
+    with open(dest_path, "wb") as dest:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError:
+                raise HTTPException(status_code=400, detail="Malformed multipart body")
+
+            if file_data:
+                written += len(file_data)
+                if written > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+                digest.update(file_data)
+                await asyncio.to_thread(dest.write, bytes(file_data))
+                file_data.clear()
+
+        try:
+            parser.finalize()
+        except MultipartParseError:
+            raise HTTPException(status_code=400, detail="Malformed multipart body")
+
+    if "file" not in fields:
+        raise HTTPException(status_code=400, detail="file is required")
+    del fields["file"]
+
+    try:
+        return {name: bytes(value).decode("utf-8") for name, value in fields.items()}, written, digest.hexdigest()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Form fields must be UTF-8")
+
+
 @app.post("/v1/events/with-image")
 async def create_event_with_image(
-    metadata: str = Form(...),
-    file: UploadFile = File(...),
+    request: Request,
+    background: Optional[bool] = Query(None),
+    idempotency_key: Optional[str] = Header(None),
     api_key: str = Depends(verify_api_key)
+):
+    # Takes the raw request rather than Form/File parameters: those make FastAPI read and
+    # spool the whole body before the handler runs, and the checks below must come first.
+    # Multipart fields: metadata (JSON) and file.
+    if background is None:
+        background = BACKGROUND_IMAGES
+
+    # Nothing of the body has been read yet: oversized uploads and uploads that would only
+    # queue behind a full image pool are turned away before any of it is received
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    if not background and image_pool_saturated():
+        raise HTTPException(
+            status_code=429,
+            detail="Image processing is busy, retry shortly",
+            headers={"Retry-After": "5"}
+        )
+
+    _multipart_boundary(request)
+
+    job_id = str(uuid.uuid4())
+    upload_dir = None
+    if background:
+        upload_path = str(spool_data_file(job_id))
+    else:
+        upload_dir = tempfile.mkdtemp(prefix="consumed-upload-")
+        upload_path = os.path.join(upload_dir, "upload")
+
+    try:
+        with timed("receive"):
+            form, _, source_hash = await receive_upload(request, upload_path)
+
+        # The file goes straight to disk, so the fingerprint covers its hash rather than the raw
+        # body. A retry is therefore received in full before it is replayed or refused.
+        fingerprint = request_fingerprint(
+            request,
+            form.get("metadata", "").encode("utf-8") + b"\n" + source_hash.encode("utf-8")
+        )
+        return await run_idempotent(
+            idempotency_key,
+            "events/with-image",
+            fingerprint,
+            lambda: _create_event_with_image(form, source_hash, job_id, upload_path, background)
+        )
+
+    finally:
+        if upload_dir:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+        elif not job_spooled(job_id):
+            # Spooled bytes that never became a job (dedup hit, replay or failure) are dropped
+            spool_data_file(job_id).unlink(missing_ok=True)
+
+
+async def _create_event_with_image(
+    form: Dict[str, str],
+    source_hash: str,
+    job_id: str,
+    upload_path: str,
+    background: bool
 ):
     try:
-        event_data = json.loads(metadata)
+        if "metadata" not in form:
+            raise HTTPException(status_code=400, detail="metadata is required")
+        event_data = json.loads(form["metadata"])
+        if not isinstance(event_data, dict):
+            raise HTTPException(status_code=400, detail="metadata must be a JSON object")
 
         occurred_at_str = event_data.get("occurred_at")
         if not occurred_at_str:
@@ -105,9 +448,6 @@ async def create_event_with_image(
         if not event_type or not title:
             raise HTTPException(status_code=400, detail="type and title are required in metadata")
 
-        image_bytes = await file.read()
-        webp_bytes, width, height = convert_to_webp(image_bytes)
-
         event_id = uuid.uuid4()
         media_id = uuid.uuid4()
         year = occurred_at.strftime("%Y")
@@ -115,38 +455,127 @@ async def create_event_with_image(
         day_str = occurred_at.strftime("%d")
 
         r2_key = f"images/{year}/{month}/{day_str}/{event_id}/{media_id}.webp"
-
-        upload_to_r2(r2_key, webp_bytes, "image/webp")
-
         media_path = f"/images/{year}/{month}/{day_str}/{event_id}/{media_id}.webp"
 
-        await create_event(
-            occurred_at=occurred_at,
-            day=day,
-            event_type=event_type,
-            title=title,
-            url=event_data.get("url"),
-            payload=event_data.get("payload", {}),
-            event_id=event_id
-        )
+        # Identical bytes were already converted and uploaded; point the new event at them
+        existing = await find_media_by_hash(source_hash)
+        if existing:
+            with timed("db_insert"):
+                await create_event(
+                    occurred_at=occurred_at,
+                    day=day,
+                    event_type=event_type,
+                    title=title,
+                    url=event_data.get("url"),
+                    payload=event_data.get("payload", {}),
+                    event_id=event_id
+                )
+
+                await create_media(
+                    event_id=event_id,
+                    path=existing["path"],
+                    width=existing["width"],
+                    height=existing["height"],
+                    bytes=existing["bytes"],
+                    content_type="image/webp",
+                    media_id=media_id,
+                    source_hash=source_hash
+                )
+
+                await create_media_variants(media_id, existing["variants"])
+
+            return {
+                "event_id": str(event_id),
+                "media": {
+                    "path": existing["path"],
+                    "variants": [path for path, _, _, _ in existing["variants"]],
+                    "deduplicated": True
+                }
+            }
 
-        await create_media(
-            event_id=event_id,
-            path=media_path,
-            width=width,
-            height=height,
-            bytes=len(webp_bytes),
-            content_type="image/webp",
-            media_id=media_id
-        )
+        if background:
+            job = {"job_id": job_id, "media_id": str(media_id), "event_id": str(event_id), "r2_key": r2_key}
+            commit_job(job)
+
+            try:
+                with timed("db_insert"):
+                    await create_event(
+                        occurred_at=occurred_at,
+                        day=day,
+                        event_type=event_type,
+                        title=title,
+                        url=event_data.get("url"),
+                        payload=event_data.get("payload", {}),
+                        event_id=event_id
+                    )
+
+                    await create_media(
+                        event_id=event_id,
+                        path=media_path,
+                        content_type="image/webp",
+                        media_id=media_id,
+                        status="pending",
+                        source_hash=source_hash
+                    )
+            except Exception:
+                discard_job(job_id)
+                raise
+
+            enqueue(job_id)
+
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "event_id": str(event_id),
+                    "media": {
+                        "path": media_path,
+                        "status": "pending"
+                    }
+                }
+            )
+
+        width, height, size, variants = await process_image(upload_path, r2_key)
+
+        with timed("db_insert"):
+            await create_event(
+                occurred_at=occurred_at,
+                day=day,
+                event_type=event_type,
+                title=title,
+                url=event_data.get("url"),
+                payload=event_data.get("payload", {}),
+                event_id=event_id
+            )
+
+            await create_media(
+                event_id=event_id,
+                path=media_path,
+                width=width,
+                height=height,
+                bytes=size,
+                content_type="image/webp",
+                media_id=media_id,
+                source_hash=source_hash
+            )
+
+            await create_media_variants(media_id, variants)
 
         return {
             "event_id": str(event_id),
             "media": {
-                "path": media_path
+                "path": media_path,
+                "variants": [path for path, _, _, _ in variants]
             }
         }
 
+    except HTTPException:
+        raise
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=429,
+            detail="Image processing is busy, retry shortly",
+            headers={"Retry-After": "5"}
+        )
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON in metadata")
     except ValueError as e:
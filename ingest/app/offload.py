@@ -0,0 +1,114 @@
+import os
+import time
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Callable
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", "4"))
+UPLOAD_THREADS = int(os.getenv("UPLOAD_THREADS", "4"))
+
+_image_pool: Optional[ProcessPoolExecutor] = None
+_upload_pool: Optional[ThreadPoolExecutor] = None
+_image_jobs = 0
+_upload_jobs = 0
+_stage_stats: Dict[str, Dict[str, float]] = {}
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+def get_image_pool() -> ProcessPoolExecutor:
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _image_pool
+
+
+def get_upload_pool() -> ThreadPoolExecutor:
+    global _upload_pool
+    if _upload_pool is None:
+        _upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_THREADS, thread_name_prefix="upload")
+    return _upload_pool
+
+
+def shutdown_pools() -> None:
+    global _image_pool, _upload_pool
+    if _image_pool:
+        _image_pool.shutdown(wait=False, cancel_futures=True)
+        _image_pool = None
+    if _upload_pool:
+        _upload_pool.shutdown(wait=False, cancel_futures=True)
+        _upload_pool = None
+
+
+def image_pool_saturated() -> bool:
+    # Running jobs plus queued jobs; beyond this we shed load instead of queueing forever
+    return _image_jobs >= IMAGE_WORKERS + IMAGE_QUEUE_SIZE
+
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = _stage_stats.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["last_ms"] = elapsed_ms
+
+
+async def run_image_job(func: Callable, *args, stage: str = "image", **kwargs) -> Any:
+    global _image_jobs
+    if image_pool_saturated():
+        raise PoolSaturated(f"Image pool saturated ({_image_jobs} jobs in flight)")
+
+    loop = asyncio.get_running_loop()
+    _image_jobs += 1
+    try:
+        with timed(stage):
+            return await loop.run_in_executor(get_image_pool(), functools.partial(func, *args, **kwargs))
+    finally:
+        _image_jobs -= 1
+
+
+async def run_upload(func: Callable, *args, stage: str = "upload", **kwargs) -> Any:
+    global _upload_jobs
+    loop = asyncio.get_running_loop()
+    _upload_jobs += 1
+    try:
+        with timed(stage):
+            return await loop.run_in_executor(get_upload_pool(), functools.partial(func, *args, **kwargs))
+    finally:
+        _upload_jobs -= 1
+
+
+def get_metrics() -> Dict[str, Any]:
+    stages = {}
+    for stage, stats in _stage_stats.items():
+        stages[stage] = {
+            "count": int(stats["count"]),
+            "avg_ms": round(stats["total_ms"] / stats["count"], 2) if stats["count"] else 0.0,
+            "max_ms": round(stats["max_ms"], 2),
+            "last_ms": round(stats["last_ms"], 2),
+        }
+
+    return {
+        "image_pool": {
+            "workers": IMAGE_WORKERS,
+            "queue_size": IMAGE_QUEUE_SIZE,
+            "in_flight": _image_jobs,
+            "queued": max(0, _image_jobs - IMAGE_WORKERS),
+        },
+        "upload_pool": {
+            "threads": UPLOAD_THREADS,
+            "in_flight": _upload_jobs,
+        },
+        "stages": stages,
+    }
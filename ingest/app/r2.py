@@ -1,15 +1,29 @@
 import os
 import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
-from typing import Optional
+from botocore.exceptions import ClientError, BotoCoreError, ConnectionError as BotoConnectionError, ReadTimeoutError
 
+from .storage import StorageBackend
 
-_s3_client: Optional[boto3.client] = None
+# Sized for the upload thread pool times the per-transfer part concurrency below
+R2_MAX_POOL_CONNECTIONS = int(os.getenv("R2_MAX_POOL_CONNECTIONS", "32"))
+R2_CONNECT_TIMEOUT = float(os.getenv("R2_CONNECT_TIMEOUT", "5"))
+R2_READ_TIMEOUT = float(os.getenv("R2_READ_TIMEOUT", "60"))
 
+# Bodies above the threshold go up as multipart uploads, parts in parallel
+_transfer_config = TransferConfig(
+    multipart_threshold=int(os.getenv("R2_MULTIPART_THRESHOLD", str(8 * 1024 * 1024))),
+    multipart_chunksize=int(os.getenv("R2_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024))),
+    max_concurrency=4
+)
 
-def get_s3_client():
-    global _s3_client
-    if _s3_client is None:
+_RETRYABLE_CODES = {"SlowDown", "Throttling", "ThrottlingException", "RequestTimeout", "InternalError"}
+
+
+class R2Backend(StorageBackend):
+    def __init__(self):
         endpoint_url = os.getenv("R2_ENDPOINT_URL")
         access_key_id = os.getenv("R2_ACCESS_KEY_ID")
         secret_access_key = os.getenv("R2_SECRET_ACCESS_KEY")
@@ -17,28 +31,47 @@ def get_s3_client():
         if not all([endpoint_url, access_key_id, secret_access_key]):
             raise ValueError("R2 credentials not configured")
 
-        _s3_client = boto3.client(
+        self.bucket_name = os.getenv("R2_BUCKET_NAME")
+        if not self.bucket_name:
+            raise ValueError("R2_BUCKET_NAME environment variable not set")
+
+        # boto3 clients are thread-safe; one shared client keeps its connection pool warm.
+        # botocore's own retries are off so storage.py's jittered policy is the only one.
+        self.client = boto3.client(
             "s3",
             endpoint_url=endpoint_url,
             aws_access_key_id=access_key_id,
             aws_secret_access_key=secret_access_key,
-            config=Config(signature_version="s3v4")
+            config=Config(
+                signature_version="s3v4",
+                max_pool_connections=R2_MAX_POOL_CONNECTIONS,
+                connect_timeout=R2_CONNECT_TIMEOUT,
+                read_timeout=R2_READ_TIMEOUT,
+                tcp_keepalive=True,
+                retries={"total_max_attempts": 1}
+            )
         )
 
-    return _s3_client
-
-
-def upload_to_r2(key: str, data: bytes, content_type: str) -> None:
-    bucket_name = os.getenv("R2_BUCKET_NAME")
-    if not bucket_name:
-        raise ValueError("R2_BUCKET_NAME environment variable not set")
-
-    s3_client = get_s3_client()
+    def put_file(self, key: str, file_path: str, content_type: str) -> None:
+        self.client.upload_file(
+            file_path,
+            self.bucket_name,
+            key,
+            ExtraArgs={"ContentType": content_type},
+            Config=_transfer_config
+        )
 
-    s3_client.put_object(
-        Bucket=bucket_name,
-        Key=key,
-        Body=data,
-        ContentType=content_type
-    )
+    def get_file(self, key: str, file_path: str) -> None:
+        self.client.download_file(self.bucket_name, key, file_path, Config=_transfer_config)
 
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, S3UploadFailedError) and error.__context__ is not None:
+            error = error.__context__
+        if isinstance(error, ClientError):
+            status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+            return status >= 500 or status == 429 or error.response.get("Error", {}).get("Code") in _RETRYABLE_CODES
+        if isinstance(error, (BotoConnectionError, ReadTimeoutError)):
+            return True
+        if isinstance(error, BotoCoreError):
+            return False
+        return super().is_retryable(error)
@@ -0,0 +1,104 @@
+import os
+import random
+import shutil
+import asyncio
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Callable, Any
+
+from .offload import run_upload
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "r2")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "/tmp/consumed-storage")
+STORAGE_MAX_ATTEMPTS = int(os.getenv("STORAGE_MAX_ATTEMPTS", "4"))
+STORAGE_RETRY_BASE_DELAY = float(os.getenv("STORAGE_RETRY_BASE_DELAY", "0.25"))
+STORAGE_RETRY_MAX_DELAY = float(os.getenv("STORAGE_RETRY_MAX_DELAY", "8"))
+
+
+class StorageBackend(ABC):
+    # Blocking operations; the async functions below run them on the upload thread pool.
+    # A backend missing one of them fails when it is created, not part-way through an upload.
+
+    @abstractmethod
+    def put_file(self, key: str, file_path: str, content_type: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_file(self, key: str, file_path: str) -> None:
+        ...
+
+    def is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class LocalBackend(StorageBackend):
+    # Objects are plain files under root, keyed by path; for development, tests and benchmarks
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key.lstrip("/")).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Key escapes storage root: {key}")
+        return path
+
+    def put_file(self, key: str, file_path: str, content_type: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        shutil.copyfile(file_path, tmp_path)
+        tmp_path.replace(path)
+
+    def get_file(self, key: str, file_path: str) -> None:
+        shutil.copyfile(self._path(key), file_path)
+
+
+_backend: Optional[StorageBackend] = None
+
+
+def get_backend() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "local":
+            _backend = LocalBackend(LOCAL_STORAGE_DIR)
+        elif STORAGE_BACKEND == "r2":
+            from .r2 import R2Backend
+            _backend = R2Backend()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return _backend
+
+
+def set_backend(backend: Optional[StorageBackend]) -> None:
+    global _backend
+    _backend = backend
+
+
+def retry_delay(attempt: int) -> float:
+    # Full jitter: concurrent uploads that failed together don't retry together
+    return random.uniform(0, min(STORAGE_RETRY_MAX_DELAY, STORAGE_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+async def _with_retries(stage: str, operation: Callable, *args) -> Any:
+    backend = get_backend()
+    attempt = 1
+    while True:
+        try:
+            return await run_upload(operation, *args, stage=stage)
+        except Exception as e:
+            if attempt >= STORAGE_MAX_ATTEMPTS or not backend.is_retryable(e):
+                raise
+            delay = retry_delay(attempt)
+            print(f"⚠ Storage {stage} of {args[0]} failed (attempt {attempt}): {e}; retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+async def upload_file(key: str, file_path: str, content_type: str) -> None:
+    await _with_retries("r2_upload", get_backend().put_file, key, file_path, content_type)
+
+
+async def download_file(key: str, file_path: str) -> None:
+    await _with_retries("r2_download", get_backend().get_file, key, file_path)
@@ -0,0 +1,255 @@
+import os
+import json
+import fcntl
+import shutil
+import asyncio
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Set, Tuple, TextIO
+
+from .db import get_db_connection, close_pool, create_media_variants, mark_media_ready, mark_media_failed
+from .image_processing import convert_file_to_webp_variants, variant_key
+from .offload import run_image_job, shutdown_pools, PoolSaturated
+from .storage import upload_file
+
+SPOOL_DIR = Path(os.getenv("SPOOL_DIR", "/tmp/consumed-spool"))
+WORKER_CONCURRENCY = int(os.getenv("MEDIA_WORKER_CONCURRENCY", "2"))
+MAX_ATTEMPTS = int(os.getenv("MEDIA_WORKER_MAX_ATTEMPTS", "3"))
+RETRY_DELAY = float(os.getenv("MEDIA_WORKER_RETRY_DELAY", "5"))
+
+_queue: Optional[asyncio.Queue] = None
+_tasks: List[asyncio.Task] = []
+_active: Set[str] = set()
+
+
+def _job_file(job_id: str) -> Path:
+    return SPOOL_DIR / f"{job_id}.json"
+
+
+def spool_data_file(job_id: str) -> Path:
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    return SPOOL_DIR / f"{job_id}.upload"
+
+
+def commit_job(job: Dict[str, Any]) -> str:
+    job_id = job["job_id"]
+    job.setdefault("attempts", 0)
+
+    # The job file is written after the upload bytes, so a job on disk always has its data
+    tmp_file = SPOOL_DIR / f"{job_id}.tmp"
+    tmp_file.write_text(json.dumps(job), encoding="utf-8")
+    tmp_file.replace(_job_file(job_id))
+
+    return job_id
+
+
+def job_spooled(job_id: str) -> bool:
+    return _job_file(job_id).exists()
+
+
+def discard_job(job_id: str) -> None:
+    _job_file(job_id).unlink(missing_ok=True)
+    (SPOOL_DIR / f"{job_id}.upload").unlink(missing_ok=True)
+
+
+def spooled_job_ids() -> List[str]:
+    if not SPOOL_DIR.exists():
+        return []
+    job_files = sorted(SPOOL_DIR.glob("*.json"), key=lambda path: path.stat().st_mtime)
+    return [path.stem for path in job_files]
+
+
+def spool_depth() -> int:
+    return len(spooled_job_ids())
+
+
+async def process_image(
+    source_path: str,
+    r2_key: str,
+    upload_original: bool = True
+) -> Tuple[int, int, int, List[Tuple[str, int, int, int]]]:
+    # upload_original=False leaves the object at r2_key alone and only (re)builds variants
+    work_dir = tempfile.mkdtemp(prefix="consumed-image-")
+
+    try:
+        encoded = await run_image_job(
+            convert_file_to_webp_variants, str(source_path), work_dir,
+            encode_original=upload_original, stage="convert"
+        )
+        (original_path, width, height, size), smaller = encoded[0], encoded[1:]
+
+        uploads = [upload_file(r2_key, original_path, "image/webp")] if upload_original else []
+        variants = []
+        for variant_path, variant_width, variant_height, variant_size in smaller:
+            key = variant_key(r2_key, variant_width)
+            uploads.append(upload_file(key, variant_path, "image/webp"))
+            variants.append((f"/{key}", variant_width, variant_height, variant_size))
+        await asyncio.gather(*uploads)
+
+        return width, height, size, variants
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _claim_job(job_id: str) -> Optional[TextIO]:
+    # The in-app worker and `python -m ingest.worker` may scan the same spool; whoever holds
+    # the lock on the job file owns the job. The lock goes away with its process, so a crashed
+    # worker leaves nothing to clean up.
+    try:
+        handle = open(_job_file(job_id), "r+", encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        return None
+
+    # Finished and discarded by another worker between the open and the lock
+    if os.fstat(handle.fileno()).st_nlink == 0:
+        handle.close()
+        return None
+
+    return handle
+
+
+async def process_job(job_id: str) -> bool:
+    handle = _claim_job(job_id)
+    if handle is None:
+        return False
+
+    with handle:
+        job = json.loads(handle.read())
+        media_id = uuid.UUID(job["media_id"])
+
+        try:
+            source_path = spool_data_file(job_id)
+            width, height, size, variants = await process_image(str(source_path), job["r2_key"])
+            await create_media_variants(media_id, variants)
+            await mark_media_ready(media_id, width=width, height=height, bytes=size)
+
+        except PoolSaturated:
+            # Shared with the request path; leave the job spooled and try again shortly
+            return False
+
+        except Exception as e:
+            job["attempts"] = job.get("attempts", 0) + 1
+            job["last_error"] = str(e)
+            print(f"✗ Media job {job_id} failed (attempt {job['attempts']}): {e}")
+
+            if job["attempts"] >= MAX_ATTEMPTS:
+                await mark_media_failed(media_id)
+                discard_job(job_id)
+            else:
+                handle.seek(0)
+                handle.truncate()
+                handle.write(json.dumps(job))
+            return False
+
+        # Unlinked while still locked, so no other worker can pick it up in between
+        discard_job(job_id)
+
+    print(f"✓ Media job {job_id} processed ({width}x{height})")
+    return True
+
+
+async def _consume(queue: asyncio.Queue) -> None:
+    while True:
+        job_id = await queue.get()
+        if job_id in _active:
+            queue.task_done()
+            continue
+
+        _active.add(job_id)
+        try:
+            done = await process_job(job_id)
+            if not done and _job_file(job_id).exists():
+                asyncio.get_running_loop().call_later(RETRY_DELAY, queue.put_nowait, job_id)
+        except Exception as e:
+            print(f"✗ Media worker error on {job_id}: {e}")
+        finally:
+            _active.discard(job_id)
+            queue.task_done()
+
+
+def enqueue(job_id: str) -> None:
+    if _queue is not None:
+        _queue.put_nowait(job_id)
+
+
+def start_worker() -> None:
+    global _queue
+    if _queue is not None:
+        return
+
+    _queue = asyncio.Queue()
+
+    # Resume anything left in the spool by a previous process
+    for job_id in spooled_job_ids():
+        _queue.put_nowait(job_id)
+
+    for _ in range(WORKER_CONCURRENCY):
+        _tasks.append(asyncio.create_task(_consume(_queue)))
+
+
+async def stop_worker() -> None:
+    global _queue
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    _queue = None
+
+
+async def drain_spool(poll_interval: float = 2.0, once: bool = False) -> None:
+    # Can run beside the API's own worker (MEDIA_WORKER_ENABLED) on the same SPOOL_DIR:
+    # jobs are claimed with a file lock, so each one is processed by a single worker
+    await get_db_connection()
+
+    try:
+        while True:
+            job_ids = spooled_job_ids()
+            if job_ids:
+                print(f"Processing {len(job_ids)} spooled media job(s)...")
+            for job_id in job_ids:
+                await process_job(job_id)
+
+            if once:
+                return
+            await asyncio.sleep(poll_interval)
+
+    finally:
+        await close_pool()
+        shutdown_pools()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Process spooled image uploads (convert, upload to R2, mark ready)"
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Drain the spool once and exit instead of polling"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=2.0,
+        help="Seconds between spool scans (default: 2)"
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(drain_spool(poll_interval=args.interval, once=args.once))
+    except KeyboardInterrupt:
+        print("\nWorker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+ALTER TABLE consumed_media
+    ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'ready'
+        CHECK (status IN ('pending', 'ready', 'failed'));
+
+CREATE INDEX IF NOT EXISTS idx_media_status_pending ON consumed_media(status) WHERE status <> 'ready';
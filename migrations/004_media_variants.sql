@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS consumed_media_variants (
+    media_id UUID NOT NULL REFERENCES consumed_media(id) ON DELETE CASCADE,
+    width INT NOT NULL,
+    height INT NOT NULL,
+    path TEXT NOT NULL,
+    bytes INT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (media_id, width)
+);
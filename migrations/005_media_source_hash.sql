@@ -0,0 +1,3 @@
+ALTER TABLE consumed_media ADD COLUMN IF NOT EXISTS source_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_media_source_hash ON consumed_media(source_hash) WHERE source_hash IS NOT NULL;
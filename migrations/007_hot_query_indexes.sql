@@ -0,0 +1,15 @@
+-- migrate:no-transaction
+-- Built CONCURRENTLY so the hourly sync can keep writing consumed_songs meanwhile
+
+-- Builder and cleanup: ITEMS_QUERY filters and orders by day, cleanup deletes by day cutoff
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_day_occurred_at ON consumed_events(day DESC, occurred_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_day_played_at ON consumed_songs(day DESC, played_at DESC);
+
+-- Media lookups by event (builder json_agg, day fingerprints, cleanup); status is carried
+-- so the fingerprint join can stay index-only
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_media_event_id ON consumed_media(event_id) INCLUDE (status, id);
+
+-- create_song()/create_songs_bulk() dedup window
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_apple_music_id_played_at
+    ON consumed_songs(apple_music_id, played_at)
+    WHERE apple_music_id IS NOT NULL;
@@ -0,0 +1,18 @@
+-- migrate:no-transaction
+-- Makes song dedup enforceable with ON CONFLICT DO NOTHING.
+--
+-- Tracks with an Apple Music id: the dedup window treats plays less than 10 minutes apart as
+-- one play, so no two stored plays of a track can share a 10-minute bucket. The window check
+-- stays in the application; this index stops concurrent syncs from racing past it.
+-- Tracks without an id dedup on the exact (played_at, title, artist).
+--
+-- If this fails on existing data, list the offending rows with:
+--   SELECT apple_music_id, date_bin('10 minutes', played_at, TIMESTAMPTZ '2000-01-01 00:00:00+00'), COUNT(*)
+--   FROM consumed_songs WHERE apple_music_id IS NOT NULL GROUP BY 1, 2 HAVING COUNT(*) > 1;
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_songs_apple_music_play
+    ON consumed_songs(apple_music_id, date_bin('10 minutes', played_at, TIMESTAMPTZ '2000-01-01 00:00:00+00'))
+    WHERE apple_music_id IS NOT NULL;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_songs_untagged_play
+    ON consumed_songs(played_at, title, artist)
+    WHERE apple_music_id IS NULL;
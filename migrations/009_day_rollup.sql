@@ -0,0 +1,203 @@
+-- One row per day with its item counts per site category and a hash of everything the
+-- builder renders for it. Statement-level triggers on the raw tables keep it current, so
+-- create_event(), create_song(), the bulk paths, media processing and cleanup_db.py all
+-- maintain it without knowing it exists.
+
+CREATE TABLE IF NOT EXISTS consumed_day_rollup (
+    day DATE PRIMARY KEY,
+    items INT NOT NULL,
+    media INT NOT NULL,
+    -- Same buckets as CATEGORY_BY_TYPE in site/build.py
+    physical INT NOT NULL,
+    audio INT NOT NULL,
+    video INT NOT NULL,
+    text INT NOT NULL,
+    places INT NOT NULL,
+    content_hash TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION refresh_day_rollup(days DATE[]) RETURNS void AS $$
+BEGIN
+    IF days IS NULL OR cardinality(days) = 0 THEN
+        RETURN;
+    END IF;
+
+    -- Concurrent writers to one day take turns; the recount below then starts with a
+    -- snapshot that includes the other writer's committed rows. Sorted to avoid deadlocks.
+    PERFORM pg_advisory_xact_lock(hashtext('consumed_day_rollup'), hashtext(d::text))
+    FROM (SELECT DISTINCT d FROM unnest(days) AS u(d) WHERE d IS NOT NULL ORDER BY d) locked;
+
+    DELETE FROM consumed_day_rollup r
+    WHERE r.day = ANY(days)
+      AND NOT EXISTS (SELECT 1 FROM consumed_events e WHERE e.day = r.day)
+      AND NOT EXISTS (SELECT 1 FROM consumed_songs s WHERE s.day = r.day);
+
+    INSERT INTO consumed_day_rollup AS r (day, items, media, physical, audio, video, text, places, content_hash, updated_at)
+    SELECT
+        d.day,
+        COUNT(*),
+        COALESCE(SUM(rows.media), 0),
+        COUNT(*) FILTER (WHERE rows.category = 'physical'),
+        COUNT(*) FILTER (WHERE rows.category = 'audio'),
+        COUNT(*) FILTER (WHERE rows.category = 'video'),
+        COUNT(*) FILTER (WHERE rows.category = 'text'),
+        COUNT(*) FILTER (WHERE rows.category = 'places'),
+        md5(string_agg(rows.row_hash, '' ORDER BY rows.row_hash)),
+        NOW()
+    FROM (SELECT DISTINCT day FROM unnest(days) AS u(day) WHERE day IS NOT NULL) d
+    JOIN LATERAL (
+        SELECT
+            CASE e.type
+                WHEN 'meal' THEN 'physical'
+                WHEN 'photo' THEN 'physical'
+                WHEN 'music' THEN 'audio'
+                WHEN 'video' THEN 'video'
+                WHEN 'place' THEN 'places'
+                ELSE 'text'
+            END AS category,
+            media.count AS media,
+            md5(concat_ws('|', e.id, e.occurred_at, e.type, e.title, e.url, e.payload::text, media.summary)) AS row_hash
+        FROM consumed_events e
+        CROSS JOIN LATERAL (
+            SELECT
+                COUNT(*) AS count,
+                string_agg(
+                    concat_ws(',', m.id, m.path, m.width, m.height, (
+                        SELECT string_agg(concat_ws(':', v.width, v.height, v.path), ';' ORDER BY v.width)
+                        FROM consumed_media_variants v
+                        WHERE v.media_id = m.id
+                    )),
+                    ';' ORDER BY m.id
+                ) AS summary
+            FROM consumed_media m
+            WHERE m.event_id = e.id AND m.status = 'ready'
+        ) media
+        WHERE e.day = d.day
+
+        UNION ALL
+
+        SELECT
+            'audio',
+            0,
+            md5(concat_ws('|', s.id, s.played_at, s.title, s.artist, s.album, s.apple_music_url, s.artwork_url, s.duration_ms))
+        FROM consumed_songs s
+        WHERE s.day = d.day
+    ) rows ON TRUE
+    GROUP BY d.day
+    ON CONFLICT (day) DO UPDATE
+    SET items = EXCLUDED.items,
+        media = EXCLUDED.media,
+        physical = EXCLUDED.physical,
+        audio = EXCLUDED.audio,
+        video = EXCLUDED.video,
+        text = EXCLUDED.text,
+        places = EXCLUDED.places,
+        content_hash = EXCLUDED.content_hash,
+        updated_at = EXCLUDED.updated_at
+    -- A write that changes nothing visible (e.g. a dedup no-op) leaves the day untouched
+    WHERE r.content_hash IS DISTINCT FROM EXCLUDED.content_hash;
+END;
+$$ LANGUAGE plpgsql;
+
+-- consumed_events and consumed_songs carry the day themselves
+CREATE OR REPLACE FUNCTION day_rollup_from_rows() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_day_rollup(ARRAY(SELECT day FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_day_rollup(ARRAY(SELECT day FROM new_rows UNION SELECT day FROM old_rows));
+    ELSE
+        PERFORM refresh_day_rollup(ARRAY(SELECT day FROM old_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Media reach their day through the event; rows deleted along with their event are
+-- covered by the event's own trigger
+CREATE OR REPLACE FUNCTION day_rollup_from_media() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_day_rollup(ARRAY(
+            SELECT e.day FROM consumed_events e WHERE e.id IN (SELECT event_id FROM new_rows)
+        ));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_day_rollup(ARRAY(
+            SELECT e.day FROM consumed_events e
+            WHERE e.id IN (SELECT event_id FROM new_rows UNION SELECT event_id FROM old_rows)
+        ));
+    ELSE
+        PERFORM refresh_day_rollup(ARRAY(
+            SELECT e.day FROM consumed_events e WHERE e.id IN (SELECT event_id FROM old_rows)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION day_rollup_from_variants() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_day_rollup(ARRAY(
+            SELECT e.day FROM consumed_events e JOIN consumed_media m ON m.event_id = e.id
+            WHERE m.id IN (SELECT media_id FROM new_rows)
+        ));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_day_rollup(ARRAY(
+            SELECT e.day FROM consumed_events e JOIN consumed_media m ON m.event_id = e.id
+            WHERE m.id IN (SELECT media_id FROM new_rows UNION SELECT media_id FROM old_rows)
+        ));
+    ELSE
+        PERFORM refresh_day_rollup(ARRAY(
+            SELECT e.day FROM consumed_events e JOIN consumed_media m ON m.event_id = e.id
+            WHERE m.id IN (SELECT media_id FROM old_rows)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow one event per trigger, hence three per table
+DROP TRIGGER IF EXISTS day_rollup_insert ON consumed_events;
+DROP TRIGGER IF EXISTS day_rollup_update ON consumed_events;
+DROP TRIGGER IF EXISTS day_rollup_delete ON consumed_events;
+CREATE TRIGGER day_rollup_insert AFTER INSERT ON consumed_events
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_rows();
+CREATE TRIGGER day_rollup_update AFTER UPDATE ON consumed_events
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_rows();
+CREATE TRIGGER day_rollup_delete AFTER DELETE ON consumed_events
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_rows();
+
+DROP TRIGGER IF EXISTS day_rollup_insert ON consumed_songs;
+DROP TRIGGER IF EXISTS day_rollup_update ON consumed_songs;
+DROP TRIGGER IF EXISTS day_rollup_delete ON consumed_songs;
+CREATE TRIGGER day_rollup_insert AFTER INSERT ON consumed_songs
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_rows();
+CREATE TRIGGER day_rollup_update AFTER UPDATE ON consumed_songs
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_rows();
+CREATE TRIGGER day_rollup_delete AFTER DELETE ON consumed_songs
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_rows();
+
+DROP TRIGGER IF EXISTS day_rollup_insert ON consumed_media;
+DROP TRIGGER IF EXISTS day_rollup_update ON consumed_media;
+DROP TRIGGER IF EXISTS day_rollup_delete ON consumed_media;
+CREATE TRIGGER day_rollup_insert AFTER INSERT ON consumed_media
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_media();
+CREATE TRIGGER day_rollup_update AFTER UPDATE ON consumed_media
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_media();
+CREATE TRIGGER day_rollup_delete AFTER DELETE ON consumed_media
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_media();
+
+DROP TRIGGER IF EXISTS day_rollup_insert ON consumed_media_variants;
+DROP TRIGGER IF EXISTS day_rollup_update ON consumed_media_variants;
+DROP TRIGGER IF EXISTS day_rollup_delete ON consumed_media_variants;
+CREATE TRIGGER day_rollup_insert AFTER INSERT ON consumed_media_variants
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_variants();
+CREATE TRIGGER day_rollup_update AFTER UPDATE ON consumed_media_variants
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_variants();
+CREATE TRIGGER day_rollup_delete AFTER DELETE ON consumed_media_variants
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION day_rollup_from_variants();
+
+-- Backfill every existing day
+SELECT refresh_day_rollup(ARRAY(SELECT day FROM consumed_events UNION SELECT day FROM consumed_songs));
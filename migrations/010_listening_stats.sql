@@ -0,0 +1,91 @@
+-- Listening aggregates for the stats pages. consumed_listening_daily holds plays and time
+-- per track per day; consumed_listening_totals holds the same summed over all time and is
+-- adjusted by deltas, so neither the hourly sync nor the builder rescans consumed_songs.
+
+CREATE TABLE IF NOT EXISTS consumed_listening_daily (
+    day DATE NOT NULL,
+    artist TEXT NOT NULL,
+    album TEXT NOT NULL,
+    title TEXT NOT NULL,
+    plays INT NOT NULL,
+    listened_ms BIGINT NOT NULL,
+    PRIMARY KEY (day, artist, album, title)
+);
+
+CREATE TABLE IF NOT EXISTS consumed_listening_totals (
+    artist TEXT NOT NULL,
+    album TEXT NOT NULL,
+    title TEXT NOT NULL,
+    plays INT NOT NULL,
+    listened_ms BIGINT NOT NULL,
+    PRIMARY KEY (artist, album, title)
+);
+
+-- Finds fully deleted tracks without scanning the totals
+CREATE INDEX IF NOT EXISTS idx_listening_totals_emptied ON consumed_listening_totals(plays) WHERE plays <= 0;
+
+CREATE OR REPLACE FUNCTION refresh_listening_daily(days DATE[]) RETURNS void AS $$
+BEGIN
+    IF days IS NULL OR cardinality(days) = 0 THEN
+        RETURN;
+    END IF;
+
+    -- Same per-day lock as refresh_day_rollup()
+    PERFORM pg_advisory_xact_lock(hashtext('consumed_day_rollup'), hashtext(d::text))
+    FROM (SELECT DISTINCT d FROM unnest(days) AS u(d) WHERE d IS NOT NULL ORDER BY d) locked;
+
+    -- Take the days' old contribution out of the totals, recount the days, add it back
+    INSERT INTO consumed_listening_totals AS t (artist, album, title, plays, listened_ms)
+    SELECT artist, album, title, -SUM(plays), -SUM(listened_ms)
+    FROM consumed_listening_daily
+    WHERE day = ANY(days)
+    GROUP BY artist, album, title
+    ON CONFLICT (artist, album, title) DO UPDATE
+    SET plays = t.plays + EXCLUDED.plays, listened_ms = t.listened_ms + EXCLUDED.listened_ms;
+
+    DELETE FROM consumed_listening_daily WHERE day = ANY(days);
+
+    INSERT INTO consumed_listening_daily (day, artist, album, title, plays, listened_ms)
+    SELECT day, artist, COALESCE(album, ''), title, COUNT(*), COALESCE(SUM(duration_ms), 0)
+    FROM consumed_songs
+    WHERE day = ANY(days)
+    GROUP BY day, artist, COALESCE(album, ''), title;
+
+    INSERT INTO consumed_listening_totals AS t (artist, album, title, plays, listened_ms)
+    SELECT artist, album, title, SUM(plays), SUM(listened_ms)
+    FROM consumed_listening_daily
+    WHERE day = ANY(days)
+    GROUP BY artist, album, title
+    ON CONFLICT (artist, album, title) DO UPDATE
+    SET plays = t.plays + EXCLUDED.plays, listened_ms = t.listened_ms + EXCLUDED.listened_ms;
+
+    -- Tracks whose every play was deleted
+    DELETE FROM consumed_listening_totals WHERE plays <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION listening_daily_from_rows() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_listening_daily(ARRAY(SELECT day FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_listening_daily(ARRAY(SELECT day FROM new_rows UNION SELECT day FROM old_rows));
+    ELSE
+        PERFORM refresh_listening_daily(ARRAY(SELECT day FROM old_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS listening_daily_insert ON consumed_songs;
+DROP TRIGGER IF EXISTS listening_daily_update ON consumed_songs;
+DROP TRIGGER IF EXISTS listening_daily_delete ON consumed_songs;
+CREATE TRIGGER listening_daily_insert AFTER INSERT ON consumed_songs
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION listening_daily_from_rows();
+CREATE TRIGGER listening_daily_update AFTER UPDATE ON consumed_songs
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION listening_daily_from_rows();
+CREATE TRIGGER listening_daily_delete AFTER DELETE ON consumed_songs
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION listening_daily_from_rows();
+
+-- Backfill
+SELECT refresh_listening_daily(ARRAY(SELECT DISTINCT day FROM consumed_songs));
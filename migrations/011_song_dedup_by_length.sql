@@ -0,0 +1,25 @@
+-- migrate:no-transaction
+-- Replays count as separate plays. A replay cannot start before the previous play of the
+-- track ended, so plays closer than half the track's length are one play (between 1 and 10
+-- minutes; 10 when the length is unknown, as before). This replaces the fixed 10-minute
+-- bucket from 008, which folded a replayed short track into its first play. Must match
+-- song_dedup_window() in ingest/app/db.py.
+--
+-- If this fails on existing data, list the offending rows with:
+--   SELECT apple_music_id, played_at, duration_ms FROM consumed_songs s
+--   WHERE apple_music_id IS NOT NULL AND EXISTS (
+--       SELECT 1 FROM consumed_songs o WHERE o.apple_music_id = s.apple_music_id AND o.id <> s.id
+--         AND abs(extract(epoch FROM o.played_at - s.played_at)) < 600)
+--   ORDER BY 1, 2;
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_songs_apple_music_play_by_length
+    ON consumed_songs(
+        apple_music_id,
+        date_bin(
+            make_interval(secs => LEAST(600, GREATEST(60, COALESCE(NULLIF(duration_ms, 0), 1200000) / 2000.0))),
+            played_at,
+            TIMESTAMPTZ '2000-01-01 00:00:00+00'
+        )
+    )
+    WHERE apple_music_id IS NOT NULL;
+
+DROP INDEX CONCURRENTLY IF EXISTS uq_songs_apple_music_play;
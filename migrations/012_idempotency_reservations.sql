@@ -0,0 +1,5 @@
+-- A key is reserved before its request runs and completed with the response afterwards.
+-- Rows with no status_code yet are in progress: duplicates arriving meanwhile wait or get a
+-- 409 instead of running the handler a second time, in this worker or any other.
+ALTER TABLE idempotency_keys ALTER COLUMN status_code DROP NOT NULL;
+ALTER TABLE idempotency_keys ALTER COLUMN response DROP NOT NULL;
@@ -0,0 +1,21 @@
+-- migrate:no-transaction
+-- The index from 011 keyed only on the bucket start, so plays bucketed with different widths
+-- could collide: a 20-minute play at 10:09 and a 2-minute play at 10:00:30 both start a bucket
+-- at 10:00 and the second was turned away, although it is nowhere near the first. Keying on
+-- the width as well means only plays bucketed alike can conflict, and those are always inside
+-- each other's song_dedup_window() in ingest/app/db.py.
+--
+-- Every row that satisfied 011 satisfies this index, so building it cannot fail on existing data.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_songs_apple_music_play_by_width
+    ON consumed_songs(
+        apple_music_id,
+        make_interval(secs => LEAST(600, GREATEST(60, COALESCE(NULLIF(duration_ms, 0), 1200000) / 2000.0))),
+        date_bin(
+            make_interval(secs => LEAST(600, GREATEST(60, COALESCE(NULLIF(duration_ms, 0), 1200000) / 2000.0))),
+            played_at,
+            TIMESTAMPTZ '2000-01-01 00:00:00+00'
+        )
+    )
+    WHERE apple_music_id IS NOT NULL;
+
+DROP INDEX CONCURRENTLY IF EXISTS uq_songs_apple_music_play_by_length;
@@ -0,0 +1,4 @@
+-- Each key keeps a hash of the request it was first sent with. Reusing a key for a different
+-- request gets a 422 instead of the stored response of an unrelated one. Rows from before
+-- this column have no fingerprint and match any request.
+ALTER TABLE idempotency_keys ADD COLUMN IF NOT EXISTS fingerprint TEXT;
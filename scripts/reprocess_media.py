@@ -0,0 +1,306 @@
+"""
+Reprocess stored images through the current ingest pipeline.
+
+Each image is downloaded from R2 and its responsive variant ladder re-encoded in a process
+pool and uploaded over the existing variant objects. The stored full-size image is already
+lossy WebP, so it is only re-encoded and overwritten with --rewrite-originals. Media rows
+sharing one stored object (deduplicated uploads) are processed once and all updated.
+Dimensions and variants are written back in batches. Ids are appended to a checkpoint file as their batch commits,
+so an interrupted run resumes where it stopped; the file is removed after a clean run.
+
+Usage:
+    python scripts/reprocess_media.py --missing-dimensions
+    python scripts/reprocess_media.py --since 2026-01-01 --type photo --type meal --concurrency 16
+    python scripts/reprocess_media.py --rewrite-originals --since 2026-01-01
+    python scripts/reprocess_media.py --missing-variants --dry-run
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from datetime import date
+from pathlib import Path
+from typing import List, Tuple, Any, Dict, Iterable
+
+# Add parent directory to path to import from ingest
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+import asyncpg
+from ingest.app import offload
+from ingest.app.storage import download_file
+from ingest.app.worker import process_image
+
+load_dotenv()
+
+database_url = os.getenv("POSTGRES_URL") or os.getenv("DATABASE_URL")
+if not database_url:
+    raise ValueError("POSTGRES_URL or DATABASE_URL environment variable not set")
+
+
+class Checkpoint:
+    def __init__(self, path: Path, fresh: bool = False):
+        self.path = path
+        self.done = set()
+
+        if fresh:
+            self.path.unlink(missing_ok=True)
+        elif self.path.exists():
+            self.done = {line.strip() for line in self.path.read_text().splitlines() if line.strip()}
+
+    def record(self, media_ids: Iterable[Any]) -> None:
+        with self.path.open("a") as f:
+            for media_id in media_ids:
+                f.write(f"{media_id}\n")
+                self.done.add(str(media_id))
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def build_query(args) -> Tuple[str, List[Any]]:
+    conditions = ["m.status = 'ready'"]
+    params: List[Any] = []
+
+    if args.since:
+        params.append(args.since)
+        conditions.append(f"e.day >= ${len(params)}")
+    if args.until:
+        params.append(args.until)
+        conditions.append(f"e.day <= ${len(params)}")
+    if args.type:
+        params.append(args.type)
+        conditions.append(f"e.type = ANY(${len(params)}::text[])")
+    if args.missing_dimensions:
+        conditions.append("(m.width IS NULL OR m.height IS NULL)")
+    if args.missing_variants:
+        conditions.append("NOT EXISTS (SELECT 1 FROM consumed_media_variants v WHERE v.media_id = m.id)")
+
+    # One row per stored object; deduplicated media share a path
+    query = f"""
+        SELECT m.path, array_agg(m.id ORDER BY m.id) AS ids
+        FROM consumed_media m
+        JOIN consumed_events e ON e.id = m.event_id
+        WHERE {' AND '.join(conditions)}
+        GROUP BY m.path
+        ORDER BY max(e.day) DESC, m.path
+    """
+    if args.limit:
+        params.append(args.limit)
+        query += f" LIMIT ${len(params)}"
+
+    return query, params
+
+
+async def reprocess(record: Dict[str, Any], work_dir: str, rewrite_original: bool):
+    key = record["path"].lstrip("/")
+    source_path = os.path.join(work_dir, f"{record['ids'][0]}.source")
+
+    try:
+        await download_file(key, source_path)
+        return await process_image(source_path, key, upload_original=rewrite_original)
+    finally:
+        Path(source_path).unlink(missing_ok=True)
+
+
+async def write_batch(conn: asyncpg.Connection, batch: List[Tuple]) -> None:
+    # Each entry covers every media id sharing the processed object
+    rows = [(media_id, *result) for media_ids, *result in batch for media_id in media_ids]
+    variants = [
+        (media_id, path, width, height, size)
+        for media_id, _, _, _, media_variants in rows
+        for path, width, height, size in media_variants
+    ]
+
+    async with conn.transaction():
+        await conn.execute(
+            """
+            UPDATE consumed_media m
+            SET width = u.width, height = u.height, bytes = u.bytes
+            FROM unnest($1::uuid[], $2::int[], $3::int[], $4::int[]) AS u(id, width, height, bytes)
+            WHERE m.id = u.id
+            """,
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            [row[2] for row in rows],
+            [row[3] for row in rows]
+        )
+
+        if variants:
+            await conn.execute(
+                """
+                INSERT INTO consumed_media_variants (media_id, path, width, height, bytes)
+                SELECT * FROM unnest($1::uuid[], $2::text[], $3::int[], $4::int[], $5::int[])
+                ON CONFLICT (media_id, width) DO UPDATE
+                SET path = EXCLUDED.path, height = EXCLUDED.height, bytes = EXCLUDED.bytes
+                """,
+                [row[0] for row in variants],
+                [row[1] for row in variants],
+                [row[2] for row in variants],
+                [row[3] for row in variants],
+                [row[4] for row in variants]
+            )
+
+
+async def reprocess_media(args):
+    # Downloads and uploads share the thread pool; Pillow work goes to the process pool
+    offload.IMAGE_WORKERS = args.workers
+    offload.IMAGE_QUEUE_SIZE = args.concurrency
+    offload.UPLOAD_THREADS = args.concurrency * 2
+
+    checkpoint = Checkpoint(args.checkpoint, fresh=args.fresh)
+    conn = await asyncpg.connect(database_url)
+
+    try:
+        query, params = build_query(args)
+        candidates = await conn.fetch(query, *params)
+        records = []
+        for candidate in candidates:
+            ids = [media_id for media_id in candidate["ids"] if str(media_id) not in checkpoint.done]
+            if ids:
+                records.append({"path": candidate["path"], "ids": ids})
+
+        print(f"Found {len(candidates)} image(s) to process", end="")
+        if len(candidates) != len(records):
+            print(f", {len(candidates) - len(records)} already done in {args.checkpoint}", end="")
+        print()
+
+        if args.dry_run:
+            for record in records[:20]:
+                print(f"  {record['path']}")
+            if len(records) > 20:
+                print(f"  ... and {len(records) - 20} more")
+            return
+
+        if not records:
+            checkpoint.clear()
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for record in records:
+            queue.put_nowait(record)
+
+        pending: List[Tuple] = []
+        flush_lock = asyncio.Lock()
+        counts = {"fixed": 0, "errors": 0}
+        started = time.perf_counter()
+
+        async def flush() -> None:
+            async with flush_lock:
+                if not pending:
+                    return
+                batch = pending[:]
+                pending.clear()
+                await write_batch(conn, batch)
+                checkpoint.record(media_id for row in batch for media_id in row[0])
+
+        async def run_worker(work_dir: str) -> None:
+            while True:
+                try:
+                    record = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                try:
+                    width, height, size, variants = await reprocess(record, work_dir, args.rewrite_originals)
+                except Exception as e:
+                    counts["errors"] += 1
+                    print(f"  ❌ Error processing {record['path']}: {e}")
+                    continue
+
+                counts["fixed"] += 1
+                pending.append((record["ids"], width, height, size, variants))
+                done = counts["fixed"] + counts["errors"]
+                print(f"[{done}/{len(records)}] ✅ {record['path']} ({width}x{height})")
+
+                if len(pending) >= args.batch_size:
+                    await flush()
+
+        with tempfile.TemporaryDirectory(prefix="reprocess-media-") as work_dir:
+            try:
+                await asyncio.gather(*(run_worker(work_dir) for _ in range(args.concurrency)))
+            finally:
+                # Also on Ctrl-C, so finished images are not redone on resume
+                await flush()
+
+        elapsed = time.perf_counter() - started
+
+        print("\n" + "=" * 60)
+        print("Processing complete!")
+        print(f"  ✅ Fixed: {counts['fixed']}")
+        print(f"  ❌ Errors: {counts['errors']}")
+        print(f"  📊 Total: {len(records)} in {elapsed:.1f}s ({len(records) / elapsed:.1f} images/s)")
+        print("=" * 60)
+
+        if counts["errors"]:
+            print(f"Re-run to retry the failures; finished images are skipped via {args.checkpoint}")
+        else:
+            checkpoint.clear()
+
+    finally:
+        await conn.close()
+        offload.shutdown_pools()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Re-encode stored images (and their responsive variants) with the current pipeline"
+    )
+    parser.add_argument("--since", type=date.fromisoformat, help="Only events on or after this day (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Only events on or before this day (YYYY-MM-DD)")
+    parser.add_argument("--type", action="append", help="Only this event type; repeat for several")
+    parser.add_argument("--missing-dimensions", action="store_true", help="Only media without width/height")
+    parser.add_argument("--missing-variants", action="store_true", help="Only media without responsive variants")
+    parser.add_argument("--limit", type=int, help="Process at most this many images")
+    parser.add_argument(
+        "--rewrite-originals",
+        action="store_true",
+        help="Also re-encode and overwrite the full-size images; each pass over lossy WebP loses quality"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Images in flight at once, covering downloads and uploads (default: 8)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 2,
+        help="Processes for image conversion (default: CPU count)"
+    )
+    parser.add_argument("--batch-size", type=int, default=50, help="Rows per database write (default: 50)")
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=Path("reprocess_media.checkpoint"),
+        help="Resume file of finished media ids (default: ./reprocess_media.checkpoint)"
+    )
+    parser.add_argument("--fresh", action="store_true", help="Ignore and discard an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="List what would be processed and exit")
+    parser.add_argument("--yes", action="store_true", help="Skip the confirmation prompt")
+    args = parser.parse_args()
+
+    if not args.dry_run and not args.yes:
+        if args.rewrite_originals:
+            print("This will re-encode the selected images and overwrite them and their variants in R2.\n")
+        else:
+            print("This will rebuild the selected images' variants and overwrite them in R2.\n")
+        response = input("Continue? (y/n): ")
+        if response.lower() != 'y':
+            print("Aborted.")
+            sys.exit(0)
+
+    try:
+        asyncio.run(reprocess_media(args))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; re-run the same command to resume from {args.checkpoint}")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
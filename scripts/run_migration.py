@@ -1,77 +1,253 @@
 import asyncio
 import os
-import glob
+import sys
+import time
+import re
+import hashlib
 from pathlib import Path
+from typing import List, Dict, NamedTuple
 from dotenv import load_dotenv
 import asyncpg
 
 load_dotenv()
 
-database_url = os.getenv("DATABASE_URL")
-if not database_url:
-    print("ERROR: DATABASE_URL not set")
-    exit(1)
+MIGRATIONS_DIR = Path(__file__).parent.parent / "migrations"
+
+# Files starting with this line run statement by statement outside a transaction, which
+# CREATE INDEX CONCURRENTLY requires. Keep each statement idempotent (IF NOT EXISTS): a
+# failure part-way leaves the earlier statements applied and the file unrecorded.
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+
+# A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind under its name, which
+# IF NOT EXISTS would then skip; such leftovers are dropped and the index built again
+CONCURRENT_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)",
+    re.IGNORECASE
+)
+
+EXPECTED_TABLES = [
+    "consumed_events",
+    "consumed_media",
+    "consumed_songs",
+    "apple_music_sync_log",
+    "consumed_day_rollup",
+    "consumed_listening_daily",
+    "consumed_listening_totals"
+]
+
+# Serialises concurrent deploys; arbitrary but fixed
+MIGRATION_LOCK_ID = 727_001
+
+
+class Migration(NamedTuple):
+    version: str
+    path: Path
+    sql: str
+    checksum: str
+    transactional: bool
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for path in sorted(directory.glob("*.sql")):
+        sql = path.read_text(encoding="utf-8")
+        migrations.append(Migration(
+            version=path.stem,
+            path=path,
+            sql=sql,
+            checksum=hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+            transactional=not sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+        ))
+    return migrations
+
+
+def split_statements(sql: str) -> List[str]:
+    # Only for no-transaction files: statements end with ';' at the end of a line
+    statements = []
+    current = []
+    for line in sql.splitlines():
+        is_comment = line.strip().startswith("--")
+        if not current and (not line.strip() or is_comment):
+            continue
+        current.append(line)
+        if not is_comment and line.rstrip().endswith(";"):
+            statements.append("\n".join(current))
+            current = []
+    if any(line.strip() and not line.strip().startswith("--") for line in current):
+        statements.append("\n".join(current))
+    return statements
+
+
+async def ensure_migrations_table(conn: asyncpg.Connection) -> None:
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            duration_ms INT NOT NULL
+        )
+        """
+    )
+
+
+async def applied_migrations(conn: asyncpg.Connection) -> Dict[str, str]:
+    rows = await conn.fetch("SELECT version, checksum FROM schema_migrations")
+    return {row["version"]: row["checksum"] for row in rows}
+
+
+async def index_is_valid(conn: asyncpg.Connection, name: str):
+    # None when no index of that name is on the search path
+    return await conn.fetchval("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)", name)
+
+
+async def execute_concurrent_statement(conn: asyncpg.Connection, statement: str) -> None:
+    match = CONCURRENT_INDEX.search(statement)
+    if match and await index_is_valid(conn, match.group(1)) is False:
+        print(f"⚠ Dropping INVALID index {match.group(1)} left by an earlier failed build")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+
+    await conn.execute(statement)
+
+    # Later statements may depend on the index (011 drops the one it replaces)
+    if match and await index_is_valid(conn, match.group(1)) is False:
+        raise RuntimeError(f"Index {match.group(1)} is INVALID after building it")
+
+
+async def apply_migration(conn: asyncpg.Connection, migration: Migration) -> float:
+    started = time.perf_counter()
+
+    async def record():
+        await conn.execute(
+            "INSERT INTO schema_migrations (version, checksum, duration_ms) VALUES ($1, $2, $3)",
+            migration.version,
+            migration.checksum,
+            round((time.perf_counter() - started) * 1000)
+        )
+
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await record()
+    else:
+        for statement in split_statements(migration.sql):
+            await execute_concurrent_statement(conn, statement)
+        await record()
+
+    return time.perf_counter() - started
+
+
+async def migrate(conn: asyncpg.Connection, migrations: List[Migration], quiet: bool = False) -> int:
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
 
+    try:
+        await ensure_migrations_table(conn)
+        applied = await applied_migrations(conn)
 
-async def run_migration():
-    migration_files = sorted(glob.glob("migrations/*.sql"))
+        changed = [
+            m.version for m in migrations
+            if m.version in applied and applied[m.version] != m.checksum
+        ]
+        if changed:
+            raise RuntimeError(
+                f"Applied migration(s) edited since they ran: {', '.join(changed)}. "
+                "Add a new migration instead of changing an old one."
+            )
+
+        pending = [m for m in migrations if m.version not in applied]
+        for migration in pending:
+            mode = "" if migration.transactional else " (no transaction)"
+            if not quiet:
+                print(f"Applying {migration.path.name}{mode}...")
+            try:
+                elapsed = await apply_migration(conn, migration)
+            except Exception as e:
+                print(f"✗ Error in {migration.path.name}: {e}")
+                if not migration.transactional:
+                    print("  Fix the cause and re-run; INVALID indexes left behind are rebuilt on retry")
+                raise
+            if not quiet:
+                print(f"✓ {migration.path.name} applied in {elapsed * 1000:.0f}ms")
 
-    if not migration_files:
-        print("No migration files found in migrations/")
-        return
+        return len(pending)
 
-    print(f"Found {len(migration_files)} migration file(s)")
-    print(f"Connecting to database...")
-    conn = await asyncpg.connect(database_url)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
 
-    try:
-        for migration_file in migration_files:
-            print(f"\n{'='*60}")
-            print(f"Running migration: {migration_file}")
-            print(f"{'='*60}")
 
-            with open(migration_file, "r") as f:
-                sql = f.read()
+async def run_migration(directory: Path = MIGRATIONS_DIR, status_only: bool = False):
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("ERROR: DATABASE_URL not set")
+        sys.exit(1)
 
-            try:
-                await conn.execute(sql)
-                print(f"✓ Migration {Path(migration_file).name} completed successfully!")
-            except Exception as e:
-                error_msg = str(e).lower()
-                if "already exists" in error_msg or "duplicate" in error_msg:
-                    print(f"⚠ Migration {Path(migration_file).name}: Some objects already exist (skipped)")
-                else:
-                    print(f"✗ Error in {Path(migration_file).name}: {e}")
-                    raise
-
-        print(f"\n{'='*60}")
-        print("Verifying database schema...")
-        print(f"{'='*60}")
-
-        tables_to_check = [
-            'consumed_events',
-            'consumed_media',
-            'consumed_songs',
-            'apple_music_sync_log'
-        ]
+    migrations = load_migrations(directory)
+    if not migrations:
+        print(f"No migration files found in {directory}/")
+        return
 
-        for table in tables_to_check:
-            exists = await conn.fetchval(f"""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables
-                    WHERE table_name = '{table}'
-                )
-            """)
-            status = "✓" if exists else "✗"
-            print(f"{status} Table '{table}': {'exists' if exists else 'NOT FOUND'}")
+    conn = await asyncpg.connect(database_url)
 
-        print(f"\n{'='*60}")
-        print("✓ All migrations completed!")
-        print(f"{'='*60}")
+    try:
+        if status_only:
+            await ensure_migrations_table(conn)
+            applied = await applied_migrations(conn)
+            for migration in migrations:
+                if migration.version not in applied:
+                    state = "pending"
+                elif applied[migration.version] != migration.checksum:
+                    state = "CHANGED since applied"
+                else:
+                    state = "applied"
+                print(f"  {migration.path.name:<40} {state}")
+            return
+
+        started = time.perf_counter()
+        count = await migrate(conn, migrations)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        if count:
+            print(f"✓ Applied {count} migration(s) in {elapsed:.0f}ms")
+        else:
+            print(f"✓ Schema up to date ({len(migrations)} migration(s), checked in {elapsed:.0f}ms)")
+
+        existing = set(await conn.fetchval(
+            "SELECT array_agg(table_name::text) FROM information_schema.tables WHERE table_name = ANY($1::text[])",
+            EXPECTED_TABLES
+        ) or [])
+        for table in EXPECTED_TABLES:
+            if table not in existing:
+                print(f"✗ Table '{table}': NOT FOUND")
 
     finally:
         await conn.close()
 
 
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Apply pending migrations once each, tracked in schema_migrations"
+    )
+    parser.add_argument(
+        "--dir",
+        type=Path,
+        default=MIGRATIONS_DIR,
+        help="Migrations directory (default: migrations/ at the repo root)"
+    )
+    parser.add_argument(
+        "--status",
+        action="store_true",
+        help="List applied and pending migrations without applying anything"
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_migration(args.dir, status_only=args.status))
+    except RuntimeError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+
 if __name__ == "__main__":
-    asyncio.run(run_migration())
+    main()
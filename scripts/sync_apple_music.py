@@ -1,7 +1,26 @@
+"""
+Sync recently played Apple Music tracks into consumed_songs.
+
+Each poll compares the recently-played list with the previous snapshot as a sequence: new
+plays are the entries in front of where the previous list resumes, so a replayed track
+counts again. Play times are worked back from the poll time using track lengths. After a
+gap the client pages back through the history until it reaches the previous snapshot.
+
+Run once (the hourly workflow), or as a daemon that polls every --min-interval seconds
+while music is playing and backs off to --max-interval when nothing changes. Use one or
+the other: both diff against the last logged snapshot, and two writers would double-count.
+
+Usage:
+    python scripts/sync_apple_music.py
+    python scripts/sync_apple_music.py --daemon --min-interval 120 --max-interval 1800
+"""
+
 import asyncio
+import signal
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta
+from typing import Callable, List, Dict, Optional, Tuple
 import os
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "ingest"))
@@ -10,8 +29,8 @@ from dotenv import load_dotenv
 from app.apple_music import AppleMusicClient
 from app.db import (
     get_db_connection,
-    create_song,
-    get_last_api_song_ids,
+    create_songs_bulk,
+    get_last_sync_snapshot,
     create_sync_log,
     close_pool
 )
@@ -22,6 +41,17 @@ load_dotenv(override=True)
 
 LA_TZ = pytz.timezone("America/Los_Angeles")
 
+RECENTLY_PLAYED_LIMIT = 30
+
+# Entries of the previous snapshot that must be found in a row before paging stops
+SYNC_OVERLAP_CONFIRM = int(os.getenv("SYNC_OVERLAP_CONFIRM", "10"))
+
+# Assumed length of a track the API gives no duration for
+DEFAULT_TRACK_MS = 4 * 60 * 1000
+
+SYNC_MIN_INTERVAL = float(os.getenv("SYNC_MIN_INTERVAL", "120"))
+SYNC_MAX_INTERVAL = float(os.getenv("SYNC_MAX_INTERVAL", "1800"))
+
 
 def derive_day(occurred_at: datetime) -> str:
     if occurred_at.tzinfo is None:
@@ -31,104 +61,157 @@ def derive_day(occurred_at: datetime) -> str:
     return la_time.date().isoformat()
 
 
-async def sync_songs():
-    try:
-        client = AppleMusicClient()
-        await get_db_connection()
+def song_key(song: Dict) -> str:
+    return song.get("apple_music_id") or f"{song.get('title')}|{song.get('artist')}"
+
+
+def count_new_plays(current: List[str], previous: List[str], min_overlap: int = 1) -> Optional[int]:
+    # Both lists are newest first and new plays push older ones down, so after the new plays
+    # the current list continues with the start of the previous one, until either list runs
+    # out. The longest such overlap leaves the fewest new plays in front of it; overlaps
+    # shorter than min_overlap don't count. None means no overlap: everything listed is new,
+    # and plays may have scrolled off the history between the two polls.
+    for new_plays in range(len(current)):
+        overlap = min(len(current) - new_plays, len(previous))
+        if overlap < min_overlap:
+            break
+        if current[new_plays:new_plays + overlap] == previous[:overlap]:
+            return new_plays
+    return None
+
+
+def reached_snapshot(previous_keys: List[str]) -> Callable[[List[Dict]], bool]:
+    # Paging stop condition for get_recently_played(): the songs fetched so far overlap the
+    # previous snapshot by enough entries to be sure where it resumes
+    confirm = min(SYNC_OVERLAP_CONFIRM, len(previous_keys))
 
-        songs = client.get_recently_played(limit=30)
+    def until(songs: List[Dict]) -> bool:
+        current = [song_key(song) for song in songs]
+        return count_new_plays(current, previous_keys, min_overlap=confirm) is not None
 
-        if not songs:
-            print("⚠ No songs returned from API")
-            return 0
+    return until
 
-        current_song_ids = [song.get("apple_music_id") for song in songs if song.get("apple_music_id")]
 
-        previous_song_ids = await get_last_api_song_ids()
+def infer_play_times(songs: List[Dict], now: datetime, since: Optional[datetime]) -> List[datetime]:
+    # New plays, newest first, are laid back to back ending now. If their lengths add up to
+    # more than the time since the last poll (skipped tracks), they are squeezed to fit.
+    durations = [song.get("duration_ms") or DEFAULT_TRACK_MS for song in songs]
+    total_ms = sum(durations)
 
-        if previous_song_ids is None:
-            songs_to_add = songs
-        elif current_song_ids == previous_song_ids:
+    scale = 1.0
+    if since is not None:
+        window_ms = (now - since).total_seconds() * 1000
+        if 0 < window_ms < total_ms:
+            scale = window_ms / total_ms
+
+    played_at = []
+    elapsed_ms = 0.0
+    for duration in durations:
+        elapsed_ms += duration * scale
+        played_at.append(now - timedelta(milliseconds=elapsed_ms))
+    return played_at
+
+
+def next_interval(interval: float, new_plays: int, min_interval: float, max_interval: float) -> float:
+    # Poll at the fast rate while the list moves, double the wait each idle poll
+    if new_plays:
+        return min_interval
+    return min(max_interval, interval * 2)
+
+
+async def sync_once(
+    client: AppleMusicClient,
+    previous: Optional[Tuple[List[str], datetime]]
+) -> Tuple[int, int, Optional[Tuple[List[str], datetime]]]:
+    # Returns (songs added, new plays seen, snapshot to diff the next poll against)
+    until = reached_snapshot(previous[0]) if previous is not None and previous[0] else None
+    # The client blocks (requests, plus sleeps between retries) for up to its deadline; run it
+    # on a thread so the daemon's signal handlers and the DB pool keep being serviced
+    songs = await asyncio.to_thread(client.get_recently_played, limit=RECENTLY_PLAYED_LIMIT, until=until)
+    now_utc = datetime.now(pytz.utc)
+
+    if not songs:
+        print("⚠ No songs returned from API")
+        return 0, 0, previous
+
+    current_keys = [song_key(song) for song in songs]
+
+    since = None
+    if previous is None:
+        new_plays = len(songs)
+    else:
+        previous_keys, since = previous
+        new_plays = count_new_plays(current_keys, previous_keys)
+        if new_plays is None:
+            new_plays = len(songs)
+            print(f"⚠ No overlap with the previous snapshot; plays since {since.isoformat()} may be missing")
+        elif new_plays == 0:
             print("✓ No new music (API unchanged)")
-            songs_to_add = []
         else:
-            previous_set = set(previous_song_ids)
-            songs_to_add = []
-
-            for song in songs:
-                song_id = song.get("apple_music_id")
-                if song_id and song_id not in previous_set:
-                    songs_to_add.append(song)
-
-            print(f"Found {len(songs_to_add)} new song(s)")
-
-        if not songs_to_add:
-            await create_sync_log(
-                songs_fetched=len(songs),
-                songs_added=0,
-                latest_song_id=songs[0].get("apple_music_id") if songs else None,
-                api_song_ids=current_song_ids,
-                status="success"
-            )
-            return 0
-
-        new_songs_count = 0
-        duplicate_count = 0
-        skipped_count = 0
-
-        now_utc = datetime.now(pytz.utc)
-        today = derive_day(now_utc)
-
-        for song_data in songs_to_add:
-            if not song_data.get("title") or not song_data.get("artist"):
-                skipped_count += 1
-                continue
-
-            position = song_data.get("position", 0)
-            minutes_back = position * 4
-            played_at = now_utc - timedelta(minutes=minutes_back)
+            print(f"Found {new_plays} new play(s)")
 
-            try:
-                _, was_inserted = await create_song(
-                    played_at=played_at,
-                    day=today,
-                    title=song_data["title"],
-                    artist=song_data["artist"],
-                    album=song_data.get("album"),
-                    apple_music_id=song_data.get("apple_music_id"),
-                    isrc=song_data.get("isrc"),
-                    duration_ms=song_data.get("duration_ms"),
-                    release_date=song_data.get("release_date"),
-                    apple_music_url=song_data.get("apple_music_url"),
-                    artwork_url=song_data.get("artwork_url"),
-                    payload=song_data.get("payload", {})
-                )
-                if was_inserted:
-                    new_songs_count += 1
-                    print(f"  ✓ {song_data['title']} - {song_data['artist']}")
-                else:
-                    duplicate_count += 1
-            except Exception as e:
-                if "duplicate key" not in str(e).lower():
-                    print(f"  ✗ {song_data.get('title', 'Unknown')}: {str(e)[:80]}")
-                else:
-                    duplicate_count += 1
-                skipped_count += 1
+    snapshot = (current_keys, now_utc)
 
+    # An idle poll changes nothing worth a row; the daemon would otherwise log one per poll
+    if new_plays == 0:
+        return 0, 0, snapshot
+
+    songs_to_add = [song for song in songs[:new_plays] if song.get("title") and song.get("artist")]
+    if not songs_to_add:
         await create_sync_log(
             songs_fetched=len(songs),
-            songs_added=new_songs_count,
-            latest_song_id=songs[0].get("apple_music_id") if songs else None,
-            api_song_ids=current_song_ids,
+            songs_added=0,
+            latest_song_id=songs[0].get("apple_music_id"),
+            api_song_ids=current_keys,
             status="success"
         )
+        return 0, new_plays, snapshot
+
+    batch = []
+    for song_data, played_at in zip(songs_to_add, infer_play_times(songs_to_add, now_utc, since)):
+        batch.append({
+            **song_data,
+            "played_at": played_at,
+            "day": derive_day(played_at),
+            "payload": song_data.get("payload", {})
+        })
 
-        if new_songs_count > 0:
-            print(f"✓ Added {new_songs_count} song(s) to {today}")
-        if duplicate_count > 0:
-            print(f"  ({duplicate_count} already in database)")
+    # The snapshot is logged with the plays it produced, so a failed poll is diffed again whole
+    results = await create_songs_bulk(batch, sync_log={
+        "songs_fetched": len(songs),
+        "latest_song_id": songs[0].get("apple_music_id"),
+        "api_song_ids": current_keys,
+        "status": "success"
+    })
+
+    new_songs_count = 0
+    duplicate_count = 0
+
+    for song_data, (_, was_inserted) in zip(batch, results):
+        if was_inserted:
+            new_songs_count += 1
+            print(f"  ✓ {song_data['title']} - {song_data['artist']} ({song_data['played_at']:%H:%M})")
+        else:
+            duplicate_count += 1
 
-        return new_songs_count
+    if new_songs_count > 0:
+        print(f"✓ Added {new_songs_count} song(s)")
+    if duplicate_count > 0:
+        print(f"  ({duplicate_count} already in database)")
+
+    return new_songs_count, new_plays, snapshot
+
+
+async def sync_songs():
+    try:
+        client = AppleMusicClient()
+        await get_db_connection()
+
+        try:
+            added, _, _ = await sync_once(client, await get_last_sync_snapshot())
+        finally:
+            client.close()
+        return added
 
     except ValueError as e:
         print(f"✗ Configuration error: {e}")
@@ -140,7 +223,69 @@ async def sync_songs():
         await close_pool()
 
 
+async def run_daemon(min_interval: float, max_interval: float):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        client = AppleMusicClient()
+        await get_db_connection()
+        # Later polls diff against the snapshot in memory
+        previous = await get_last_sync_snapshot()
+    except ValueError as e:
+        print(f"✗ Configuration error: {e}")
+        await close_pool()
+        return 1
+
+    interval = min_interval
+    print(f"Polling every {min_interval:.0f}s while playing, up to {max_interval:.0f}s when idle")
+
+    try:
+        while not stop.is_set():
+            try:
+                _, new_plays, previous = await sync_once(client, previous)
+                interval = next_interval(interval, new_plays, min_interval, max_interval)
+            except Exception as e:
+                print(f"✗ Error: {e}")
+                interval = min(max_interval, interval * 2)
+
+            print(f"Next poll in {interval:.0f}s")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        client.close()
+        await close_pool()
+
+    print("Sync daemon stopped")
+    return 0
+
+
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sync recently played Apple Music tracks")
+    parser.add_argument("--daemon", action="store_true", help="Keep polling on an adaptive interval")
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=SYNC_MIN_INTERVAL,
+        help=f"Seconds between polls while music is playing (default: {SYNC_MIN_INTERVAL:.0f})"
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=SYNC_MAX_INTERVAL,
+        help=f"Longest wait between polls when idle (default: {SYNC_MAX_INTERVAL:.0f})"
+    )
+    args = parser.parse_args()
+
+    if args.daemon:
+        sys.exit(asyncio.run(run_daemon(args.min_interval, args.max_interval)))
+
     try:
         result = asyncio.run(sync_songs())
         sys.exit(0 if result >= 0 else 1)
@@ -128,48 +128,58 @@
   // Expose to global scope
   window.scrambleText = scrambleText;
 
-  // Auto-initialize on hover for elements with data-scramble attribute
-  document.addEventListener('DOMContentLoaded', function() {
-    const scrambleElements = document.querySelectorAll('[data-scramble]');
+  // Scramble on hover
+  function bindScramble(element) {
+    let cleanup = null;
+    let isAnimating = false;
     
-    scrambleElements.forEach(function(element) {
-      let cleanup = null;
-      let isAnimating = false;
-      
-      element.addEventListener('mouseenter', function() {
-        // Don't start animation if text is selected
-        const selection = window.getSelection();
-        if (selection && selection.toString().length > 0) {
-          return;
-        }
-        
-        if (cleanup) cleanup();
-        isAnimating = true;
-        cleanup = scrambleText(element);
-        
-        // Stop animation after it completes
-        setTimeout(function() {
-          isAnimating = false;
-        }, 2000);
-      });
+    element.addEventListener('mouseenter', function() {
+      // Don't start animation if text is selected
+      const selection = window.getSelection();
+      if (selection && selection.toString().length > 0) {
+        return;
+      }
       
-      // Stop animation if user starts selecting text
-      element.addEventListener('mousedown', function() {
-        if (cleanup && isAnimating) {
-          cleanup();
-          cleanup = null;
-          isAnimating = false;
-        }
-      });
+      if (cleanup) cleanup();
+      isAnimating = true;
+      cleanup = scrambleText(element);
       
-      // Prevent animation during text selection
-      element.addEventListener('selectstart', function() {
-        if (cleanup && isAnimating) {
-          cleanup();
-          cleanup = null;
-          isAnimating = false;
-        }
-      });
+      // Stop animation after it completes
+      setTimeout(function() {
+        isAnimating = false;
+      }, 2000);
+    });
+    
+    // Stop animation if user starts selecting text
+    element.addEventListener('mousedown', function() {
+      if (cleanup && isAnimating) {
+        cleanup();
+        cleanup = null;
+        isAnimating = false;
+      }
     });
+    
+    // Prevent animation during text selection
+    element.addEventListener('selectstart', function() {
+      if (cleanup && isAnimating) {
+        cleanup();
+        cleanup = null;
+        isAnimating = false;
+      }
+    });
+  }
+
+  // Bind every data-scramble element under root (used for lazily loaded shards too)
+  function initScramble(root) {
+    const scope = root || document;
+    const scrambleElements = scope.querySelectorAll('[data-scramble]');
+    scrambleElements.forEach(bindScramble);
+  }
+
+  window.initScramble = initScramble;
+
+  // Auto-initialize on hover for elements with data-scramble attribute
+  document.addEventListener('DOMContentLoaded', function() {
+    initScramble(document);
   });
 })();
@@ -0,0 +1,173 @@
+/**
+ * Client-side search
+ * Fetches only the term shards for the words typed, then the document chunks
+ * holding the newest matches
+ */
+
+(function() {
+  'use strict';
+
+  const MAX_RESULTS = 50;
+  const MAX_WORDS = 8;
+
+  document.addEventListener('DOMContentLoaded', function() {
+    const form = document.querySelector('form.search[data-search]');
+    const results = document.querySelector('.search-results');
+    if (!form || !results || !window.fetch) return;
+
+    const input = form.querySelector('input');
+    const indexUrl = form.getAttribute('data-search');
+    const base = indexUrl.replace(/index\.json$/, '');
+    const root = form.getAttribute('data-root') || '';
+    const requests = {};
+    let generation = 0;
+
+    // Each file is fetched once per page view; failures are forgotten so a retry can work
+    function load(url) {
+      if (!requests[url]) {
+        requests[url] = fetch(url).then(function(response) {
+          if (!response.ok) throw new Error(response.status + ' ' + url);
+          return response.json();
+        });
+        requests[url].catch(function() { delete requests[url]; });
+      }
+      return requests[url];
+    }
+
+    // Must match search_tokens() in build.py
+    function tokenize(text, index) {
+      const words = text.toLowerCase().normalize('NFKD').replace(/\p{M}/gu, '')
+        .match(/[\p{L}\p{N}]+/gu) || [];
+      const seen = [];
+      words.forEach(function(word) {
+        const chars = Array.from(word);
+        if (chars.length < index.prefix_length) return;
+        word = chars.slice(0, index.max_term_length).join('');
+        if (seen.indexOf(word) === -1) seen.push(word);
+      });
+      return seen.slice(0, MAX_WORDS);
+    }
+
+    // Must match search_shard_key() in build.py
+    function shardKey(word, index) {
+      return Array.from(word).slice(0, index.prefix_length).map(function(char) {
+        return /^[a-z0-9]$/.test(char) ? char : '_' + char.codePointAt(0).toString(16);
+      }).join('');
+    }
+
+    function loadShard(word, index) {
+      const key = shardKey(word, index);
+      if (!index.terms[key]) return Promise.resolve({});
+      return load(base + 'terms/' + key + '.json?v=' + index.terms[key]);
+    }
+
+    // Every word matches as a prefix; a document must match all of them
+    function match(words, shards, index) {
+      const hits = new Uint8Array(index.docs);
+      words.forEach(function(word, position) {
+        const shard = shards[position];
+        Object.keys(shard).forEach(function(term) {
+          if (term.lastIndexOf(word, 0) !== 0) return;
+          let id = 0;
+          shard[term].forEach(function(delta) {
+            id += delta;
+            if (hits[id] === position) hits[id] = position + 1;
+          });
+        });
+      });
+
+      const ids = [];
+      let total = 0;
+      for (let id = index.docs - 1; id >= 0; id--) {
+        if (hits[id] !== words.length) continue;
+        total++;
+        if (ids.length < MAX_RESULTS) ids.push(id);
+      }
+      return { ids: ids, total: total };
+    }
+
+    function loadDocs(ids, index) {
+      const chunks = [];
+      ids.forEach(function(id) {
+        const chunk = Math.floor(id / index.chunk_size);
+        if (chunks.indexOf(chunk) === -1) chunks.push(chunk);
+      });
+      return Promise.all(chunks.map(function(chunk) {
+        return load(base + 'docs/' + chunk + '.json?v=' + index.chunks[chunk]);
+      })).then(function(loaded) {
+        return ids.map(function(id) {
+          const chunk = Math.floor(id / index.chunk_size);
+          return loaded[chunks.indexOf(chunk)][id - chunk * index.chunk_size];
+        });
+      });
+    }
+
+    function render(docs, total) {
+      results.textContent = '';
+
+      const summary = document.createElement('p');
+      summary.className = 'subtitle';
+      summary.textContent = total === 1 ? '1 result' : total + ' results';
+      if (total > docs.length) summary.textContent += ', newest ' + docs.length + ' shown';
+      results.appendChild(summary);
+
+      docs.forEach(function(doc) {
+        const day = doc[0], type = doc[1], text = doc[2], url = doc[3];
+        const row = document.createElement('p');
+        row.className = 'search-result';
+
+        const date = document.createElement('a');
+        date.className = 'date';
+        date.href = root + 'archive/' + day.slice(0, 7) + '.html';
+        date.textContent = day;
+        row.appendChild(date);
+        row.appendChild(document.createTextNode(' ' + type + ' '));
+
+        const title = document.createElement(url ? 'a' : 'span');
+        if (url) title.href = url;
+        title.textContent = text;
+        row.appendChild(title);
+
+        results.appendChild(row);
+      });
+
+      results.hidden = false;
+    }
+
+    function search() {
+      const current = ++generation;
+      const query = input.value;
+
+      load(indexUrl)
+        .then(function(index) {
+          const words = tokenize(query, index);
+          if (!words.length) {
+            if (current === generation) results.hidden = true;
+            return;
+          }
+          return Promise.all(words.map(function(word) { return loadShard(word, index); }))
+            .then(function(shards) {
+              const found = match(words, shards, index);
+              return loadDocs(found.ids, index).then(function(docs) {
+                // A slower, older query must not overwrite a newer one
+                if (current === generation) render(docs, found.total);
+              });
+            });
+        })
+        .catch(function(error) {
+          console.error('Search failed', error);
+        });
+    }
+
+    input.addEventListener('input', search);
+    form.addEventListener('submit', function(event) {
+      event.preventDefault();
+      search();
+    });
+
+    // Warm the index as soon as the visitor shows interest
+    input.addEventListener('focus', function() { load(indexUrl).catch(function() {}); }, { once: true });
+
+    form.hidden = false;
+  });
+})();
@@ -0,0 +1,86 @@
+/**
+ * Lazy shard loader
+ * Appends older months from shards.json as the visitor scrolls
+ */
+
+(function() {
+  'use strict';
+
+  document.addEventListener('DOMContentLoaded', function() {
+    const container = document.querySelector('[data-shards]');
+    const sentinel = document.getElementById('shard-sentinel');
+    if (!container || !sentinel || !('IntersectionObserver' in window)) return;
+
+    let queue = null;
+    let loading = false;
+
+    // Oldest day currently on the page; shards overlap the landing page's last month
+    function oldestDay() {
+      const days = container.querySelectorAll('details.day[data-day]');
+      return days.length ? days[days.length - 1].getAttribute('data-day') : null;
+    }
+
+    function loadIndex() {
+      return fetch(container.getAttribute('data-shards'))
+        .then(function(response) { return response.json(); })
+        .then(function(index) {
+          const oldest = oldestDay();
+          queue = index.shards.filter(function(shard) {
+            return !oldest || shard.first_day < oldest;
+          });
+        });
+    }
+
+    function appendShard(html) {
+      const template = document.createElement('template');
+      template.innerHTML = html;
+
+      const oldest = oldestDay();
+      template.content.querySelectorAll('details.day[data-day]').forEach(function(day) {
+        if (oldest && day.getAttribute('data-day') >= oldest) return;
+        container.insertBefore(day, sentinel);
+        if (window.initScramble) window.initScramble(day);
+      });
+    }
+
+    function loadNext() {
+      if (loading) return;
+      loading = true;
+
+      const ready = queue ? Promise.resolve() : loadIndex();
+      ready
+        .then(function() {
+          const shard = queue.shift();
+          if (!shard) {
+            observer.disconnect();
+            return;
+          }
+          return fetch(shard.url)
+            .then(function(response) { return response.text(); })
+            .then(appendShard);
+        })
+        .catch(function(error) {
+          console.error('Failed to load shard', error);
+          observer.disconnect();
+        })
+        .then(function() {
+          loading = false;
+          // Keep filling while the sentinel is still on screen
+          if (queue && queue.length && isVisible()) loadNext();
+        });
+    }
+
+    function isVisible() {
+      const rect = sentinel.getBoundingClientRect();
+      return rect.top < window.innerHeight + 600;
+    }
+
+    const observer = new IntersectionObserver(function(entries) {
+      if (entries.some(function(entry) { return entry.isIntersecting; })) {
+        loadNext();
+      }
+    }, { root: container, rootMargin: '600px 0px' });
+
+    observer.observe(sentinel);
+  });
+})();
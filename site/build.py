@@ -1,5 +1,11 @@
 import os
+import re
 import sys
+import gzip
+import json
+import hashlib
+import functools
+import unicodedata
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
@@ -8,7 +14,15 @@ from html import escape
 from dotenv import load_dotenv
 import asyncpg
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import stats
 
 load_dotenv()
 
@@ -18,105 +32,185 @@ if not database_url:
 
 image_base_url = os.getenv("IMAGE_BASE_URL", "").rstrip("/")
 
+cache_dir = Path(os.getenv("BUILD_CACHE_DIR", Path(__file__).parent / ".build-cache"))
+fragments_dir = cache_dir / "days"
+manifest_file = cache_dir / "manifest.json"
 
-async def fetch_events():
-    conn = await asyncpg.connect(database_url)
+output_dir = Path(__file__).parent / "docs"
+assets_source_dir = Path(__file__).parent / "assets"
 
-    try:
-        rows = await conn.fetch(
-            """
-            SELECT
-                e.id as event_id,
-                e.occurred_at,
-                e.day,
-                e.type,
-                e.title,
-                e.url,
-                e.payload,
-                m.id as media_id,
-                m.path as media_path,
-                m.width,
-                m.height
-            FROM consumed_events e
-            LEFT JOIN consumed_media m ON m.event_id = e.id
-            ORDER BY e.day DESC, e.occurred_at DESC
-            """
-        )
+# Copied under content-hashed names so they can be cached as immutable; the noise texture
+# comes first because site.css refers to it
+ASSET_FILES = ["framer-noise.png", "site.css", "scramble.js", "shards.js", "search.js"]
 
-        events_dict = {}
-        for row in rows:
-            event_id = str(row["event_id"])
-            if event_id not in events_dict:
-                events_dict[event_id] = {
-                    "id": event_id,
-                    "occurred_at": row["occurred_at"].isoformat() if row["occurred_at"] else "",
-                    "day": row["day"].isoformat() if row["day"] else "",
-                    "type": row["type"],
-                    "title": row["title"] or "",
-                    "url": row["url"] or "",
-                    "payload": row["payload"] or {},
-                    "media": [],
-                }
-
-            if row["media_id"]:
-                events_dict[event_id]["media"].append(
-                    {
-                        "id": str(row["media_id"]),
-                        "path": row["media_path"],
-                        "width": row["width"],
-                        "height": row["height"],
-                    }
-                )
-
-        return list(events_dict.values())
+# Outputs that get .gz (and .br, when brotli is installed) siblings for hosts that serve them
+COMPRESSIBLE_SUFFIXES = {".html", ".css", ".js", ".json"}
 
-    finally:
-        await conn.close()
+# Source name -> fingerprinted name, filled by build_assets()
+asset_names = {}
+
+# How many days the landing page renders inline; older days load as monthly shards
+recent_days = int(os.getenv("SITE_RECENT_DAYS", "30"))
 
+# Rows pulled per round trip from the server-side cursor
+cursor_prefetch = int(os.getenv("BUILD_CURSOR_PREFETCH", "500"))
 
-async def fetch_songs():
+# Search results are fetched in chunks of this many documents; the newest results share a chunk
+search_chunk_size = int(os.getenv("SEARCH_CHUNK_SIZE", "500"))
+
+# Any change to the renderer or the image host invalidates every cached fragment
+render_version = hashlib.sha256(
+    Path(__file__).read_bytes() + image_base_url.encode("utf-8")
+).hexdigest()[:16]
+
+# Stats pages also depend on the queries in stats.py and how many entries they keep
+stats_version = hashlib.sha256(
+    render_version.encode("utf-8")
+    + Path(stats.__file__).read_bytes()
+    + str(stats.STATS_TOP_N).encode("utf-8")
+).hexdigest()[:16]
+
+
+async def connect():
     conn = await asyncpg.connect(database_url)
 
-    try:
-        rows = await conn.fetch(
-            """
-            SELECT
-                id,
-                played_at,
-                day,
-                title,
-                artist,
-                album,
-                apple_music_url,
-                artwork_url,
-                duration_ms
-            FROM consumed_songs
-            ORDER BY day DESC, played_at DESC
-            """
+    # Decode json/jsonb server-side aggregates straight into Python objects
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name,
+            encoder=json.dumps,
+            decoder=json.loads,
+            schema="pg_catalog"
         )
 
-        songs = []
-        for row in rows:
-            songs.append({
-                "id": str(row["id"]),
-                "occurred_at": row["played_at"].isoformat() if row["played_at"] else "",
-                "day": row["day"].isoformat() if row["day"] else "",
-                "type": "music",
-                "title": row["title"] or "",
-                "url": row["apple_music_url"] or "",
-                "payload": {
-                    "artist": row["artist"] or "",
-                    "album": row["album"] or "",
-                    "artwork_url": row["artwork_url"] or "",
-                    "duration_ms": row["duration_ms"],
-                },
-                "media": [],
-            })
-
-        return songs
+    return conn
 
-    finally:
-        await conn.close()
+
+# consumed_day_rollup (migrations/009) is kept current by triggers on the raw tables, so
+# deciding what to rebuild never touches them
+async def fetch_watermark(conn):
+    row = await conn.fetchrow(
+        """
+        SELECT COUNT(*) AS days, md5(string_agg(content_hash, '' ORDER BY day)) AS digest
+        FROM consumed_day_rollup
+        """
+    )
+
+    return {"days": row["days"], "digest": row["digest"] or ""}
+
+
+async def fetch_day_fingerprints(conn):
+    rows = await conn.fetch("SELECT day, content_hash FROM consumed_day_rollup")
+    return {row["day"].isoformat(): row["content_hash"] for row in rows}
+
+
+# One row per item: events with their media (and variants) aggregated server-side,
+# and songs shaped like events, so nothing is regrouped in Python
+ITEMS_QUERY = """
+    SELECT id, occurred_at, day, type, title, url, payload, media
+    FROM (
+        SELECT
+            e.id,
+            e.occurred_at,
+            e.day,
+            e.type,
+            e.title,
+            e.url,
+            e.payload::jsonb AS payload,
+            COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', m.id,
+                            'path', m.path,
+                            'width', m.width,
+                            'height', m.height,
+                            'variants', COALESCE(
+                                (
+                                    SELECT json_agg(
+                                        json_build_object('path', v.path, 'width', v.width, 'height', v.height)
+                                        ORDER BY v.width
+                                    )
+                                    FROM consumed_media_variants v
+                                    WHERE v.media_id = m.id
+                                ),
+                                '[]'::json
+                            )
+                        )
+                        ORDER BY m.id
+                    )
+                    FROM consumed_media m
+                    WHERE m.event_id = e.id AND m.status = 'ready'
+                ),
+                '[]'::json
+            ) AS media
+        FROM consumed_events e
+        WHERE $1::date[] IS NULL OR e.day = ANY($1::date[])
+
+        UNION ALL
+
+        SELECT
+            s.id,
+            s.played_at,
+            s.day,
+            'music',
+            s.title,
+            s.apple_music_url,
+            jsonb_build_object(
+                'artist', COALESCE(s.artist, ''),
+                'album', COALESCE(s.album, ''),
+                'artwork_url', COALESCE(s.artwork_url, ''),
+                'duration_ms', s.duration_ms
+            ),
+            '[]'::json
+        FROM consumed_songs s
+        WHERE $1::date[] IS NULL OR s.day = ANY($1::date[])
+    ) items
+    ORDER BY day DESC, occurred_at DESC
+"""
+
+
+def item_from_row(row):
+    return {
+        "id": str(row["id"]),
+        "occurred_at": row["occurred_at"].isoformat() if row["occurred_at"] else "",
+        "day": row["day"].isoformat() if row["day"] else "",
+        "type": row["type"],
+        "title": row["title"] or "",
+        "url": row["url"] or "",
+        "payload": row["payload"] or {},
+        "media": row["media"],
+    }
+
+
+async def fetch_items(conn, days=None):
+    rows = await conn.fetch(ITEMS_QUERY, _day_params(days))
+    return [item_from_row(row) for row in rows]
+
+
+async def iter_day_groups(conn, days=None):
+    # Rows arrive ordered by day, so a day is complete as soon as the next one starts;
+    # only one day's items are ever held in memory
+    async with conn.transaction():
+        current_day = None
+        current_items = []
+
+        async for row in conn.cursor(ITEMS_QUERY, _day_params(days), prefetch=cursor_prefetch):
+            item = item_from_row(row)
+            if item["day"] != current_day and current_items:
+                yield {"day": current_day, "events": current_items}
+                current_items = []
+            current_day = item["day"]
+            current_items.append(item)
+
+        if current_items:
+            yield {"day": current_day, "events": current_items}
+
+
+def _day_params(days):
+    if days is None:
+        return None
+    return [datetime.strptime(day, "%Y-%m-%d").date() for day in days]
 
 
 def group_events_by_day(events):
@@ -134,6 +228,7 @@ def group_events_by_day(events):
     return result
 
 
+@functools.lru_cache(maxsize=4096)
 def format_day_label(day_str):
     try:
         dt = datetime.strptime(day_str, "%Y-%m-%d")
@@ -149,7 +244,20 @@ def format_day_label(day_str):
         return day_str
 
 
-def render_html(days):
+@functools.lru_cache(maxsize=512)
+def format_month_label(month_str):
+    try:
+        dt = datetime.strptime(month_str, "%Y-%m")
+        return f"{dt.strftime('%B').lower()} {dt.year}"
+    except:
+        return month_str
+
+
+def asset_url(name):
+    return asset_names.get(name, name)
+
+
+def render_page_head(root="", shards_url=None):
     parts = []
     parts.append("<!DOCTYPE html>")
     parts.append('<html lang="en">')
@@ -157,8 +265,11 @@ def render_html(days):
     parts.append('    <meta charset="UTF-8">')
     parts.append('    <meta name="viewport" content="width=device-width, initial-scale=1.0">')
     parts.append("    <title>thing that i consumed</title>")
-    parts.append('    <link rel="stylesheet" href="assets/site.css">')
-    parts.append('    <script src="assets/scramble.js"></script>')
+    parts.append(f'    <link rel="stylesheet" href="{root}assets/{asset_url("site.css")}">')
+    parts.append(f'    <script src="{root}assets/{asset_url("scramble.js")}"></script>')
+    parts.append(f'    <script src="{root}assets/{asset_url("search.js")}" defer></script>')
+    if shards_url:
+        parts.append(f'    <script src="{root}assets/{asset_url("shards.js")}" defer></script>')
     parts.append("</head>")
     parts.append("<body>")
     parts.append("")
@@ -176,113 +287,176 @@ def render_html(days):
     parts.append('        <div class="vignette-strip vignette-right"></div>')
     parts.append("    </div>")
     parts.append("")
-    parts.append('    <div class="center">')
+    if shards_url:
+        parts.append(f'    <div class="center" data-shards="{escape(shards_url)}">')
+    else:
+        parts.append('    <div class="center">')
     parts.append('        <p class="subtitle" data-scramble>a daily index of the things that i consume</p>')
+    # Hidden until search.js loads, so the page never shows a box that does nothing
+    parts.append(f'        <form class="search" role="search" data-search="{root}search/index.json" data-root="{root}" hidden>')
+    parts.append('            <input type="search" placeholder="search" aria-label="search" autocomplete="off">')
+    parts.append("        </form>")
+    parts.append('        <div class="search-results" hidden></div>')
 
-    for idx, day_group in enumerate(days):
-        day_label = format_day_label(day_group["day"])
-        parts.append('        <details class="day">')
-        parts.append(f'            <summary class="date">{escape(day_label)}</summary>')
-
-        categories = {
-            "physical": [],
-            "audio": [],
-            "video": [],
-            "text": [],
-            "places": []
-        }
+    return "\n".join(parts)
+
+
+def image_url(raw_path):
+    raw_path = raw_path or ""
+    if image_base_url:
+        return f"{image_base_url}/{raw_path.lstrip('/')}"
+    return raw_path
+
+
+def render_image(media):
+    src = image_url(media["path"])
+    width = media.get("width")
+    height = media.get("height")
+    variants = media.get("variants") or []
+
+    attrs = ['loading="lazy"']
+    if variants:
+        candidates = [f"{image_url(v['path'])} {v['width']}w" for v in variants]
+        if width:
+            candidates.append(f"{src} {width}w")
+        # Smallest variant that still looks sharp on a 2x phone screen
+        fallback = next((v for v in variants if v["width"] >= 640), variants[-1])
+        attrs.append(f'src="{escape(image_url(fallback["path"]))}"')
+        attrs.append(f'srcset="{escape(", ".join(candidates))}"')
+        if width and height:
+            # Images are laid out at a fixed 20vh height, so the slot width follows the aspect ratio
+            attrs.append(f'sizes="calc(20vh * {width / height:.3f})"')
+    else:
+        attrs.append(f'src="{escape(src)}"')
+
+    if width and height:
+        attrs.append(f'width="{width}" height="{height}"')
+
+    return f"<img {' '.join(attrs)}>"
+
+
+# Category each event type is listed under; anything unknown is "text"
+CATEGORY_BY_TYPE = {
+    "meal": "physical",
+    "photo": "physical",
+    "music": "audio",
+    "video": "video",
+    "place": "places",
+}
+CATEGORY_ORDER = ("physical", "audio", "video", "text", "places")
+
+APPLE_MAPS_PREFIX_RE = re.compile(r'^(map item\s+)?apple maps\s+', re.IGNORECASE)
+MAP_ITEM_PREFIX_RE = re.compile(r'^map item\s+', re.IGNORECASE)
+
+ITEM_INDENT = "                "
+
+
+HTML_SPECIAL_RE = re.compile(r'[&<>"\']')
+
+
+def escape_lower(text):
+    # Most titles contain nothing to escape; skip html.escape's five replace passes for them
+    if HTML_SPECIAL_RE.search(text):
+        return escape(text).lower()
+    return text.lower()
+
+
+def _payload(event):
+    return event["payload"] if isinstance(event["payload"], dict) else {}
+
+
+def _title(event):
+    return escape_lower(event["title"])
 
-        for event in day_group["events"]:
-            etype = event["type"]
-            if etype in ["meal", "photo"]:
-                categories["physical"].append(event)
-            elif etype == "music":
-                categories["audio"].append(event)
-            elif etype == "video":
-                categories["video"].append(event)
-            elif etype == "place":
-                categories["places"].append(event)
-            else:
-                categories["text"].append(event)
-
-        for category_name, category_events in categories.items():
-            if not category_events:
-                continue
-
-            parts.append('            <details>')
-            parts.append(f'                <summary data-scramble>{category_name}</summary>')
-
-            for event in category_events:
-                etype = event["type"]
-                raw_title = event["title"]
-                if etype == "place":
-                    import re
-                    raw_title = re.sub(r'^(map item\s+)?apple maps\s+', '', raw_title, flags=re.IGNORECASE)
-                    raw_title = re.sub(r'^map item\s+', '', raw_title, flags=re.IGNORECASE)
-                    raw_title = raw_title.strip()
-                title = escape(raw_title).lower()
-                url = event["url"]
-                payload = event["payload"] if isinstance(event["payload"], dict) else {}
-
-                if etype in ["meal", "photo"] and event["media"]:
-                    for media in event["media"]:
-                        raw_path = media["path"] or ""
-                        if image_base_url:
-                            full_url = f"{image_base_url}/{raw_path.lstrip('/')}"
-                        else:
-                            full_url = raw_path
-                        src = escape(full_url)
-                        parts.append(f'                <img loading="lazy" src="{src}">')
-
-                elif etype == "music":
-                    artist = escape(str(payload.get("artist", ""))).lower()
-                    if artist:
-                        parts.append(f'                {title} - {artist}<br>')
-                    else:
-                        parts.append(f'                {title}<br>')
-
-                elif etype == "video":
-                    if url:
-                        safe_url = escape(url)
-                        parts.append(f'                <a href="{safe_url}">{title}</a><br>')
-                    else:
-                        parts.append(f'                {title}<br>')
-
-                elif etype == "link":
-                    if url:
-                        safe_url = escape(url)
-                        parts.append(f'                <a href="{safe_url}">{title}</a><br>')
-                    else:
-                        parts.append(f'                {title}<br>')
-
-                elif etype == "place":
-                    address = escape(str(payload.get("address", ""))).lower()
-                    if url:
-                        safe_url = escape(url)
-                        if address:
-                            parts.append(f'                <a href="{safe_url}">{title}</a> - {address}<br>')
-                        else:
-                            parts.append(f'                <a href="{safe_url}">{title}</a><br>')
-                    else:
-                        if address:
-                            parts.append(f'                {title} - {address}<br>')
-                        else:
-                            parts.append(f'                {title}<br>')
-
-                elif etype == "note":
-                    text = escape(str(payload.get("text", ""))).lower()
-                    if text:
-                        parts.append(f'                {title} - {text}<br>')
-                    else:
-                        parts.append(f'                {title}<br>')
-
-                else:
-                    parts.append(f'                {title}<br>')
-
-            parts.append("            </details>")
-
-        parts.append("        </details>")
 
+def _linked_title(event, title):
+    url = event["url"]
+    if url:
+        return f'<a href="{escape(url)}">{title}</a>'
+    return title
+
+
+def render_plain_item(event):
+    return f'{ITEM_INDENT}{_title(event)}<br>'
+
+
+def render_physical_item(event):
+    if not event["media"]:
+        return render_plain_item(event)
+    return "\n".join(f'{ITEM_INDENT}{render_image(media)}' for media in event["media"])
+
+
+def render_music_item(event):
+    artist = escape_lower(str(_payload(event).get("artist", "")))
+    if artist:
+        return f'{ITEM_INDENT}{_title(event)} - {artist}<br>'
+    return f'{ITEM_INDENT}{_title(event)}<br>'
+
+
+def render_link_item(event):
+    return f'{ITEM_INDENT}{_linked_title(event, _title(event))}<br>'
+
+
+def _place_title(title):
+    title = APPLE_MAPS_PREFIX_RE.sub('', title)
+    return MAP_ITEM_PREFIX_RE.sub('', title).strip()
+
+
+def render_place_item(event):
+    title = _linked_title(event, escape_lower(_place_title(event["title"])))
+    address = escape_lower(str(_payload(event).get("address", "")))
+    if address:
+        return f'{ITEM_INDENT}{title} - {address}<br>'
+    return f'{ITEM_INDENT}{title}<br>'
+
+
+def render_note_item(event):
+    text = escape_lower(str(_payload(event).get("text", "")))
+    if text:
+        return f'{ITEM_INDENT}{_title(event)} - {text}<br>'
+    return f'{ITEM_INDENT}{_title(event)}<br>'
+
+
+ITEM_RENDERERS = {
+    "meal": render_physical_item,
+    "photo": render_physical_item,
+    "music": render_music_item,
+    "video": render_link_item,
+    "link": render_link_item,
+    "place": render_place_item,
+    "note": render_note_item,
+}
+
+
+def render_day(day_group):
+    categories = {name: [] for name in CATEGORY_ORDER}
+    for event in day_group["events"]:
+        categories[CATEGORY_BY_TYPE.get(event["type"], "text")].append(event)
+
+    day = escape(day_group["day"])
+    parts = [
+        f'        <details class="day" data-day="{day}">',
+        f'            <summary class="date">{escape(format_day_label(day_group["day"]))}</summary>',
+    ]
+
+    for category_name in CATEGORY_ORDER:
+        category_events = categories[category_name]
+        if not category_events:
+            continue
+
+        parts.append('            <details>')
+        parts.append(f'                <summary data-scramble>{category_name}</summary>')
+        for event in category_events:
+            parts.append(ITEM_RENDERERS.get(event["type"], render_plain_item)(event))
+        parts.append("            </details>")
+
+    parts.append("        </details>")
+
+    return "\n".join(parts)
+
+
+def render_page_foot():
+    parts = []
     parts.append("    </div>")
     parts.append("")
     parts.append("    <footer>")
@@ -312,56 +486,770 @@ def render_html(days):
     return "\n".join(parts)
 
 
-async def main():
-    print("Fetching events from database...")
-    events = await fetch_events()
-    print(f"Found {len(events)} events")
+def render_html(days):
+    parts = [render_page_head()]
+    for day_group in days:
+        parts.append(render_day(day_group))
+    parts.append(render_page_foot())
+    return "\n".join(parts)
+
+
+def load_manifest():
+    if not manifest_file.exists():
+        return None
+
+    try:
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("version") != render_version:
+        return None
+
+    return manifest
+
+
+def save_manifest(manifest):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_file = manifest_file.with_suffix(".tmp")
+    tmp_file.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    tmp_file.replace(manifest_file)
+
+
+def fragment_path(day):
+    return fragments_dir / f"{day}.html"
+
+
+def data_fragment_path(day):
+    return fragments_dir / f"{day}.json"
+
+
+def feed_media(media):
+    return {
+        "id": media["id"],
+        "url": image_url(media["path"]),
+        "width": media.get("width"),
+        "height": media.get("height"),
+        "variants": [
+            {"url": image_url(variant["path"]), "width": variant["width"], "height": variant["height"]}
+            for variant in media.get("variants") or []
+        ],
+    }
+
+
+# Feed entries keep the item's database id, so consumers can sync by id; empty fields are dropped
+def feed_item(item):
+    entry = {
+        "id": item["id"],
+        "type": item["type"],
+        "occurred_at": item["occurred_at"],
+        "day": item["day"],
+        "title": item["title"],
+    }
+    if item["url"]:
+        entry["url"] = item["url"]
+    if item["payload"]:
+        entry["payload"] = item["payload"]
+    if item["media"]:
+        entry["media"] = [feed_media(media) for media in item["media"]]
+    return entry
+
+
+async def build_fragments(conn, full=False):
+    manifest = None if full else load_manifest()
+
+    watermark = await fetch_watermark(conn)
+    if manifest and manifest["watermark"] == watermark:
+        if all(fragment_path(day).exists() and data_fragment_path(day).exists() for day in manifest["days"]):
+            print("No changes since last build")
+            return manifest
+
+    fingerprints = await fetch_day_fingerprints(conn)
+    previous = manifest["days"] if manifest else {}
+
+    changed = [
+        day for day, fingerprint in fingerprints.items()
+        if previous.get(day, {}).get("fingerprint") != fingerprint
+        or not fragment_path(day).exists()
+        or not data_fragment_path(day).exists()
+    ]
+    removed = [day for day in previous if day not in fingerprints]
+    print(f"{len(changed)} changed day(s), {len(removed)} removed day(s)")
+
+    # A cold build reads everything anyway, so skip the day filter
+    day_filter = None if manifest is None else changed
+
+    fragments_dir.mkdir(parents=True, exist_ok=True)
+    day_entries = {day: entry for day, entry in previous.items() if day in fingerprints}
+
+    rendered = 0
+    if changed:
+        print("Streaming items from database...")
+        async for day_group in iter_day_groups(conn, day_filter):
+            day = day_group["day"]
+            fragment = render_day(day_group)
+            fragment_path(day).write_text(fragment, encoding="utf-8")
+            data = json.dumps(
+                [feed_item(item) for item in day_group["events"]],
+                separators=(",", ":"),
+                ensure_ascii=False,
+            )
+            data_fragment_path(day).write_text(data, encoding="utf-8")
+            day_entries[day] = {
+                "fingerprint": fingerprints.get(day, ""),
+                "hash": hashlib.sha256(fragment.encode("utf-8")).hexdigest()[:16],
+                "items": len(day_group["events"]),
+                "data_hash": hashlib.sha256(data.encode("utf-8")).hexdigest()[:16],
+            }
+            rendered += 1
+    print(f"Rendered {rendered} day(s)")
+
+    for day in removed:
+        fragment_path(day).unlink(missing_ok=True)
+        data_fragment_path(day).unlink(missing_ok=True)
+
+    manifest = {
+        "version": render_version,
+        "watermark": watermark,
+        "days": day_entries,
+        "shards": manifest.get("shards", {}) if manifest else {},
+        "assets": manifest.get("assets", {}) if manifest else {},
+        "feeds": manifest.get("feeds", {}) if manifest else {},
+        "search": manifest.get("search", {}) if manifest else {},
+        "stats": manifest.get("stats", {}) if manifest else {},
+    }
+    save_manifest(manifest)
+
+    return manifest
+
+
+def group_days_by_month(manifest):
+    months = defaultdict(list)
+    for day in sorted(manifest["days"], reverse=True):
+        months[day[:7]].append(day)
+
+    shards = {}
+    for month, days in months.items():
+        digest = hashlib.sha256()
+        for day in days:
+            digest.update(f"{day}:{manifest['days'][day]['hash']}\n".encode("utf-8"))
+        shards[month] = {"days": days, "hash": digest.hexdigest()[:16]}
+
+    return shards
+
+
+def render_archive_nav(shards, root=""):
+    parts = []
+    parts.append('        <nav class="archive">')
+    parts.append('            <p class="subtitle" data-scramble>archive</p>')
+    for month in shards:
+        label = escape(format_month_label(month))
+        parts.append(f'            <a href="{root}archive/{month}.html">{label}</a><br>')
+    parts.append(f'            <a href="{root}stats/index.html">listening stats</a><br>')
+    parts.append("        </nav>")
+    return "\n".join(parts)
+
+
+def write_page(path, head, days, tail):
+    # Fragments are copied one at a time so page size never dictates memory use
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        if head is not None:
+            out.write(head)
+        for index, day in enumerate(days):
+            if head is not None or index:
+                out.write("\n")
+            out.write(fragment_path(day).read_text(encoding="utf-8"))
+        if tail is not None:
+            out.write("\n")
+            out.write(tail)
+    tmp_path.replace(path)
+    precompress(path)
+
+
+def write_landing(path, manifest, shards):
+    days = sorted(manifest["days"], reverse=True)[:recent_days]
+
+    tail = "\n".join([
+        '        <div id="shard-sentinel"></div>',
+        render_archive_nav(shards),
+        render_page_foot(),
+    ])
+    write_page(path, render_page_head(shards_url="shards.json"), days, tail)
+
+
+def write_archive_page(path, month, shard, shards):
+    head = "\n".join([
+        render_page_head(root="../"),
+        f'        <p class="subtitle">{escape(format_month_label(month))}</p>',
+    ])
+    tail = "\n".join([
+        render_archive_nav(shards, root="../"),
+        render_page_foot(),
+    ])
+    write_page(path, head, shard["days"], tail)
+
+
+def write_shards(manifest, assets_changed=False):
+    shards = group_days_by_month(manifest)
+    previous = manifest.get("shards", {})
+
+    shards_dir = output_dir / "shards"
+    archive_dir = output_dir / "archive"
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    archive_dir.mkdir(parents=True, exist_ok=True)
 
-    print("Fetching songs from database...")
-    songs = await fetch_songs()
-    print(f"Found {len(songs)} songs")
+    # Archive pages link to every month, so adding or dropping a month touches all of them
+    month_set_changed = sorted(previous) != sorted(shards)
 
-    # Combine events and songs
-    all_items = events + songs
-    print(f"Total items: {len(all_items)}")
+    written = 0
+    for month, shard in shards.items():
+        shard_file = shards_dir / f"{month}.html"
+        archive_file = archive_dir / f"{month}.html"
+        unchanged = (
+            previous.get(month) == shard["hash"]
+            and shard_file.exists()
+            and archive_file.exists()
+        )
+
+        if not unchanged:
+            write_page(shard_file, None, shard["days"], None)
+            written += 1
+
+        # Archive pages carry the asset links in their head; shard fragments do not
+        if not unchanged or month_set_changed or assets_changed:
+            write_archive_page(archive_file, month, shard, shards)
+
+    for month in previous:
+        if month not in shards:
+            remove_output(shards_dir / f"{month}.html")
+            remove_output(archive_dir / f"{month}.html")
+
+    index = {
+        "version": render_version,
+        "recent_days": recent_days,
+        "shards": [
+            {
+                "month": month,
+                "label": format_month_label(month),
+                "url": f"shards/{month}.html?v={shard['hash']}",
+                "archive": f"archive/{month}.html",
+                "first_day": shard["days"][-1],
+                "last_day": shard["days"][0],
+                "days": len(shard["days"]),
+                "hash": shard["hash"],
+            }
+            for month, shard in shards.items()
+        ],
+    }
+    index_file = output_dir / "shards.json"
+    index_file.write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+    precompress(index_file)
+    print(f"Wrote {written} of {len(shards)} monthly shard(s)")
+
+    manifest["shards"] = {month: shard["hash"] for month, shard in shards.items()}
+    save_manifest(manifest)
+
+    return shards
+
+
+def write_feed(path, month, days):
+    # Day fragments are JSON arrays already; splice them rather than parse and re-encode
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write(f'{{"month":"{month}","items":[')
+        for index, day in enumerate(days):
+            if index:
+                out.write(",")
+            out.write(data_fragment_path(day).read_text(encoding="utf-8")[1:-1])
+        out.write("]}")
+    tmp_path.replace(path)
+    precompress(path)
+
+
+def write_feeds(manifest, shards):
+    feeds_dir = output_dir / "feeds"
+    feeds_dir.mkdir(parents=True, exist_ok=True)
+    previous = manifest.get("feeds", {})
+
+    feeds = {}
+    written = 0
+    for month, shard in shards.items():
+        digest = hashlib.sha256()
+        for day in shard["days"]:
+            digest.update(f"{day}:{manifest['days'][day]['data_hash']}\n".encode("utf-8"))
+        feed_hash = digest.hexdigest()[:16]
+
+        feed_file = feeds_dir / f"{month}.json"
+        if previous.get(month) != feed_hash or not feed_file.exists():
+            write_feed(feed_file, month, shard["days"])
+            written += 1
+
+        feeds[month] = {
+            "url": f"feeds/{month}.json",
+            "hash": feed_hash,
+            "items": sum(manifest["days"][day]["items"] for day in shard["days"]),
+            "days": len(shard["days"]),
+            "first_day": shard["days"][-1],
+            "last_day": shard["days"][0],
+        }
 
-    days = group_events_by_day(all_items)
-    print(f"Grouped into {len(days)} days")
+    for month in previous:
+        if month not in shards:
+            remove_output(feeds_dir / f"{month}.json")
 
-    output_dir = Path(__file__).parent / "docs"
-    output_dir.mkdir(exist_ok=True)
+    # Consumers poll this and fetch only the months whose hash moved
+    index_file = feeds_dir / "index.json"
+    index_file.write_text(
+        json.dumps({"version": render_version, "months": feeds}, separators=(",", ":")),
+        encoding="utf-8",
+    )
+    precompress(index_file)
+    print(f"Wrote {written} of {len(feeds)} monthly feed(s)")
 
+    manifest["feeds"] = {month: feed["hash"] for month, feed in feeds.items()}
+    save_manifest(manifest)
+
+
+def format_period_label(period):
+    kind = period["kind"]
+    if kind == "all":
+        return "all time"
+    if kind == "week":
+        year, week = period["period"].split("-W")
+        return f"week {int(week)} of {year}"
+    if kind == "month":
+        return format_month_label(period["period"])
+    return period["period"]
+
+
+def render_stats_entry(name, entry):
+    if name == "artists":
+        label = escape_lower(entry["artist"])
+    elif name == "albums":
+        label = f'{escape_lower(entry["album"])} - {escape_lower(entry["artist"])}'
+    else:
+        label = f'{escape_lower(entry["title"])} - {escape_lower(entry["artist"])}'
+    plays = "1 play" if entry["plays"] == 1 else f'{entry["plays"]} plays'
+    return f'{ITEM_INDENT}{label} ({plays}, {stats.format_duration(entry["listened_ms"])})<br>'
+
+
+def render_stats_period(period):
+    summary = [
+        f'{period["plays"]} plays',
+        stats.format_duration(period["listened_ms"]),
+        f'{period["artist_count"]} artists',
+    ]
+    if "days" in period:
+        summary.append(f'{period["days"]} days')
+
+    parts = [
+        '        <details class="day" open>',
+        f'            <summary class="date">{escape(format_period_label(period))}</summary>',
+        f'            <p class="subtitle">{escape(" · ".join(summary))}</p>',
+    ]
+    for name in stats.TOP_LISTS:
+        if not period.get(name):
+            continue
+        parts.append("            <details open>")
+        parts.append(f"                <summary data-scramble>top {name}</summary>")
+        for entry in period[name]:
+            parts.append(render_stats_entry(name, entry))
+        parts.append("            </details>")
+    parts.append("        </details>")
+    return "\n".join(parts)
+
+
+def render_stats_nav(periods):
+    # Years and months all link from the index; weeks only for the latest few
+    parts = ['        <nav class="archive">']
+    weeks = [key for key in sorted(periods, reverse=True) if stats.period_kind(key) == "week"][:12]
+    for kind, keys in (
+        ("years", [key for key in sorted(periods, reverse=True) if stats.period_kind(key) == "year"]),
+        ("months", [key for key in sorted(periods, reverse=True) if stats.period_kind(key) == "month"]),
+        ("recent weeks", weeks),
+    ):
+        if not keys:
+            continue
+        parts.append(f'            <p class="subtitle" data-scramble>{kind}</p>')
+        for key in keys:
+            label = format_period_label({"period": key, "kind": stats.period_kind(key)})
+            parts.append(f'            <a href="{key}.html">{escape(label)}</a><br>')
+    parts.append('            <a href="../index.html">back to the index</a><br>')
+    parts.append("        </nav>")
+    return "\n".join(parts)
+
+
+def write_stats_output(path, text):
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    tmp_path.replace(path)
+    precompress(path)
+
+
+def write_stats_period_page(path, period):
+    write_stats_output(path, "\n".join([
+        render_page_head(root="../"),
+        render_stats_period(period),
+        '        <nav class="archive">',
+        '            <a href="index.html">all listening stats</a><br>',
+        "        </nav>",
+        render_page_foot(),
+    ]))
+
+
+async def write_stats(conn, manifest, assets_changed=False):
+    stats_dir = output_dir / "stats"
+    stats_dir.mkdir(parents=True, exist_ok=True)
+
+    previous = manifest.get("stats", {})
+    if previous.get("version") != stats_version:
+        previous = {}
+    seen = previous.get("days", {})
+    fingerprints = {day: entry["fingerprint"] for day, entry in manifest["days"].items()}
+
+    # Only weeks, months and years containing a changed day are queried again. Periods
+    # with no plays are remembered too, so they are not re-checked every build.
+    changed = [day for day in set(fingerprints) | set(seen) if fingerprints.get(day) != seen.get(day)]
+    current_keys = stats.affected_periods(fingerprints)
+    periods = {key: entry for key, entry in previous.get("periods", {}).items() if key in current_keys}
+    refresh = (stats.affected_periods(changed) & current_keys) | (current_keys - set(periods))
+
+    for key in sorted(refresh):
+        period = await stats.fetch_period(conn, key)
+        if not period["plays"]:
+            remove_output(stats_dir / f"{key}.json")
+            remove_output(stats_dir / f"{key}.html")
+            periods[key] = {"plays": 0, "listened_ms": 0, "hash": ""}
+            continue
+
+        content = json.dumps(period, separators=(",", ":"), ensure_ascii=False)
+        write_stats_output(stats_dir / f"{key}.json", content)
+        write_stats_period_page(stats_dir / f"{key}.html", period)
+        periods[key] = {
+            "plays": period["plays"],
+            "listened_ms": period["listened_ms"],
+            "hash": hashlib.sha256(content.encode("utf-8")).hexdigest()[:16],
+        }
+
+    for key in previous.get("periods", {}):
+        if key not in current_keys:
+            remove_output(stats_dir / f"{key}.json")
+            remove_output(stats_dir / f"{key}.html")
+
+    listened = {key: entry for key, entry in periods.items() if entry["plays"]}
+
+    # The pages of untouched periods only need their asset links updated
+    if assets_changed:
+        for key in listened.keys() - refresh:
+            period = json.loads((stats_dir / f"{key}.json").read_text(encoding="utf-8"))
+            write_stats_period_page(stats_dir / f"{key}.html", period)
+
+    # All-time figures come from the running totals; cheap enough to refresh every build
+    all_time = await stats.fetch_all_time(conn)
+    streaks = await stats.fetch_streaks(conn)
+    index = {
+        "version": stats_version,
+        "all_time": all_time,
+        "streaks": streaks,
+        "periods": {
+            key: {
+                "url": f"stats/{key}.json?v={entry['hash']}",
+                "kind": stats.period_kind(key),
+                "plays": entry["plays"],
+                "listened_ms": entry["listened_ms"],
+            }
+            for key, entry in sorted(listened.items(), reverse=True)
+        },
+    }
+    write_stats_output(stats_dir / "index.json", json.dumps(index, separators=(",", ":"), ensure_ascii=False))
+
+    streak_lines = [
+        f'        <p class="subtitle">longest streak: {streaks["longest"]["days"]} days'
+        + (f' ({streaks["longest"]["start"]} to {streaks["longest"]["end"]})' if streaks["longest"]["days"] else "")
+        + "</p>",
+        f'        <p class="subtitle">current streak: {streaks["current"]["days"]} days</p>',
+    ]
+    write_stats_output(stats_dir / "index.html", "\n".join([
+        render_page_head(root="../"),
+        '        <p class="subtitle" data-scramble>listening stats</p>',
+        *streak_lines,
+        render_stats_period(all_time),
+        render_stats_nav(listened),
+        render_page_foot(),
+    ]))
+    print(f"Refreshed {len(refresh)} stats period(s), {len(listened)} with listening")
+
+    manifest["stats"] = {"version": stats_version, "days": fingerprints, "periods": periods}
+    save_manifest(manifest)
+
+
+SEARCH_TOKEN_RE = re.compile(r"[^\W_]+")
+SEARCH_PREFIX_LENGTH = 2
+SEARCH_MAX_TERM_LENGTH = 32
+
+
+def search_tokens(text):
+    # search.js tokenizes queries the same way: lowercase, accents stripped, letters and digits
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return {
+        token[:SEARCH_MAX_TERM_LENGTH]
+        for token in SEARCH_TOKEN_RE.findall(text)
+        if len(token) >= SEARCH_PREFIX_LENGTH
+    }
+
+
+def search_shard_key(prefix):
+    # Safe as a file name and URL; must match shardKey() in search.js
+    return "".join(
+        char if char.isascii() and char.isalnum() else f"_{ord(char):x}"
+        for char in prefix
+    )
+
+
+def search_document(item):
+    # What a result shows, and the extra words it can be found by, using the same payload
+    # fields the renderers display
+    payload = item.get("payload") or {}
+    title = item["title"]
+    if item["type"] == "place":
+        title = _place_title(title)
+        detail = str(payload.get("address", ""))
+        extra = ""
+    elif item["type"] == "music":
+        detail = str(payload.get("artist", ""))
+        extra = str(payload.get("album", ""))
+    elif item["type"] == "note":
+        detail = str(payload.get("text", ""))
+        extra = ""
+    else:
+        detail = ""
+        extra = ""
+
+    text = f"{title} - {detail}" if detail else title
+    return text.lower(), extra
+
+
+def encode_search_file(data):
+    content = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    return content, hashlib.sha256(content.encode("utf-8")).hexdigest()[:10]
+
+
+def write_search_index(manifest):
+    search_dir = output_dir / "search"
+    terms_dir = search_dir / "terms"
+    docs_dir = search_dir / "docs"
+    index_file = search_dir / "index.json"
+    previous = manifest.get("search", {})
+
+    source = hashlib.sha256(render_version.encode("utf-8"))
+    for day in sorted(manifest["days"]):
+        source.update(f"{day}:{manifest['days'][day]['data_hash']}\n".encode("utf-8"))
+    source = source.hexdigest()[:16]
+    if previous.get("source") == source and index_file.exists():
+        print("Search index unchanged")
+        return
+
+    terms_dir.mkdir(parents=True, exist_ok=True)
+    docs_dir.mkdir(parents=True, exist_ok=True)
+
+    # Document ids run oldest to newest, so new items append and old chunks keep their bytes
+    docs = []
+    postings = defaultdict(lambda: defaultdict(list))
+    for day in sorted(manifest["days"]):
+        items = json.loads(data_fragment_path(day).read_text(encoding="utf-8"))
+        for item in reversed(items):
+            doc_id = len(docs)
+            text, extra = search_document(item)
+            docs.append([item["day"], item["type"], text, item.get("url", "")])
+            for term in search_tokens(f"{text} {extra}"):
+                postings[term[:SEARCH_PREFIX_LENGTH]][term].append(doc_id)
+
+    outputs = {}
+    for prefix, terms in postings.items():
+        # Posting lists are ascending; deltas keep them short and compress well
+        shard = {}
+        for term in sorted(terms):
+            ids = terms[term]
+            shard[term] = [ids[0]] + [current - last for last, current in zip(ids, ids[1:])]
+        outputs[terms_dir / f"{search_shard_key(prefix)}.json"] = shard
+
+    chunk_count = (len(docs) + search_chunk_size - 1) // search_chunk_size
+    for chunk in range(chunk_count):
+        start = chunk * search_chunk_size
+        outputs[docs_dir / f"{chunk}.json"] = docs[start:start + search_chunk_size]
+
+    hashes = {}
+    written = 0
+    for path, data in outputs.items():
+        content, digest = encode_search_file(data)
+        relative = path.relative_to(search_dir).as_posix()
+        hashes[relative] = digest
+        if previous.get("files", {}).get(relative) == digest and path.exists():
+            continue
+        path.write_text(content, encoding="utf-8")
+        precompress(path)
+        written += 1
+
+    for relative in previous.get("files", {}):
+        if relative not in hashes:
+            remove_output(search_dir / relative)
+
+    index = {
+        "version": render_version,
+        "docs": len(docs),
+        "chunk_size": search_chunk_size,
+        "prefix_length": SEARCH_PREFIX_LENGTH,
+        "max_term_length": SEARCH_MAX_TERM_LENGTH,
+        "terms": {
+            relative.removeprefix("terms/").removesuffix(".json"): digest
+            for relative, digest in sorted(hashes.items())
+            if relative.startswith("terms/")
+        },
+        "chunks": [hashes[f"docs/{chunk}.json"] for chunk in range(chunk_count)],
+    }
+    index_file.write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+    precompress(index_file)
+    print(f"Wrote {written} of {len(outputs)} search file(s) for {len(docs)} item(s)")
+
+    manifest["search"] = {"source": source, "files": hashes}
+    save_manifest(manifest)
+
+
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+CSS_SPACE_RE = re.compile(r"\s+")
+CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+JS_BLOCK_COMMENT_RE = re.compile(r"^\s*/\*.*?\*/\s*$", re.S | re.M)
+
+
+def minify_css(text):
+    text = CSS_COMMENT_RE.sub("", text)
+    text = CSS_SPACE_RE.sub(" ", text)
+    text = CSS_PUNCTUATION_RE.sub(r"\1", text)
+    text = re.sub(r"([{;])\s*([\w-]+):\s+", r"\1\2:", text)
+    return text.replace(";}", "}").strip()
+
+
+def minify_js(text):
+    # Deliberately conservative: drops comments that sit on their own lines and all
+    # indentation, but keeps line breaks so semicolon insertion is untouched
+    text = JS_BLOCK_COMMENT_RE.sub("", text)
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("//"):
+            lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def compressed_siblings(path):
+    if path.suffix not in COMPRESSIBLE_SUFFIXES:
+        return []
+    siblings = [path.with_name(path.name + ".gz")]
+    if brotli is not None:
+        siblings.append(path.with_name(path.name + ".br"))
+    return siblings
+
+
+def precompress(path):
+    data = None
+    for sibling in compressed_siblings(path):
+        if data is None:
+            data = path.read_bytes()
+        if sibling.suffix == ".gz":
+            # mtime=0 keeps the .gz byte-identical when the content is
+            sibling.write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        else:
+            sibling.write_bytes(brotli.compress(data, quality=11))
+
+
+def remove_output(path):
+    for candidate in (path, path.with_name(path.name + ".gz"), path.with_name(path.name + ".br")):
+        candidate.unlink(missing_ok=True)
+
+
+def build_assets(previous):
     assets_dir = output_dir / "assets"
-    assets_dir.mkdir(exist_ok=True)
-
-    css_source = Path(__file__).parent / "assets" / "site.css"
-    css_dest = assets_dir / "site.css"
-    if css_source.exists():
-        import shutil
-        shutil.copy2(css_source, css_dest)
-        print(f"Copied CSS to {css_dest}")
-
-    # Copy noise texture
-    noise_source = Path(__file__).parent / "assets" / "framer-noise.png"
-    noise_dest = assets_dir / "framer-noise.png"
-    if noise_source.exists():
-        import shutil
-        shutil.copy2(noise_source, noise_dest)
-        print(f"Copied noise texture to {noise_dest}")
-
-    # Copy scramble.js
-    scramble_source = Path(__file__).parent / "assets" / "scramble.js"
-    scramble_dest = assets_dir / "scramble.js"
-    if scramble_source.exists():
-        import shutil
-        shutil.copy2(scramble_source, scramble_dest)
-        print(f"Copied scramble.js to {scramble_dest}")
-
-    print("Rendering HTML...")
-    html_content = render_html(days)
+    assets_dir.mkdir(parents=True, exist_ok=True)
+
+    names = {}
+    written = 0
+    for name in ASSET_FILES:
+        source = assets_source_dir / name
+        if not source.exists():
+            continue
+
+        if name.endswith(".css"):
+            text = source.read_text(encoding="utf-8")
+            for original, fingerprinted in names.items():
+                text = text.replace(original, fingerprinted)
+            content = minify_css(text).encode("utf-8")
+        elif name.endswith(".js"):
+            content = minify_js(source.read_text(encoding="utf-8")).encode("utf-8")
+        else:
+            content = source.read_bytes()
+
+        stem, _, extension = name.rpartition(".")
+        names[name] = f"{stem}.{hashlib.sha256(content).hexdigest()[:10]}.{extension}"
+
+        # Same name means same bytes; only missing outputs need writing
+        dest = assets_dir / names[name]
+        if dest.exists() and all(path.exists() for path in compressed_siblings(dest)):
+            continue
+
+        tmp_path = dest.with_name(dest.name + ".tmp")
+        tmp_path.write_bytes(content)
+        tmp_path.replace(dest)
+        precompress(dest)
+        written += 1
+
+    # The previous generation stays for visitors holding pages from the last deploy
+    keep = set(names.values()) | set(previous.values())
+    for path in assets_dir.iterdir():
+        base_name = path.name.removesuffix(".gz").removesuffix(".br")
+        if base_name not in keep:
+            path.unlink()
 
+    asset_names.clear()
+    asset_names.update(names)
+    print(f"Wrote {written} of {len(names)} asset(s)")
+
+    return names
+
+
+async def main(full=False):
+    conn = await connect()
+    try:
+        manifest = await build_fragments(conn, full=full)
+        print(f"Site covers {len(manifest['days'])} days")
+
+        output_dir.mkdir(exist_ok=True)
+
+        print("Building assets...")
+        previous_assets = manifest.get("assets", {})
+        manifest["assets"] = build_assets(previous_assets)
+        assets_changed = manifest["assets"] != previous_assets
+
+        print("Writing listening stats...")
+        await write_stats(conn, manifest, assets_changed=assets_changed)
+    finally:
+        await conn.close()
+
+    print("Writing monthly shards...")
+    shards = write_shards(manifest, assets_changed=assets_changed)
+
+    print("Writing JSON feeds...")
+    write_feeds(manifest, shards)
+
+    print("Writing search index...")
+    write_search_index(manifest)
+
+    print("Rendering landing page...")
     output_file = output_dir / "index.html"
-    output_file.write_text(html_content, encoding="utf-8")
+    write_landing(output_file, manifest, shards)
     print(f"Generated {output_file}")
 
     cname_file = output_dir / "CNAME"
@@ -373,6 +1261,16 @@ async def main():
 
 if __name__ == "__main__":
     import asyncio
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the static site")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the build cache and re-render every day"
+    )
+    args = parser.parse_args()
+
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    loop.run_until_complete(main(full=args.full))
 
@@ -0,0 +1,155 @@
+import os
+import calendar
+from datetime import date, timedelta
+
+# Listening statistics for the stats pages, read from the aggregates in
+# migrations/010_listening_stats.sql; build.py decides which periods to refresh and
+# renders them
+
+STATS_TOP_N = int(os.getenv("STATS_TOP_N", "10"))
+
+# Grouping columns for each top list
+TOP_LISTS = {
+    "artists": ("artist",),
+    "albums": ("artist", "album"),
+    "tracks": ("artist", "title"),
+}
+
+
+def period_keys(day):
+    # The ISO week, month and year a day falls in, e.g. 2026-W42, 2026-10, 2026
+    year, week, _ = day.isocalendar()
+    return [f"{year}-W{week:02d}", f"{day.year}-{day.month:02d}", f"{day.year}"]
+
+
+def period_bounds(key):
+    if "-W" in key:
+        year, week = key.split("-W")
+        start = date.fromisocalendar(int(year), int(week), 1)
+        return start, start + timedelta(days=6)
+    if "-" in key:
+        year, month = (int(part) for part in key.split("-"))
+        return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+    return date(int(key), 1, 1), date(int(key), 12, 31)
+
+
+def period_kind(key):
+    if "-W" in key:
+        return "week"
+    return "month" if "-" in key else "year"
+
+
+def affected_periods(days):
+    periods = set()
+    for day in days:
+        periods.update(period_keys(date.fromisoformat(day)))
+    return periods
+
+
+def _row_entry(row, columns):
+    entry = {column: row[column] for column in columns}
+    entry["plays"] = row["plays"]
+    entry["listened_ms"] = row["listened_ms"]
+    return entry
+
+
+async def _top_lists(conn, table, conditions=(), params=()):
+    tops = {}
+    for name, columns in TOP_LISTS.items():
+        group = ", ".join(columns)
+        clauses = list(conditions) + (["album <> ''"] if "album" in columns else [])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = await conn.fetch(
+            f"""
+            SELECT {group}, SUM(plays)::int AS plays, SUM(listened_ms)::bigint AS listened_ms
+            FROM {table}
+            {where}
+            GROUP BY {group}
+            ORDER BY plays DESC, listened_ms DESC, {group}
+            LIMIT ${len(params) + 1}
+            """,
+            *params,
+            STATS_TOP_N
+        )
+        tops[name] = [_row_entry(row, columns) for row in rows]
+    return tops
+
+
+async def fetch_period(conn, key):
+    start, end = period_bounds(key)
+
+    totals = await conn.fetchrow(
+        """
+        SELECT
+            COALESCE(SUM(plays), 0)::int AS plays,
+            COALESCE(SUM(listened_ms), 0)::bigint AS listened_ms,
+            COUNT(DISTINCT day) AS days,
+            COUNT(DISTINCT artist) AS artist_count
+        FROM consumed_listening_daily
+        WHERE day BETWEEN $1 AND $2
+        """,
+        start,
+        end
+    )
+
+    period = {
+        "period": key,
+        "kind": period_kind(key),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        **dict(totals),
+    }
+    if period["plays"]:
+        period.update(await _top_lists(conn, "consumed_listening_daily", ["day BETWEEN $1 AND $2"], (start, end)))
+    return period
+
+
+async def fetch_all_time(conn):
+    totals = await conn.fetchrow(
+        """
+        SELECT
+            COALESCE(SUM(plays), 0)::int AS plays,
+            COALESCE(SUM(listened_ms), 0)::bigint AS listened_ms,
+            COUNT(DISTINCT artist) AS artist_count
+        FROM consumed_listening_totals
+        """
+    )
+    return {"period": "all", "kind": "all", **dict(totals), **await _top_lists(conn, "consumed_listening_totals")}
+
+
+def streaks(days, today):
+    # Runs of consecutive days with any listening; the current run may end yesterday,
+    # since today's plays may not be synced yet
+    longest = {"days": 0, "start": None, "end": None}
+    current = {"days": 0, "start": None, "end": None}
+    run_start = previous = None
+
+    for day in days:
+        if previous is None or day != previous + timedelta(days=1):
+            run_start = day
+        previous = day
+        length = (day - run_start).days + 1
+        if length > longest["days"]:
+            longest = {"days": length, "start": run_start.isoformat(), "end": day.isoformat()}
+
+    if previous is not None and previous >= today - timedelta(days=1):
+        current = {"days": (previous - run_start).days + 1, "start": run_start.isoformat(), "end": previous.isoformat()}
+
+    return {"longest": longest, "current": current}
+
+
+async def fetch_streaks(conn, today=None):
+    # Music events logged by hand count as listening too, so this reads the day rollup
+    rows = await conn.fetch("SELECT day FROM consumed_day_rollup WHERE audio > 0 ORDER BY day")
+    return streaks([row["day"] for row in rows], today or date.today())
+
+
+def format_duration(ms):
+    minutes = int(ms // 60000)
+    hours, minutes = divmod(minutes, 60)
+    if hours >= 24:
+        days, hours = divmod(hours, 24)
+        return f"{days}d {hours}h {minutes}m"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
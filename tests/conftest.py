@@ -0,0 +1,38 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_DIR = Path(__file__).parent.parent
+
+sys.path.insert(0, str(REPO_DIR / "bench"))
+sys.path.insert(0, str(REPO_DIR / "ingest"))
+sys.path.insert(0, str(REPO_DIR / "scripts"))
+
+from standins import MockAppleMusicServer  # noqa: E402
+
+
+@pytest.fixture
+def apple_music_server(monkeypatch):
+    # The real AppleMusicClient pointed at a local mock of the API, with short timeouts
+    # and backoff so failure paths run in well under a second
+    from app import apple_music
+
+    with MockAppleMusicServer() as server:
+        monkeypatch.setenv("APPLE_DEVELOPER_TOKEN", "test")
+        monkeypatch.setenv("APPLE_MUSIC_USER_TOKEN", "test")
+        monkeypatch.setattr(apple_music, "APPLE_MUSIC_API_URL", server.url)
+        monkeypatch.setattr(apple_music, "APPLE_MUSIC_READ_TIMEOUT", 2.0)
+        monkeypatch.setattr(apple_music, "APPLE_MUSIC_DEADLINE", 5.0)
+        monkeypatch.setattr(apple_music, "APPLE_MUSIC_RETRY_BASE_DELAY", 0.01)
+        yield server
+
+
+@pytest.fixture
+def apple_music_client(apple_music_server):
+    from app.apple_music import AppleMusicClient
+
+    client = AppleMusicClient()
+    yield client
+    client.close()
@@ -0,0 +1,122 @@
+import time
+
+import pytest
+import requests
+
+from app import apple_music
+from sync_apple_music import song_key, count_new_plays, reached_snapshot
+
+
+def keys(songs):
+    return [song_key(song) for song in songs]
+
+
+def test_pages_until_previous_snapshot(apple_music_server, apple_music_client):
+    apple_music_server.play(40)
+    previous = keys(apple_music_client.get_recently_played())
+
+    # A gap longer than two pages: the fetch pages back until the snapshot resumes
+    apple_music_server.play(70)
+    apple_music_server.requests.clear()
+    current = keys(apple_music_client.get_recently_played(until=reached_snapshot(previous)))
+
+    assert len(apple_music_server.requests) == 3
+    assert count_new_plays(current, previous) == 70
+
+
+def test_short_gap_costs_one_request(apple_music_server, apple_music_client):
+    apple_music_server.play(60)
+    previous = keys(apple_music_client.get_recently_played())
+
+    apple_music_server.play(5)
+    apple_music_server.requests.clear()
+    current = keys(apple_music_client.get_recently_played(until=reached_snapshot(previous)))
+
+    assert len(apple_music_server.requests) == 1
+    assert count_new_plays(current, previous) == 5
+
+
+def test_max_pages_bounds_the_walk(apple_music_server, apple_music_client):
+    apple_music_server.play(150)
+
+    songs = apple_music_client.get_recently_played(max_pages=2, until=lambda songs: False)
+
+    assert len(songs) == 60
+    assert len(apple_music_server.requests) == 2
+
+
+def test_pages_share_one_connection(apple_music_server, apple_music_client):
+    apple_music_server.play(90)
+
+    for _ in range(3):
+        apple_music_client.get_recently_played()
+
+    assert len(apple_music_server.requests) == 9
+    assert len(apple_music_server.connections) == 1
+
+
+def test_honours_retry_after(apple_music_server, apple_music_client):
+    apple_music_server.play(10)
+    apple_music_server.fail(429, retry_after=1)
+
+    started = time.monotonic()
+    songs = apple_music_client.get_recently_played()
+
+    assert len(songs) == 10
+    assert time.monotonic() - started >= 1
+    assert len(apple_music_server.requests) == 2
+
+
+def test_retry_after_past_deadline_gives_up(apple_music_server, apple_music_client):
+    apple_music_server.fail(429, retry_after=30)
+
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.HTTPError):
+        apple_music_client.get_recently_played()
+
+    assert time.monotonic() - started < 1
+    assert len(apple_music_server.requests) == 1
+
+
+def test_retries_server_errors_with_backoff(apple_music_server, apple_music_client):
+    apple_music_server.play(10)
+    apple_music_server.fail(503, times=2)
+
+    assert len(apple_music_client.get_recently_played()) == 10
+    assert len(apple_music_server.requests) == 3
+
+
+def test_client_errors_are_not_retried(apple_music_server, apple_music_client):
+    apple_music_server.fail(401)
+
+    with pytest.raises(requests.exceptions.HTTPError) as error:
+        apple_music_client.get_recently_played()
+
+    assert error.value.response.status_code == 401
+    assert len(apple_music_server.requests) == 1
+
+
+def test_read_timeout(apple_music_server, apple_music_client, monkeypatch):
+    monkeypatch.setattr(apple_music, "APPLE_MUSIC_READ_TIMEOUT", 0.2)
+    monkeypatch.setattr(apple_music, "APPLE_MUSIC_MAX_ATTEMPTS", 1)
+    apple_music_server.delay = 1
+
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        apple_music_client.get_recently_played()
+
+    assert time.monotonic() - started < 0.8
+
+
+def test_deadline_bounds_retries(apple_music_server, apple_music_client, monkeypatch):
+    monkeypatch.setattr(apple_music, "APPLE_MUSIC_READ_TIMEOUT", 0.3)
+    monkeypatch.setattr(apple_music, "APPLE_MUSIC_MAX_ATTEMPTS", 100)
+    monkeypatch.setattr(apple_music, "APPLE_MUSIC_DEADLINE", 1.0)
+    apple_music_server.delay = 2
+
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        apple_music_client.get_recently_played()
+
+    assert time.monotonic() - started < 1.5
+    assert len(apple_music_server.requests) < 100
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from standins import FakeAppleMusicClient
+import sync_apple_music
+from sync_apple_music import count_new_plays, infer_play_times, next_interval, song_key
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def test_count_new_plays_counts_replays():
+    previous = ["a", "b", "c", "d"]
+
+    assert count_new_plays(["b", "c", "a", "b"], previous) == 2
+    assert count_new_plays(["a", "b", "c", "d"], previous) == 0
+
+
+def test_count_new_plays_replay_at_head():
+    previous = ["a", "b", "c", "d"]
+
+    # The newest play is a track already in the list, even the newest one
+    assert count_new_plays(["d", "a", "b", "c"], previous) == 1
+    assert count_new_plays(["a", "a", "b", "c"], previous) == 1
+
+
+def test_count_new_plays_without_overlap():
+    assert count_new_plays(["x", "y", "z", "w"], ["a", "b", "c", "d"]) is None
+    assert count_new_plays(["x"], []) is None
+
+
+def test_count_new_plays_min_overlap():
+    previous = ["a", "b", "c"]
+    current = ["x", "y", "z", "a"]
+
+    assert count_new_plays(current, previous) == 3
+    assert count_new_plays(current, previous, min_overlap=2) is None
+    assert count_new_plays(["x", "a", "b", "c"], previous, min_overlap=3) == 1
+
+
+def test_count_new_plays_snapshot_longer_than_a_page():
+    previous = [f"p{i}" for i in range(40)]
+
+    # One page of the current list: it runs out before the previous snapshot does
+    assert count_new_plays(["n1", "n2"] + previous[:28], previous) == 2
+    # Paged back past the whole previous snapshot
+    assert count_new_plays([f"n{i}" for i in range(35)] + previous, previous) == 35
+
+
+def test_infer_play_times_back_to_back():
+    songs = [{"duration_ms": 180_000}, {"duration_ms": None}, {"duration_ms": 60_000}]
+
+    played_at = infer_play_times(songs, NOW, NOW - timedelta(hours=1))
+
+    assert played_at == [
+        NOW - timedelta(minutes=3),
+        NOW - timedelta(minutes=7),
+        NOW - timedelta(minutes=8),
+    ]
+    assert infer_play_times(songs, NOW, None) == played_at
+
+
+def test_infer_play_times_compresses_into_the_poll_window():
+    songs = [{"duration_ms": 180_000}] * 4
+
+    # 12 minutes of tracks in 6 minutes since the last poll: some were skipped
+    played_at = infer_play_times(songs, NOW, NOW - timedelta(minutes=6))
+
+    assert played_at == [NOW - timedelta(seconds=90 * n) for n in range(1, 5)]
+    assert played_at[-1] == NOW - timedelta(minutes=6)
+
+
+def test_next_interval():
+    assert next_interval(480, 3, 120, 1800) == 120
+    assert next_interval(120, 0, 120, 1800) == 240
+    assert next_interval(1200, 0, 120, 1800) == 1800
+
+
+def test_idle_poll_is_not_logged(monkeypatch):
+    logged = []
+
+    async def create_sync_log(**kwargs):
+        logged.append(kwargs)
+
+    monkeypatch.setattr(sync_apple_music, "create_sync_log", create_sync_log)
+
+    client = FakeAppleMusicClient(plays_per_poll=5)
+    songs = client.get_recently_played()
+    client.plays_per_poll = 0
+    previous = ([song_key(song) for song in songs], NOW)
+
+    added, new_plays, snapshot = asyncio.run(sync_apple_music.sync_once(client, previous))
+
+    assert (added, new_plays) == (0, 0)
+    assert snapshot[0] == previous[0]
+    assert logged == []